@@ -1,14 +1,48 @@
 import os
 import io
+import time
 import zipfile
-from flask import Flask, render_template, request, jsonify, send_file
-import src.core.processing_logic as processing_logic
+from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, g, Response
 from dotenv import load_dotenv
+from src.core import telemetry
 load_dotenv()
+telemetry.configure_logging()
 
 app = Flask(__name__)
 CACHE_DIR = os.path.join(app.root_path, 'data', 'cache')
 
+
+def get_processing_logic():
+    """
+    Import differito della pipeline: pandas, rapidfuzz, serpapi e pybliometrics
+    vengono caricati alla prima richiesta che ne ha bisogno, non all'avvio.
+    """
+    import src.core.processing_logic as processing_logic
+    return processing_logic
+
+
+def warmup():
+    """
+    Step di inizializzazione esplicito (es. hook post_fork di gunicorn):
+    carica le dipendenze pesanti, configura pybliometrics e crea le cartelle dati.
+    """
+    processing_logic = get_processing_logic()
+    processing_logic.ensure_data_dirs()
+    import pyblio_config
+    pyblio_config.init_pybliometrics()
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    if request.url_rule is not None and hasattr(g, "request_start"):
+        telemetry.observe("http_request_seconds", time.perf_counter() - g.request_start,
+                          endpoint=request.url_rule.endpoint, status=response.status_code)
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -20,18 +54,45 @@ def search_scopus():
         data = request.json
         full_name = f"{data['nome']} {data['cognome']}"
         scholar_id = data['id']
+        processing_logic = get_processing_logic()
         candidates = processing_logic.search_scopus_candidates(full_name)
-        return jsonify({'status': 'success', 'candidates': candidates, 'scholar_id': scholar_id})
+        # Mentre l'utente sceglie nel popup si scaricano gia' Scholar e i titoli dei candidati
+        processing_logic.start_prefetch(scholar_id, [c['id'] for c in candidates])
+        candidates, auto_select = processing_logic.rank_scopus_candidates(candidates, scholar_id)
+        return jsonify({'status': 'success', 'candidates': candidates, 'scholar_id': scholar_id,
+                        'auto_select': auto_select})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def _year_param(value):
+    """Anno opzionale dal JSON della richiesta: None se vuoto, ValueError se non valido."""
+    if value in (None, ""):
+        return None
+    year = int(value)
+    if not 1900 <= year <= 2100:
+        raise ValueError(f"Anno non valido: {value}")
+    return year
+
 # Solo elaborazione (Download + Merge)
 @app.route('/process_author', methods=['POST'])
 def process_author():
+    data = request.get_json(silent=True)
     try:
-        data = request.json
-        result_dict = processing_logic.process_chosen_author(
-            data['scopus_id'], data['scopus_name'], data['scholar_id']
+        if not isinstance(data, dict):
+            raise ValueError("Richiesta senza dati JSON")
+        missing = [k for k in ('scopus_id', 'scopus_name', 'scholar_id') if not data.get(k)]
+        if missing:
+            raise ValueError(f"Campi mancanti: {', '.join(missing)}")
+        year_from, year_to = _year_param(data.get('year_from')), _year_param(data.get('year_to'))
+        if year_from and year_to and year_from > year_to:
+            raise ValueError("L'anno iniziale e' successivo a quello finale")
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    try:
+        result_dict = get_processing_logic().process_chosen_author(
+            data['scopus_id'], data['scopus_name'], data['scholar_id'],
+            force=bool(data.get('force', False)),
+            year_from=year_from, year_to=year_to
         )
         return jsonify(result_dict)
         
@@ -39,11 +100,103 @@ def process_author():
         # Questo cattura solo errori di esecuzione imprevisti o di rete
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+# Metriche Prometheus (tempi per fase, chiamate API, cache hit, retry)
+@app.route('/metrics')
+def metrics():
+    return Response(telemetry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+# Budget del limitatore Scopus condiviso (token, attese stimate, quota residua) e uso delle API key
+@app.route('/rate_limit')
+def rate_limit_status():
+    from src.core import rate_limit, key_pool
+    return jsonify({'buckets': rate_limit.status(), 'keys': key_pool.usage()})
+
+# Rete dei coautori gia' calcolata in cache (nessuna chiamata API) e numeri del grafo di coorte
+@app.route('/coauthors/<author_folder>')
+def coauthors_summary(author_folder):
+    from src.core import coauthors, results_api
+    author_path = results_api.author_dir(CACHE_DIR, author_folder)
+    summary = coauthors.read_summary(author_path) if author_path else None
+    if summary is None: return "Non trovato", 404
+    return jsonify({'author': summary, 'cohort': coauthors.cohort_summary()})
+
+def _record_access(author_folder):
+    """Accesso ai risultati: gli autori piu' consultati si aggiornano per primi (src/core/refresh.py)."""
+    from src.core import refresh
+    refresh.record_access(author_folder)
+
+# Risultati in JSON letti dalla cache (niente ZIP): metriche e pubblicazioni filtrate/paginate.
+# L'ETag cambia solo quando i risultati vengono ricostruiti: con If-None-Match si risponde 304.
+# charts=True: la risposta elenca i grafici, quindi l'ETag cambia anche quando vengono ridisegnati.
+def _cached_json(author_folder, build, track=False, charts=False):
+    from src.core import results_api
+    author_path = results_api.author_dir(CACHE_DIR, author_folder)
+    if author_path is None: return jsonify({'status': 'error', 'message': 'Non trovato'}), 404
+    if track: _record_access(author_folder)
+    etag = results_api.folder_etag(author_path, charts=charts)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        try:
+            response = jsonify(build(results_api, author_path))
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/authors/<author_folder>/metrics')
+def api_author_metrics(author_folder):
+    return _cached_json(author_folder, lambda api, path: dict(api.read_metrics(path), folder=author_folder),
+                        track=True, charts=True)
+
+@app.route('/api/authors/<author_folder>/publications')
+def api_author_publications(author_folder):
+    return _cached_json(author_folder, lambda api, path: api.query_publications(api.load_publications(path), request.args))
+
+# Andamento delle citazioni dallo storico accumulato a ogni ricalcolo (nessuna chiamata API)
+@app.route('/api/authors/<author_folder>/trends')
+def api_author_trends(author_folder):
+    from src.core import citation_history
+    return _cached_json(author_folder, lambda api, path: {'folder': author_folder,
+                                                         'trends': citation_history.trends(path.name)})
+
+# Grafici PNG disegnati alla scrittura della cache: file statici, in cache nel browser se versionati (?v=)
+@app.route('/charts/<author_folder>/<chart>')
+def author_chart(author_folder, chart):
+    from src.core import results_api
+    author_path = results_api.author_dir(CACHE_DIR, author_folder)
+    if author_path is None or chart not in results_api.CHARTS: return "Non trovato", 404
+    max_age = 365 * 24 * 3600 if request.args.get('v') else 0
+    return send_from_directory(author_path, f"{chart}.png", mimetype='image/png', max_age=max_age)
+
+# Excel (openpyxl write-only): generato alla prima richiesta e salvato accanto ai CSV
+@app.route('/download/xlsx/<author_folder>')
+def download_xlsx(author_folder):
+    from src.core import results_api, xlsx_export
+    author_path = results_api.author_dir(CACHE_DIR, author_folder)
+    if author_path is None: return "Non trovato", 404
+    _record_access(author_folder)
+    return send_file(xlsx_export.author_workbook(author_path), as_attachment=True,
+                     download_name=f'{author_folder}.xlsx')
+
+# Excel di coorte: tutta la cache oppure una selezione (?authors=cartella1,cartella2)
+@app.route('/download/xlsx_cohort')
+def download_xlsx_cohort():
+    from src.core import xlsx_export
+    folders = [f for f in request.args.get('authors', '').split(',') if f]
+    try:
+        path = xlsx_export.cohort_workbook(CACHE_DIR, os.path.join(os.path.dirname(CACHE_DIR), 'exports'), folders)
+    except (ValueError, OSError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    return send_file(path, as_attachment=True, download_name='coorte.xlsx')
+
 # Download Zip
 @app.route('/download/zip/<author_folder>')
 def download_zip(author_folder):
     author_path = os.path.join(CACHE_DIR, author_folder)
     if not os.path.isdir(author_path): return "Non trovato", 404
+    _record_access(author_folder)
     data = io.BytesIO()
     with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as zf:
         for root, dirs, files in os.walk(author_path):
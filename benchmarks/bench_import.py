@@ -0,0 +1,71 @@
+"""
+BENCHMARK TEMPO DI IMPORT
+========================================
+
+Misura il costo di avvio dell'app Flask in un processo pulito:
+- "lazy":  solo `import app` (quello che paga ogni worker per servire `/`)
+- "eager": `import app` + `app.warmup()` (equivalente al vecchio import,
+           che caricava subito pandas, rapidfuzz, serpapi e pybliometrics)
+
+USO:
+    python benchmarks/bench_import.py [--runs 7]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ["pandas", "rapidfuzz", "tqdm", "serpapi", "pybliometrics"]
+
+SNIPPETS = {
+    "lazy": "import app",
+    "eager": "import app; app.warmup()",
+}
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+{snippet}
+elapsed = time.perf_counter() - t0
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "modules": len(sys.modules), "heavy_loaded": heavy}}))
+"""
+
+
+def run_probe(snippet):
+    code = PROBE.format(snippet=snippet, heavy=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=project_root,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tempo di import dell'app")
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    report = {}
+    for label, snippet in SNIPPETS.items():
+        samples = [run_probe(snippet) for _ in range(args.runs)]
+        times = [s["seconds"] for s in samples]
+        report[label] = {
+            "median_ms": round(statistics.median(times) * 1000, 1),
+            "min_ms": round(min(times) * 1000, 1),
+            "modules": samples[-1]["modules"],
+            "heavy_loaded": samples[-1]["heavy_loaded"],
+        }
+
+    print(json.dumps(report, indent=2))
+    speedup = report["eager"]["median_ms"] / max(report["lazy"]["median_ms"], 0.1)
+    print(f"\n Import lazy {speedup:.1f}x piu' veloce dell'import completo.")
+
+
+if __name__ == "__main__":
+    main()
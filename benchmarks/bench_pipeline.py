@@ -0,0 +1,179 @@
+"""
+BENCHMARK PIPELINE MERGE / ARRICCHIMENTO / METRICHE
+========================================
+
+Esegue offline (nessuna chiamata di rete) le fasi della pipeline su profili
+sintetici generati da benchmarks/synthetic.py, usando i riferimenti reali in
+data/external. Per ogni dimensione misura tempo e picco di memoria per fase
+e throughput complessivo (pubblicazioni/secondo).
+
+Fasi misurate:
+    read, title_match, venue_enrichment, h_index, metrics, save_cache
+
+Il risultato e' un file JSON in benchmarks/results/ (uno per esecuzione,
+con commit git e parametri), confrontabile con --compare.
+
+USO:
+    python benchmarks/bench_pipeline.py --sizes 100 1000 5000
+    python benchmarks/bench_pipeline.py --compare benchmarks/results/<vecchio>.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from benchmarks import synthetic
+from src.core import processing_logic
+from src.merge import fuzzy_merge
+
+RESULTS_DIR = project_root / "benchmarks" / "results"
+
+
+@contextlib.contextmanager
+def measure(stages, name):
+    """Registra in stages[name] durata e picco di memoria Python della fase."""
+    tracemalloc.reset_peak()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1] - start_mem
+    stages[name] = {"seconds": round(elapsed, 4), "peak_mb": round(max(peak, 0) / 2**20, 2)}
+
+
+def run_size(n, overlap, noise, seed, work_dir):
+    scopus_file, scholar_file = synthetic.write_profile(
+        work_dir, f"bench_{n}", n=n, overlap=overlap, noise=noise, seed=seed
+    )
+    stages = {}
+    result = {"n": n, "stages": stages, "mismatch": False}
+
+    tracemalloc.start()
+    try:
+        with measure(stages, "read"):
+            scopus_df = pd.read_csv(scopus_file)
+            scholar_df = pd.read_csv(scholar_file)
+
+        try:
+            with measure(stages, "title_match"):
+                merged_df = fuzzy_merge.match_titles(scopus_df, scholar_df)
+        except ValueError as e:
+            result["mismatch"] = str(e)
+            return result
+
+        with measure(stages, "venue_enrichment"):
+            merged_df = fuzzy_merge.enrich_venues(merged_df)
+
+        with measure(stages, "h_index"):
+            processing_logic.calculate_h_index_from_list(merged_df["citations_scholar"].tolist())
+
+        with measure(stages, "metrics"):
+            metrics = processing_logic.compute_metrics(merged_df)
+
+        with measure(stages, "save_cache"):
+            processing_logic.save_author_cache(merged_df, f"bench_{n}", "BENCH", metrics)
+    finally:
+        tracemalloc.stop()
+
+    total = sum(s["seconds"] for s in stages.values())
+    result["rows_merged"] = len(merged_df)
+    result["total_seconds"] = round(total, 4)
+    result["throughput_pubs_per_s"] = round(n / total, 1) if total else None
+    result["peak_mb"] = max(s["peak_mb"] for s in stages.values())
+    return result
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    old = {r["n"]: r for r in baseline["results"]}
+    print(f"\n Confronto con {baseline_path} (commit {baseline.get('commit')})")
+    for r in current["results"]:
+        prev = old.get(r["n"])
+        if not prev:
+            continue
+        for stage, vals in r["stages"].items():
+            before = prev["stages"].get(stage)
+            if before and before["seconds"]:
+                ratio = vals["seconds"] / before["seconds"]
+                flag = "  <-- regressione" if ratio > 1.2 else ""
+                print(f"  n={r['n']:>6} {stage:<17} {before['seconds']:>9.4f}s -> {vals['seconds']:>9.4f}s ({ratio:.2f}x){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline della pipeline di merge")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--overlap", type=float, default=0.8)
+    parser.add_argument("--noise", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="File JSON di output (default: benchmarks/results/<data>_<commit>.json)")
+    parser.add_argument("--compare", help="File JSON di un'esecuzione precedente da confrontare")
+    args = parser.parse_args()
+
+    # I riferimenti CORE/Scimago vengono compilati/aperti prima delle misure
+    for name in fuzzy_merge.REFERENCE_SOURCES:
+        fuzzy_merge.get_reference(name)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {"overlap": args.overlap, "noise": args.noise, "seed": args.seed},
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        original_cache = processing_logic.CACHE_DIR
+        processing_logic.CACHE_DIR = tmp / "cache"
+        try:
+            for n in args.sizes:
+                print(f" Benchmark n={n}...")
+                r = run_size(n, args.overlap, args.noise, args.seed, tmp / "raw")
+                report["results"].append(r)
+                if r["mismatch"]:
+                    print(f"   match rate insufficiente ({r['mismatch']}), fasi successive saltate")
+                else:
+                    print(f"   {r['total_seconds']}s totali, {r['throughput_pubs_per_s']} pub/s, picco {r['peak_mb']} MB")
+        finally:
+            processing_logic.CACHE_DIR = original_cache
+
+    report["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\n✓ Risultati salvati in: {out}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""
+SERVER FINTO SCOPUS / SERPAPI PER I TEST DI CARICO
+========================================
+
+Espone in locale il sottoinsieme delle API usato dai fetcher, senza consumare quota:
+
+Scopus (stessi path di api.elsevier.com):
+    GET /content/search/author              (AuthorSearch)
+    GET /content/author/author_id/<id>      (AuthorRetrieval)
+    GET /content/search/scopus              (ScopusSearch, usato da get_documents)
+    GET /content/abstract/eid/<eid>         (AbstractRetrieval)
+SerpApi:
+    GET /search?engine=google_scholar_author
+Utility:
+    GET /fake/profiles                      (elenco dei profili sintetici)
+
+Modalita':
+- synthetic: risposte generate da benchmarks/synthetic.py (profili deterministici)
+- record:    inoltra al servizio reale e salva le risposte in --store
+- replay:    risponde solo con le risposte registrate (404 se mancano)
+
+Latenza, errori 5xx e 429 sono configurabili. Per puntare i fetcher al server:
+    SCOPUS_BASE_URL=http://127.0.0.1:8765
+    SERPAPI_BASE_URL=http://127.0.0.1:8765
+
+USO:
+    python benchmarks/fake_services.py --port 8765 --latency 0.2 --jitter 0.1 --rate-429 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from benchmarks import synthetic
+
+SCOPUS_UPSTREAM = "https://api.elsevier.com"
+SERPAPI_UPSTREAM = "https://serpapi.com"
+SECRET_PARAMS = {"api_key", "apikey", "insttoken", "source", "output"}
+
+GIVEN_NAMES = ["Mario", "Giulia", "Luca", "Anna", "Marco", "Sara", "Paolo", "Elena"]
+SURNAMES = ["Rossi", "Bianchi", "Esposito", "Romano", "Colombo", "Ricci", "Marino", "Greco"]
+
+
+@dataclass
+class FakeConfig:
+    mode: str = "synthetic"
+    profiles: int = 16
+    pubs: int = 200
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    rate_429: float = 0.0
+    quota: int = 20000
+    store: Path = project_root / "benchmarks" / "fake_recordings"
+    seed: int = 0
+
+
+# ============================================================
+#  PROFILI SINTETICI
+# ============================================================
+
+def profile_ids(i):
+    """(scopus_id, scholar_id) del profilo i-esimo."""
+    return str(57000000000 + i), f"FAKE{i:06d}AAAAJ"
+
+
+def profile_name(i):
+    return GIVEN_NAMES[i % len(GIVEN_NAMES)], SURNAMES[(i // len(GIVEN_NAMES)) % len(SURNAMES)]
+
+
+@lru_cache(maxsize=256)
+def profile_data(i, pubs, seed):
+    scopus_df, scholar_df = synthetic.generate_profile(n=pubs, seed=seed * 100003 + i)
+    rng = random.Random(i)
+    scopus_id = profile_ids(i)[0]
+    coauthor_pool = [str(58000000000 + rng.randrange(5000)) for _ in range(30)]
+    docs = []
+    for k, row in enumerate(scopus_df.to_dict("records")):
+        authors = [scopus_id] + rng.sample(coauthor_pool, rng.randint(0, 5))
+        docs.append({**row, "eid": f"2-s2.0-{850000000 + i * 100000 + k}", "authors": authors})
+    return docs, scholar_df.to_dict("records")
+
+
+# ============================================================
+#  COSTRUZIONE RISPOSTE (formato delle API reali)
+# ============================================================
+
+def _author_entry(i):
+    given, surname = profile_name(i)
+    scopus_id = profile_ids(i)[0]
+    return {
+        "eid": f"9-s2.0-{scopus_id}",
+        "dc:identifier": f"AUTHOR_ID:{scopus_id}",
+        "preferred-name": {"surname": surname, "given-name": given, "initials": given[0] + "."},
+        "document-count": str(0),
+        "affiliation-current": {
+            "affiliation-name": f"Universita' Sintetica {i % 4}",
+            "affiliation-id": str(60000000 + i % 4),
+            "affiliation-city": "Roma",
+            "affiliation-country": "Italy",
+        },
+    }
+
+
+def author_search(cfg, params):
+    query = params.get("query", "")
+    last = re.search(r"AUTHLASTNAME\(([^)]*)\)", query)
+    first = re.search(r"AUTHFIRST\(([^)]*)\)", query)
+    hits = []
+    for i in range(cfg.profiles):
+        given, surname = profile_name(i)
+        if last and last.group(1).strip().lower() != surname.lower():
+            continue
+        # Come Scopus, AUTHFIRST confronta l'iniziale: produce omonimi (es. Mario/Marco Rossi)
+        if first and given[0].lower() != first.group(1).strip()[:1].lower():
+            continue
+        entry = _author_entry(i)
+        entry["document-count"] = str(cfg.pubs)
+        hits.append(entry)
+    return {"search-results": {"opensearch:totalResults": str(len(hits)), "entry": hits}}
+
+
+def _profile_index(scopus_id):
+    i = int(scopus_id) - 57000000000
+    return i if 0 <= i < 10**6 else None
+
+
+def author_retrieval(cfg, scopus_id):
+    i = _profile_index(scopus_id)
+    if i is None:
+        return None
+    docs, _ = profile_data(i, cfg.pubs, cfg.seed)
+    given, surname = profile_name(i)
+    cites = sorted((d["citations_scopus"] for d in docs), reverse=True)
+    h_index = sum(1 for rank, c in enumerate(cites, 1) if c >= rank)
+    return {"author-retrieval-response": [{
+        "coredata": {
+            "dc:identifier": f"AUTHOR_ID:{scopus_id}",
+            "document-count": str(len(docs)),
+            "citation-count": str(sum(cites)),
+            "cited-by-count": str(sum(cites)),
+        },
+        "h-index": str(h_index),
+        "author-profile": {
+            "preferred-name": {"given-name": given, "surname": surname, "initials": given[0] + "."},
+            "affiliation-current": {"affiliation": {
+                "@affiliation-id": str(60000000 + i % 4),
+                "ip-doc": {"preferred-name": {"$": f"Universita' Sintetica {i % 4}"},
+                           "address": {"city": "Roma", "country": "Italy"}},
+            }},
+        },
+    }]}
+
+
+def _doc_entry(doc):
+    return {
+        "eid": doc["eid"],
+        "dc:title": doc["title"],
+        "prism:coverDate": f"{doc['year']}-01-01",
+        "citedby-count": str(doc["citations_scopus"]),
+        "openaccess": "0",
+        "prism:doi": doc["doi"],
+        "prism:publicationName": doc["venue_scopus"],
+        "prism:aggregationType": doc["document_type"],
+        "subtype": doc["source_type"],
+        "author": [{"authid": a, "surname": f"Author{a[-4:]}", "given-name": "X",
+                    "afid": [{"$": str(60000000 + int(a) % 7)}]} for a in doc["authors"]],
+    }
+
+
+def scopus_search(cfg, params):
+    query = params.get("query", "")
+    au = re.search(r"AU-ID\((\d+)\)", query)
+    i = _profile_index(au.group(1)) if au else None
+    docs = profile_data(i, cfg.pubs, cfg.seed)[0] if i is not None else []
+    after = re.search(r"PUBYEAR\s*>\s*(\d{4})", query)
+    before = re.search(r"PUBYEAR\s*<\s*(\d{4})", query)
+    if after:
+        docs = [d for d in docs if d["year"] > int(after.group(1))]
+    if before:
+        docs = [d for d in docs if d["year"] < int(before.group(1))]
+
+    count = int(params.get("count", 25))
+    if "cursor" in params:
+        start = 0 if params["cursor"] == "*" else int(params["cursor"])
+    else:
+        start = int(params.get("start", 0))
+    page = docs[start:start + count]
+    return {"search-results": {
+        "opensearch:totalResults": str(len(docs)),
+        "cursor": {"@next": str(start + count)},
+        "entry": [_doc_entry(d) for d in page],
+    }}
+
+
+def abstract_retrieval(cfg, eid):
+    m = re.match(r"2-s2\.0-(\d+)", eid)
+    if not m:
+        return None
+    num = int(m.group(1)) - 850000000
+    i, k = divmod(num, 100000)
+    docs, _ = profile_data(i, cfg.pubs, cfg.seed)
+    if not 0 <= k < len(docs):
+        return None
+    doc = docs[k]
+    return {"abstracts-retrieval-response": {
+        "coredata": {
+            "eid": eid,
+            "dc:title": doc["title"],
+            "prism:coverDate": f"{doc['year']}-01-01",
+            "citedby-count": str(doc["citations_scopus"]),
+            "prism:aggregationType": doc["document_type"],
+            "subtype": doc["source_type"],
+            "prism:publicationName": doc["venue_scopus"],
+        },
+        "authors": {"author": [{
+            "@auid": a, "ce:surname": f"Author{a[-4:]}", "ce:indexed-name": f"Author{a[-4:]} X.",
+            "preferred-name": {"ce:given-name": "X"},
+            "affiliation": {"@id": str(60000000 + int(a) % 7)},
+        } for a in doc["authors"]]},
+    }}
+
+
+def scholar_author(cfg, params):
+    scholar_id = params.get("author_id", "")
+    m = re.match(r"FAKE(\d{6})AAAAJ", scholar_id)
+    if not m:
+        return 400, {"error": "Google hasn't returned any results for this query."}
+    i = int(m.group(1))
+    _, articles = profile_data(i, cfg.pubs, cfg.seed)
+    if params.get("sort") == "pubdate":
+        articles = sorted(articles, key=lambda a: a["year"], reverse=True)
+    start, num = int(params.get("start", 0)), int(params.get("num", 20))
+    page = articles[start:start + num]
+    given, surname = profile_name(i)
+    body = {
+        "search_metadata": {"status": "Success"},
+        "author": {"name": f"{given} {surname}", "affiliations": f"Universita' Sintetica {i % 4}"},
+        "articles": [{
+            "title": a["title"], "year": str(a["year"]), "publication": a["venue"],
+            "link": a["link"], "cited_by": {"value": a["citations_scholar"]},
+        } for a in page],
+    }
+    if start + num < len(articles):
+        body["serpapi_pagination"] = {"next": f"/search?start={start + num}"}
+    return 200, body
+
+
+# ============================================================
+#  SERVER HTTP
+# ============================================================
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    server_version = "FakeScopusSerpApi/1.0"
+    cfg: FakeConfig = None
+    stats = None
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _service(self, path):
+        return "serpapi" if path.startswith("/search") else "scopus"
+
+    def _quota_headers(self):
+        with self.lock:
+            remaining = max(self.cfg.quota - self.stats["scopus_calls"], 0)
+        reset = int(time.time()) + 7 * 86400
+        return {"X-RateLimit-Limit": str(self.cfg.quota), "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Reset": str(reset)}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        service = self._service(url.path)
+        cfg = self.cfg
+
+        if url.path == "/fake/profiles":
+            return self._send(200, {"profiles": [
+                {"name": " ".join(profile_name(i)), "scopus_id": profile_ids(i)[0], "scholar_id": profile_ids(i)[1]}
+                for i in range(cfg.profiles)
+            ], "stats": dict(self.stats)})
+
+        with self.lock:
+            self.stats[f"{service}_calls"] += 1
+
+        delay = cfg.latency + random.uniform(0, cfg.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = random.random()
+        if roll < cfg.rate_429:
+            with self.lock:
+                self.stats["throttled"] += 1
+            if service == "scopus":
+                return self._send(429, {"service-error": {"status": {"statusCode": "TOO_MANY_REQUESTS",
+                                  "statusText": "Rate limit exceeded (fake)"}}}, {"Retry-After": "1"})
+            return self._send(429, {"error": "Your account has run out of searches (fake)."})
+        if roll < cfg.rate_429 + cfg.error_rate:
+            with self.lock:
+                self.stats["errors"] += 1
+            return self._send(500, {"error": "Internal server error (fake)"})
+
+        if cfg.mode in ("record", "replay"):
+            return self._record_or_replay(service, url.path, params)
+
+        status, body = self._synthetic(url.path, params)
+        headers = self._quota_headers() if service == "scopus" else {}
+        return self._send(status, body, headers)
+
+    def _synthetic(self, path, params):
+        cfg = self.cfg
+        if path == "/search":
+            if params.get("engine") != "google_scholar_author":
+                return 400, {"error": "Engine non supportato dal server finto"}
+            return scholar_author(cfg, params)
+        if path == "/content/search/author":
+            return 200, author_search(cfg, params)
+        if path == "/content/search/scopus":
+            return 200, scopus_search(cfg, params)
+        m = re.match(r"/content/author/author_id/(\d+)$", path)
+        if m:
+            body = author_retrieval(cfg, m.group(1))
+            return (200, body) if body else (404, _not_found())
+        m = re.match(r"/content/abstract/eid/(.+)$", path)
+        if m:
+            body = abstract_retrieval(cfg, m.group(1))
+            return (200, body) if body else (404, _not_found())
+        return 404, _not_found()
+
+    # --- Record / Replay ---
+
+    def _recording_path(self, service, path, params):
+        public = sorted((k, v) for k, v in params.items() if k.lower() not in SECRET_PARAMS)
+        key = hashlib.sha1(json.dumps([service, path, public]).encode()).hexdigest()
+        return Path(self.cfg.store) / service / f"{key}.json"
+
+    def _record_or_replay(self, service, path, params):
+        rec_path = self._recording_path(service, path, params)
+        if rec_path.exists():
+            rec = json.loads(rec_path.read_text(encoding="utf-8"))
+            return self._send(rec["status"], rec["body"], rec.get("headers"))
+        if self.cfg.mode == "replay":
+            return self._send(404, {"error": "Risposta non registrata", "path": path})
+
+        import requests
+        upstream = SERPAPI_UPSTREAM if service == "serpapi" else SCOPUS_UPSTREAM
+        headers = {k: v for k, v in self.headers.items() if k.lower().startswith("x-els-")}
+        headers["Accept"] = "application/json"
+        resp = requests.get(upstream + path, params=params, headers=headers, timeout=60)
+        keep = {k: v for k, v in resp.headers.items() if k.lower().startswith("x-ratelimit")}
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {"error": resp.text[:500]}
+        if resp.status_code == 200:
+            rec_path.parent.mkdir(parents=True, exist_ok=True)
+            rec_path.write_text(json.dumps({"status": 200, "headers": keep, "body": body}), encoding="utf-8")
+        return self._send(resp.status_code, body, keep)
+
+
+def _not_found():
+    return {"service-error": {"status": {"statusCode": "RESOURCE_NOT_FOUND", "statusText": "Not found (fake)"}}}
+
+
+def make_server(cfg, host="127.0.0.1", port=8765):
+    stats = {"scopus_calls": 0, "serpapi_calls": 0, "throttled": 0, "errors": 0}
+    handler = type("Handler", (FakeServiceHandler,), {"cfg": cfg, "stats": stats, "lock": threading.Lock()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    return server
+
+
+def start_in_thread(cfg, host="127.0.0.1", port=0):
+    """Avvia il server in un thread (port=0: porta libera). Ritorna (server, base_url)."""
+    server = make_server(cfg, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server finto Scopus/SerpApi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mode", choices=["synthetic", "record", "replay"], default="synthetic")
+    parser.add_argument("--profiles", type=int, default=16)
+    parser.add_argument("--pubs", type=int, default=200, help="Pubblicazioni per profilo sintetico")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latenza base in secondi")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latenza casuale aggiuntiva massima")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilita' di risposta 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probabilita' di risposta 429")
+    parser.add_argument("--quota", type=int, default=20000, help="Quota Scopus simulata (header X-RateLimit)")
+    parser.add_argument("--store", default=str(FakeConfig.store))
+    args = parser.parse_args()
+
+    cfg = FakeConfig(mode=args.mode, profiles=args.profiles, pubs=args.pubs, latency=args.latency,
+                     jitter=args.jitter, error_rate=args.error_rate, rate_429=args.rate_429,
+                     quota=args.quota, store=Path(args.store))
+    server = make_server(cfg, args.host, args.port)
+    base = f"http://{args.host}:{args.port}"
+    print(f" Server finto in ascolto su {base} (modalita' {cfg.mode})")
+    print(f"   SCOPUS_BASE_URL={base}\n   SERPAPI_BASE_URL={base}")
+    if cfg.mode == "synthetic":
+        for i in range(min(cfg.profiles, 8)):
+            given, surname = profile_name(i)
+            scopus_id, scholar_id = profile_ids(i)
+            print(f"   {given} {surname:<10} Scopus {scopus_id}  Scholar {scholar_id}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
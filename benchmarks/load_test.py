@@ -0,0 +1,86 @@
+"""
+TEST DI CARICO END-TO-END
+========================================
+
+Esegue il flusso completo della dashboard (/search_scopus -> /process_author)
+per piu' autori in parallelo contro un'istanza Flask gia' avviata, puntata al
+server finto (benchmarks/fake_services.py) tramite SCOPUS_BASE_URL e
+SERPAPI_BASE_URL. Riporta latenze (p50/p95/max) ed esiti.
+
+USO:
+    python benchmarks/fake_services.py --latency 0.1 --rate-429 0.02 &
+    SCOPUS_BASE_URL=http://127.0.0.1:8765 SERPAPI_BASE_URL=http://127.0.0.1:8765 python app.py &
+    python benchmarks/load_test.py --authors 8 --concurrency 4
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def run_author(app_url, profile):
+    given, surname = profile["name"].split(" ", 1)
+    t0 = time.perf_counter()
+    resp = requests.post(f"{app_url}/search_scopus", json={"nome": given, "cognome": surname, "id": profile["scholar_id"]}, timeout=600)
+    t_search = time.perf_counter() - t0
+    candidates = resp.json().get("candidates", [])
+    chosen = next((c for c in candidates if c["id"] == profile["scopus_id"]), None)
+    if chosen is None:
+        return {"status": "no_candidate", "search_s": t_search, "total_s": t_search}
+
+    resp = requests.post(f"{app_url}/process_author", json={
+        "scopus_id": chosen["id"], "scopus_name": chosen["name"], "scholar_id": profile["scholar_id"],
+    }, timeout=3600)
+    total = time.perf_counter() - t0
+    try:
+        status = resp.json().get("status", "error")
+    except ValueError:
+        status = f"http_{resp.status_code}"
+    return {"status": status, "search_s": t_search, "total_s": total}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test di carico end-to-end contro il server finto")
+    parser.add_argument("--app-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--fake-url", default="http://127.0.0.1:8765")
+    parser.add_argument("--authors", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--out", help="File JSON con i risultati")
+    args = parser.parse_args()
+
+    profiles = requests.get(f"{args.fake_url}/fake/profiles", timeout=10).json()["profiles"][:args.authors]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda p: run_author(args.app_url, p), profiles))
+    wall = time.perf_counter() - t0
+
+    totals = [r["total_s"] for r in results]
+    report = {
+        "authors": len(results),
+        "concurrency": args.concurrency,
+        "wall_s": round(wall, 2),
+        "p50_s": round(statistics.median(totals), 2),
+        "p95_s": round(percentile(totals, 0.95), 2),
+        "max_s": round(max(totals), 2),
+        "status": dict(Counter(r["status"] for r in results)),
+        "fake_server": requests.get(f"{args.fake_url}/fake/profiles", timeout=10).json()["stats"],
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"summary": report, "runs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+GENERATORE DI DATI SINTETICI
+========================================
+
+Genera coppie di CSV realistiche Scopus/Scholar (stesso formato dei fetcher)
+senza chiamate di rete. Le venue sono estratte dai riferimenti reali in
+data/external (CORE, e Scimago se presente), cosi' l'arricchimento lavora
+su nomi veri.
+
+Parametri principali:
+- n:        numero di pubblicazioni Scopus (100 - 50.000)
+- overlap:  frazione dei record Scopus presenti anche su Scholar
+- noise:    probabilita' che un titolo Scholar sia "sporcato" (typo, parole
+            mancanti, maiuscole, punteggiatura)
+- extra:    record presenti solo su Scholar, in proporzione a n
+
+USO:
+    python benchmarks/synthetic.py --n 1000 --overlap 0.8 --noise 0.2 --out data/raw
+"""
+
+import argparse
+import random
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+CORE_PATH = project_root / "data" / "external" / "core.csv"
+SCIMAGO_PATH = project_root / "data" / "external" / "scimago_clean.csv"
+
+WORDS = (
+    "learning deep neural network graph model analysis data system efficient "
+    "scalable robust adaptive distributed federated optimization approach novel "
+    "framework detection recognition semantic retrieval query index stream cloud "
+    "edge privacy secure attack verification software testing program synthesis "
+    "language transformer attention reinforcement multi agent planning vision "
+    "image segmentation sensor wireless energy aware scheduling parallel memory "
+    "cache compiler benchmark evaluation survey towards using based via for of "
+    "in with on and a the"
+).split()
+
+TYPES = [
+    ("Conference Proceeding", "cp", 0.45),
+    ("Journal", "ar", 0.45),
+    ("Book Series", "ch", 0.05),
+    ("Book", "bk", 0.05),
+]
+
+JOURNAL_FALLBACK = [
+    "IEEE Transactions on Software Engineering", "ACM Computing Surveys",
+    "Information Sciences", "Pattern Recognition", "Neurocomputing",
+    "Journal of Systems and Software", "Expert Systems with Applications",
+    "IEEE Transactions on Knowledge and Data Engineering",
+]
+
+
+def _load_venues():
+    conferences, journals = [], list(JOURNAL_FALLBACK)
+    if CORE_PATH.exists():
+        core = pd.read_csv(CORE_PATH, on_bad_lines="skip", quotechar='"')
+        conferences = core.iloc[:, 0].dropna().astype(str).str.strip().tolist()
+    if SCIMAGO_PATH.exists():
+        sjr = pd.read_csv(SCIMAGO_PATH, on_bad_lines="skip", quotechar='"')
+        title_col = next((c for c in sjr.columns if "title" in c.lower()), None)
+        if title_col:
+            journals = sjr[title_col].dropna().astype(str).str.strip().tolist()
+    if not conferences:
+        conferences = ["International Conference on Software Engineering"]
+    return conferences, journals
+
+
+def _make_title(rng):
+    words = rng.choices(WORDS, k=rng.randint(6, 14))
+    return " ".join(words).capitalize()
+
+
+def _add_noise(title, rng):
+    words = title.split()
+    kind = rng.random()
+    if kind < 0.3 and len(words) > 4:
+        words.pop(rng.randrange(len(words)))
+    elif kind < 0.6:
+        i = rng.randrange(len(words))
+        w = words[i]
+        if len(w) > 3:
+            j = rng.randrange(len(w) - 1)
+            words[i] = w[:j] + w[j + 1] + w[j] + w[j + 2:]
+    elif kind < 0.8:
+        words = [w.upper() if rng.random() < 0.5 else w for w in words]
+    else:
+        words[-1] = words[-1] + rng.choice([".", ":", "?", " (extended abstract)"])
+    return " ".join(words)
+
+
+def _abbreviate(venue, rng):
+    # Scholar riporta spesso la venue abbreviata o con l'anno
+    if rng.random() < 0.5:
+        return venue
+    short = venue.replace("International", "Int.").replace("Conference", "Conf.") \
+                 .replace("Proceedings", "Proc.").replace("Transactions", "Trans.")
+    return f"{short}, {rng.randint(1, 40)}"
+
+
+def generate_profile(n=1000, overlap=0.8, noise=0.2, extra=0.3, seed=0):
+    """Ritorna (scopus_df, scholar_df) con le colonne prodotte dai fetcher."""
+    rng = random.Random(seed)
+    conferences, journals = _load_venues()
+
+    scopus_rows, scholar_rows = [], []
+    for i in range(n):
+        title = _make_title(rng)
+        year = rng.randint(1995, 2025)
+        doc_type, subtype, _ = rng.choices(TYPES, weights=[t[2] for t in TYPES])[0]
+        venue = rng.choice(conferences if doc_type == "Conference Proceeding" else journals)
+        citations = int(rng.paretovariate(1.3)) - 1
+
+        scopus_rows.append({
+            "title": title,
+            "year": year,
+            "citations_scopus": citations,
+            "venue_scopus": venue,
+            "doi": f"10.5555/synthetic.{seed}.{i}",
+            "document_type": doc_type,
+            "source_type": subtype,
+        })
+
+        if rng.random() < overlap:
+            scholar_rows.append({
+                "title": _add_noise(title, rng) if rng.random() < noise else title,
+                "year": year,
+                "citations_scholar": int(citations * rng.uniform(1.0, 1.8)),
+                "venue": _abbreviate(venue, rng),
+                "link": "",
+                "source": "Scholar",
+            })
+
+    for _ in range(int(n * extra)):
+        scholar_rows.append({
+            "title": _make_title(rng),
+            "year": rng.randint(1995, 2025),
+            "citations_scholar": int(rng.paretovariate(1.5)) - 1,
+            "venue": rng.choice(["arXiv preprint", "PhD Thesis", "Technical Report", ""]),
+            "link": "",
+            "source": "Scholar",
+        })
+
+    rng.shuffle(scholar_rows)
+    return pd.DataFrame(scopus_rows), pd.DataFrame(scholar_rows)
+
+
+def write_profile(out_dir, name, **kwargs):
+    """Scrive {name}_Scopus.csv e {name}_Scholar.csv in out_dir e ritorna i due path."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    scopus_df, scholar_df = generate_profile(**kwargs)
+    scopus_file = out_dir / f"{name}_Scopus.csv"
+    scholar_file = out_dir / f"{name}_Scholar.csv"
+    scopus_df.to_csv(scopus_file, index=False)
+    scholar_df.to_csv(scholar_file, index=False)
+    return scopus_file, scholar_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera CSV sintetici Scopus/Scholar")
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--overlap", type=float, default=0.8)
+    parser.add_argument("--noise", type=float, default=0.2)
+    parser.add_argument("--extra", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--name", default="Synthetic_Author")
+    parser.add_argument("--out", default="data/raw")
+    args = parser.parse_args()
+
+    files = write_profile(args.out, args.name, n=args.n, overlap=args.overlap,
+                          noise=args.noise, extra=args.extra, seed=args.seed)
+    for f in files:
+        print(f"✓ {f}")
+
+
+if __name__ == "__main__":
+    main()
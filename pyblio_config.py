@@ -4,7 +4,8 @@ MODULO DI CONFIGURAZIONE PYBLIOMETRICS
 ========================================
 
 Questo modulo gestisce l'intera configurazione di Pybliometrics per i sistemi Windows.
-Inizializza automaticamente la variabile CONFIG e crea le directory necessarie.
+Inizializza la variabile CONFIG e crea le directory necessarie al primo utilizzo
+di una classe Scopus (oppure chiamando esplicitamente init_pybliometrics()).
 
 USO:
     from config.pyblio_config import AuthorRetrieval, ScopusSearch
@@ -21,38 +22,15 @@ Questo modulo gestisce tutto ciò automaticamente.
 """
 
 import os
+import threading
 from pathlib import Path
 import configparser
 
-# ============================================================================
-# PASSO 1: Setup della Configurazione
-# ============================================================================
+# Nessuna operazione costosa all'import: la lettura del config.ini, la creazione
+# delle directory e l'import di pybliometrics avvengono in init_pybliometrics(),
+# chiamata automaticamente al primo accesso a una delle classi esportate.
 
-# Definisce il percorso del file di configurazione
 config_file = Path.home() / '.pybliometrics' / 'config.ini'
-os.environ['PYB_CONFIG_FILE'] = str(config_file)
-
-# ============================================================================
-# PASSO 2: Inizializzazione della Variabile CONFIG
-# ============================================================================
-# Questo è critico per Pybliometrics 4.x su Windows
-# La funzione get_config() verifica questa variabile globale
-
-import pybliometrics.utils.startup as startup
-
-# Legge il file di configurazione
-config = configparser.ConfigParser()
-config.read(config_file)
-
-# Imposta la variabile CONFIG che Pybliometrics verifica
-startup.CONFIG = config
-
-# ============================================================================
-# PASSO 3: Creazione della Struttura delle Directory
-# ============================================================================
-# Pybliometrics necessita di una specifica struttura di directory per il caching dei risultati.
-# Queste vengono create automaticamente al primo avvio, ma qui ne garantiamo l'esistenza.
-
 scopus_dir = Path.home() / '.pybliometrics' / 'Scopus'
 
 subdirs = [
@@ -74,33 +52,154 @@ subdirs = [
     'subject_classification'
 ]
 
-for subdir in subdirs:
-    (scopus_dir / subdir).mkdir(parents=True, exist_ok=True)
+# URL alternativo per le API Scopus (es. server finto per i test di carico:
+# SCOPUS_BASE_URL=http://127.0.0.1:8765). Se vuoto si usa api.elsevier.com
+SCOPUS_BASE_URL = os.getenv("SCOPUS_BASE_URL", "")
+ELSEVIER_BASE_URL = "https://api.elsevier.com"
+
+config = None
+_init_lock = threading.Lock()
+
+
+def _api_name(url):
+    """Nome dell'API pybliometrics (es. 'AbstractRetrieval') a partire dall'URL richiesto."""
+    from pybliometrics.utils.constants import URLS
+
+    matches = [(len(base), api) for api, base in URLS.items() if url.startswith(base)]
+    return max(matches)[1] if matches else "unknown"
+
+
+def _bucket_name(api, key):
+    from src.core import key_pool
+    return f"{api}@{key_pool.fingerprint(key)}" if key else api
+
+
+def _on_scopus_response(resp, *args, **kwargs):
+    from src.core import telemetry, rate_limit, key_pool
+
+    api = _api_name(resp.url)
+    key = resp.request.headers.get("X-ELS-APIKey") if resp.request is not None else None
+    telemetry.count("api_calls_total", service="scopus", api=api)
+    if resp.status_code == 429:
+        telemetry.count("api_throttled_total", service="scopus", api=api)
+    rate_limit.record_response(_bucket_name(api, key), resp.status_code, resp.headers)
+    if key:
+        try:
+            remaining = int(resp.headers["X-RateLimit-Remaining"])
+        except (KeyError, ValueError):
+            remaining = None
+        try:
+            reset = float(resp.headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            reset = None
+        try:
+            retry_after = float(resp.headers["Retry-After"])
+        except (KeyError, ValueError):
+            retry_after = None
+        key_pool.report("scopus", key, resp.status_code, remaining=remaining, reset=reset, retry_after=retry_after)
+
+
+def _instrument_sessions():
+    """
+    Ogni richiesta HTTP di pybliometrics passa da get_session(): aggiungo un hook
+    sulle risposte (metriche, quota residua) e faccio passare ogni GET dal
+    pool di chiavi (src/core/key_pool.py) e dal limitatore condiviso tra
+    processi (src/core/rate_limit.py), con un bucket per API e per chiave.
+    """
+    import importlib
+    gc_module = importlib.import_module("pybliometrics.utils.get_content")
+    original = gc_module.get_session
+    if getattr(original, "_instrumented", False):
+        return
+
+    def get_session():
+        from src.core import rate_limit, key_pool
+
+        session = original()
+        session.hooks["response"].append(_on_scopus_response)
+        send = session.get
+
+        def limited_get(url, *args, **kwargs):
+            headers = kwargs.get("headers") or {}
+            key = None
+            # Con un insttoken la chiave e' vincolata al token: resta quella scelta da pybliometrics
+            if "X-ELS-APIKey" in headers and "X-ELS-Insttoken" not in headers:
+                key = key_pool.choose("scopus")
+                headers["X-ELS-APIKey"] = key
+            rate_limit.acquire(_bucket_name(_api_name(url), key))
+            return send(url, *args, **kwargs)
+
+        session.get = limited_get
+        return session
+
+    get_session._instrumented = True
+    gc_module.get_session = get_session
+
+
+def point_scopus_to(base_url):
+    """Reindirizza tutte le chiamate pybliometrics verso base_url (stesso path delle API Elsevier)."""
+    from pybliometrics.utils.constants import URLS
+
+    base_url = base_url.rstrip("/")
+    for api, url in URLS.items():
+        if url.startswith(ELSEVIER_BASE_URL):
+            URLS[api] = base_url + url[len(ELSEVIER_BASE_URL):]
+
+
+def init_pybliometrics():
+    """
+    Inizializza Pybliometrics una sola volta per processo (idempotente).
+    Puo' essere chiamata esplicitamente in fase di avvio (es. warmup del worker),
+    altrimenti viene eseguita al primo utilizzo delle classi Scopus.
+    """
+    global config
+    if config is not None:
+        return config
+
+    with _init_lock:
+        if config is not None:
+            return config
+
+        # ====================================================================
+        # PASSO 1: Setup della Configurazione
+        # ====================================================================
+        os.environ['PYB_CONFIG_FILE'] = str(config_file)
+
+        # ====================================================================
+        # PASSO 2: Inizializzazione della Variabile CONFIG
+        # ====================================================================
+        # Questo è critico per Pybliometrics 4.x su Windows
+        # La funzione get_config() verifica questa variabile globale
+        import pybliometrics.utils.startup as startup
+
+        parsed = configparser.ConfigParser()
+        parsed.optionxform = str  # come pybliometrics: chiavi case-sensitive
+        parsed.read(config_file)
+        startup.CONFIG = parsed
+
+        if SCOPUS_BASE_URL:
+            point_scopus_to(SCOPUS_BASE_URL)
+        _instrument_sessions()
+
+        # ====================================================================
+        # PASSO 3: Creazione della Struttura delle Directory
+        # ====================================================================
+        # Pybliometrics necessita di una specifica struttura di directory per il caching dei risultati.
+        for subdir in subdirs:
+            (scopus_dir / subdir).mkdir(parents=True, exist_ok=True)
+        # Cartelle delle view (es. scopus_search/COMPLETE) per i percorsi del config.ini
+        if parsed.has_section('Directories'):
+            startup.create_cache_folders(parsed)
+
+        config = parsed
+    return config
 
-# ============================================================================
-# PASSO 4: Importazione delle Classi Pybliometrics
-# ============================================================================
-# Ora che la configurazione è impostata, possiamo importare ed esportare le classi principali
-
-from pybliometrics.scopus import (
-    ScopusSearch,               # Ricerca di pubblicazioni
-    AuthorRetrieval,            # Recupero informazioni autore
-    AbstractRetrieval,          # Recupero dettagli pubblicazione
-    AffiliationRetrieval,       # Recupero informazioni istituzione
-    AuthorSearch,               # Ricerca di autori
-    AffiliationSearch,          # Ricerca di istituzioni
-    SerialSearch,               # Ricerca di riviste/serials
-    SerialTitle,                # Recupero informazioni riviste
-    PlumXMetrics,               # Recupero metriche PlumX (articoli)
-    SubjectClassifications      # Recupero classificazioni aree tematiche
-)
-
-from pybliometrics.scopus.abstract_retrieval import AbstractRetrieval
 
 # ============================================================================
 # ESPORTO LE CLASSI
 # ============================================================================
-# Rendo disponibili tutte le classi principali per l'importazione diretta
+# Rendo disponibili tutte le classi principali per l'importazione diretta.
+# L'import di pybliometrics.scopus avviene solo al primo accesso (PEP 562).
 
 __all__ = [
     'ScopusSearch',
@@ -115,6 +214,19 @@ __all__ = [
     'SubjectClassifications'
 ]
 
+
+def __getattr__(name):
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    init_pybliometrics()
+    import pybliometrics.scopus as pyb_scopus
+
+    value = getattr(pyb_scopus, name)
+    globals()[name] = value
+    return value
+
+
 # ============================================================================
 # ESEMPI DI UTILIZZO
 # ============================================================================
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+charts.py
+=========
+Grafici standard dell'autore, generati una sola volta quando si scrive la cache.
+
+- chart_data(): aggregati per i grafici (pubblicazioni e citazioni per anno
+  Scopus/Scholar, distribuzione rank CORE e quartili, anni senza pubblicazioni),
+  calcolati dal dataset unificato gia' in memoria
+- schedule(): rendering in un processo separato (ProcessPoolExecutor): il
+  disegno con matplotlib non occupa il GIL dei thread che servono le richieste
+- render_charts(): PNG con backend headless (Agg) nella cartella dei risultati
+
+I PNG stanno nella cartella della cache e vengono serviti come file statici
+(/charts/<cartella>/<grafico>): la dashboard non ricalcola nulla dai CSV.
+"""
+
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CHARTS_ENABLED = os.getenv("CHARTS_ENABLED", "1") != "0"
+# Un solo processo di default: i lavori per la stessa cartella finiscono nell'ordine di invio
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "1"))
+
+CHARTS = {
+    "publications_per_year": "Pubblicazioni per anno",
+    "citations_per_year": "Citazioni per anno di pubblicazione",
+    "rank_distribution": "Distribuzione rank CORE e quartili Scimago",
+    "year_gaps": "Anni senza pubblicazioni",
+}
+
+_executor = None
+_lock = threading.Lock()
+
+
+def chart_data(merged_df, metrics):
+    """Aggregati (piccoli e serializzabili) da passare al processo di rendering."""
+    df = merged_df.copy()
+    df["year"] = pd.to_numeric(df.get("year"), errors="coerce")
+    dated = df[df["year"] > 0]
+    years = list(range(int(dated["year"].min()), int(dated["year"].max()) + 1)) if not dated.empty else []
+    count = lambda mask: dated[mask].groupby(dated["year"].astype(int)).size().reindex(years, fill_value=0).tolist()
+    cites = lambda col: (pd.to_numeric(dated[col], errors="coerce").fillna(0).groupby(dated["year"].astype(int)).sum()
+                         .reindex(years, fill_value=0).astype(int).tolist() if col in dated.columns else [0] * len(years))
+    source = dated.get("source", pd.Series("", index=dated.index)).fillna("").astype(str)
+    distribution = lambda col: (df[col].fillna("N/A").value_counts().to_dict() if col in df.columns else {})
+
+    gaps = str(metrics.get("Anni di non pubblicazione", ""))
+    return {
+        "years": years,
+        "publications_scopus": count(source.str.contains("Scopus")),
+        "publications_scholar": count(source.str.contains("Scholar")),
+        "citations_scopus": cites("citations_scopus"),
+        "citations_scholar": cites("citations_scholar"),
+        "core_rank": distribution("core_rank"),
+        "scimago_quartile": distribution("scimago_quartile"),
+        "missing_years": [int(y) for y in re.findall(r"\d{4}", gaps)],
+        "window": metrics.get("Finestra di valutazione"),
+    }
+
+
+# ============================================================
+#  RENDERING (processo separato)
+# ============================================================
+
+def _save(fig, out_dir, name):
+    path = Path(out_dir) / f"{name}.png"
+    tmp = path.with_name(f".{name}.{os.getpid()}.png")
+    fig.savefig(tmp, dpi=100, bbox_inches="tight")
+    os.replace(tmp, path)
+
+
+def render_charts(data, out_dir):
+    """Disegna i grafici di CHARTS in out_dir (scrittura atomica di ogni PNG). Ritorna i nomi scritti."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    years = data["years"]
+    written = []
+
+    def figure(name):
+        fig, ax = plt.subplots(figsize=(8, 4))
+        ax.set_title(CHARTS[name])
+        return fig, ax
+
+    fig, ax = figure("publications_per_year")
+    ax.bar([y - 0.2 for y in years], data["publications_scopus"], width=0.4, label="Scopus")
+    ax.bar([y + 0.2 for y in years], data["publications_scholar"], width=0.4, label="Scholar")
+    ax.set_xlabel("Anno")
+    ax.legend()
+    written.append("publications_per_year")
+    _save(fig, out_dir, written[-1])
+    plt.close(fig)
+
+    fig, ax = figure("citations_per_year")
+    ax.plot(years, data["citations_scopus"], marker="o", label="Scopus")
+    ax.plot(years, data["citations_scholar"], marker="o", label="Scholar")
+    ax.set_xlabel("Anno di pubblicazione")
+    ax.legend()
+    written.append("citations_per_year")
+    _save(fig, out_dir, written[-1])
+    plt.close(fig)
+
+    fig, (ax_rank, ax_q) = plt.subplots(1, 2, figsize=(8, 4))
+    fig.suptitle(CHARTS["rank_distribution"])
+    for ax, values, order in ((ax_rank, data["core_rank"], ["A*", "A", "B", "C", "N/A"]),
+                              (ax_q, data["scimago_quartile"], ["Q1", "Q2", "Q3", "Q4", "N/A"])):
+        labels = order + sorted(set(values) - set(order))
+        ax.bar(labels, [values.get(label, 0) for label in labels])
+    ax_rank.set_title("CORE")
+    ax_q.set_title("Scimago")
+    written.append("rank_distribution")
+    _save(fig, out_dir, written[-1])
+    plt.close(fig)
+
+    fig, ax = figure("year_gaps")
+    missing = set(data["missing_years"])
+    span = sorted(set(years) | missing)
+    ax.bar(span, [0 if y in missing else 1 for y in span], color="tab:green", label="Con pubblicazioni")
+    ax.bar(sorted(missing), [1] * len(missing), color="tab:red", label="Senza pubblicazioni")
+    ax.set_yticks([])
+    ax.set_xlabel(f"Anno (finestra {data['window']})" if data.get("window") else "Anno")
+    ax.legend()
+    written.append("year_gaps")
+    _save(fig, out_dir, written[-1])
+    plt.close(fig)
+    return written
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: nessun fork di un processo con thread e lock del server gia' attivi
+            _executor = ProcessPoolExecutor(max_workers=CHART_WORKERS, mp_context=get_context("spawn"))
+        return _executor
+
+
+def _log_failure(future, out_dir):
+    if future.exception() is not None:
+        logger.warning("Rendering grafici fallito", extra={"dir": str(out_dir), "error": future.exception()})
+
+
+def schedule(data, out_dir):
+    """Avvia il rendering in background; ritorna il Future (None se i grafici sono disattivati)."""
+    if not CHARTS_ENABLED:
+        return None
+    future = _pool().submit(render_charts, data, str(out_dir))
+    future.add_done_callback(lambda f: _log_failure(f, out_dir))
+    return future
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+citation_history.py
+===================
+Storico delle citazioni (Scopus e Scholar) per autore, solo in aggiunta.
+
+Ogni ricalcolo dei risultati sovrascrive i conteggi precedenti: per domande
+come "citazioni guadagnate quest'anno" o "andamento dell'H-index" servono le
+rilevazioni passate. record() le accoda, trends() le legge senza nessuna
+chiamata API.
+
+Formato (data/history/<cartella risultati>/), colonne binarie a larghezza
+fissa lette con numpy.fromfile, una riga per valore cambiato:
+    ts.i8         istante della rilevazione (secondi epoch, int64)
+    pub.u4        indice della pubblicazione in publications.csv (AUTHOR_ROW = totale autore)
+    source.u1     0 = Scopus, 1 = Scholar
+    citations.i4  conteggio
+    publications.csv  chiave (DOI o titolo normalizzato), titolo e anno; riga i = indice i
+
+Si scrive solo quando un conteggio cambia rispetto all'ultimo registrato
+(17 byte per valore cambiato). Una pubblicazione che sparisce dai risultati (o
+resta senza conteggio per una fonte) riceve una riga TOMBSTONE: non conta piu'
+nei totali ne' nell'H-index finche' non ricompare. Se un merge successivo trova
+il DOI di una pubblicazione registrata per titolo, la sua riga in
+publications.csv passa alla chiave DOI e lo storico resta lo stesso. Le colonne si accodano dopo il dizionario
+delle pubblicazioni: una scrittura interrotta lascia al massimo una coda
+incompleta, ignorata in lettura (si usa la lunghezza della colonna piu' corta)
+e tagliata alla scrittura successiva. Le scritture di piu' processi (server e
+refresh) si alternano con un flock su <cartella>/.lock.
+"""
+
+import csv
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: resta solo il lock del processo
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = Path("data/history")
+SOURCES = ("scopus", "scholar")
+AUTHOR_ROW = np.iinfo(np.uint32).max
+COLUMNS = {"ts": np.int64, "pub": np.uint32, "source": np.uint8, "citations": np.int32}
+PUBLICATIONS = "publications.csv"
+TOMBSTONE = -1  # conteggio: pubblicazione non piu' presente per quella fonte
+
+_lock = threading.Lock()
+
+
+def history_dir(folder, root=None):
+    return Path(root or HISTORY_DIR) / folder
+
+
+@contextmanager
+def _locked(path):
+    """Lock esclusivo sullo storico della cartella, tra thread e tra processi."""
+    path.mkdir(parents=True, exist_ok=True)
+    with _lock, open(path / ".lock", "a") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _column_file(path, name):
+    return path / f"{name}.{np.dtype(COLUMNS[name]).str[1:]}"
+
+
+def publication_key(title, doi=None):
+    """Chiave stabile della pubblicazione: il DOI se c'e', altrimenti il titolo normalizzato."""
+    if isinstance(doi, str) and doi.strip():
+        return "doi:" + doi.strip().lower()
+    return "title:" + " ".join((title if isinstance(title, str) else "").lower().split())
+
+
+def _read_publications(path):
+    try:
+        with open(path / PUBLICATIONS, newline="", encoding="utf-8") as f:
+            return [row for row in csv.reader(f)][1:]
+    except OSError:
+        return []
+
+
+def _write_publications(path, rows, append=False):
+    """Accoda rows a publications.csv, oppure (append=False) lo riscrive in modo atomico."""
+    target = path / PUBLICATIONS
+    header = not append or not target.exists()
+    out = target if append else path / f"{PUBLICATIONS}.tmp"
+    with open(out, "a" if append else "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if header:
+            writer.writerow(["key", "title", "year"])
+        writer.writerows(rows)
+    if not append:
+        out.replace(target)
+
+
+def _same_publication(key, title, known, by_title):
+    """
+    Indice di una pubblicazione gia' registrata con l'altra chiave: per titolo
+    prima che il merge trovasse il DOI, o per DOI quando il DOI non c'e' piu'
+    (solo se un'unica riga DOI ha quel titolo). None se non c'e'.
+    """
+    title_key = publication_key(title)
+    rows = by_title.get(title_key, [])
+    if key.startswith("doi:"):
+        return next((i for i in rows if known[i][0] == title_key), None)
+    doi_rows = [i for i in rows if known[i][0].startswith("doi:")]
+    return doi_rows[0] if len(doi_rows) == 1 else None
+
+
+def read_columns(folder, root=None):
+    """Colonne dello storico come array numpy (dict vuoto di array se non c'e' storico)."""
+    path = history_dir(folder, root)
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        try:
+            columns[name] = np.fromfile(_column_file(path, name), dtype=dtype)
+        except (OSError, ValueError):
+            columns[name] = np.array([], dtype=dtype)
+    rows = min(len(c) for c in columns.values())
+    return {name: c[:rows] for name, c in columns.items()}
+
+
+def _last_values(columns):
+    """{(pub, source): ultimo conteggio registrato}."""
+    if not len(columns["ts"]):
+        return {}
+    code = columns["pub"].astype(np.int64) * len(SOURCES) + columns["source"]
+    # np.unique sull'array rovesciato: primo indice = ultima occorrenza
+    _, last = np.unique(code[::-1], return_index=True)
+    last = len(code) - 1 - last
+    return {(int(columns["pub"][i]), int(columns["source"][i])): int(columns["citations"][i]) for i in last
+            if columns["citations"][i] != TOMBSTONE}
+
+
+# ============================================================
+#  SCRITTURA
+# ============================================================
+
+def record(folder, enriched_df, root=None, now=None):
+    """
+    Accoda i conteggi per pubblicazione e i totali dell'autore (entrambe le fonti)
+    cambiati dall'ultima rilevazione, e una TOMBSTONE per le pubblicazioni che non
+    hanno piu' un conteggio. Il totale e' la somma dei conteggi registrati.
+    Ritorna il numero di righe aggiunte.
+    """
+    path = history_dir(folder, root)
+    ts = int(time.time() if now is None else now)
+    doi = enriched_df["doi"] if "doi" in enriched_df.columns else pd.Series(None, index=enriched_df.index)
+    keys = [publication_key(t, d) for t, d in zip(enriched_df["title"], doi)]
+    years = pd.to_numeric(enriched_df.get("year"), errors="coerce")
+
+    with _locked(path):
+        known = _read_publications(path)
+        index = {row[0]: i for i, row in enumerate(known)}
+        by_title = {}
+        for i, row in enumerate(known):
+            by_title.setdefault(publication_key(row[1]), []).append(i)
+        new_pubs, renamed, pubs = [], False, []
+        for key, title, year in zip(keys, enriched_df["title"], years):
+            if key not in index:
+                same = _same_publication(key, title, known, by_title)
+                if same is None:
+                    index[key] = len(known) + len(new_pubs)
+                    new_pubs.append([key, title, "" if pd.isna(year) else int(year)])
+                elif key.startswith("doi:"):
+                    # DOI trovato da un merge successivo: la riga passa alla chiave DOI
+                    del index[known[same][0]]
+                    known[same][0], index[key], renamed = key, same, True
+                else:
+                    index[key] = same
+            pubs.append(index[key])
+        columns = read_columns(folder, root)
+        last = _last_values(columns)
+
+        values = {}
+        for s, source in enumerate(SOURCES):
+            if f"citations_{source}" not in enriched_df.columns:
+                continue
+            counts = pd.to_numeric(enriched_df[f"citations_{source}"], errors="coerce")
+            for pub, c in zip(pubs, counts):
+                if not pd.isna(c):
+                    values[(pub, s)] = int(c)
+            for pub, src in last:
+                if src == s and pub != AUTHOR_ROW and (pub, s) not in values:
+                    values[(pub, s)] = TOMBSTONE
+            values[(int(AUTHOR_ROW), s)] = sum(c for (pub, src), c in values.items()
+                                               if src == s and pub != AUTHOR_ROW and c != TOMBSTONE)
+        changed = sorted((k, v) for k, v in values.items() if last.get(k) != v)
+
+        if renamed:
+            _write_publications(path, known + new_pubs)
+        elif new_pubs:
+            _write_publications(path, new_pubs, append=True)
+        if changed:
+            data = {
+                "ts": [ts] * len(changed),
+                "pub": [k[0] for k, _ in changed],
+                "source": [k[1] for k, _ in changed],
+                "citations": [v for _, v in changed],
+            }
+            rows = len(columns["ts"])
+            for name, dtype in COLUMNS.items():
+                with open(_column_file(path, name), "ab") as f:
+                    # Coda di una scrittura interrotta: le colonne tornano allineate prima di accodare
+                    f.truncate(rows * np.dtype(dtype).itemsize)
+                    np.asarray(data[name], dtype=dtype).tofile(f)
+    return len(changed)
+
+
+# ============================================================
+#  METRICHE DI ANDAMENTO
+# ============================================================
+
+def h_index(counts):
+    counts = np.sort(np.asarray(counts, dtype=np.int64))[::-1]
+    return int(np.sum(counts >= np.arange(1, len(counts) + 1)))
+
+
+def values_at(columns, at):
+    """{(pub, source): conteggio} all'istante at (ultima rilevazione non successiva)."""
+    mask = columns["ts"] <= at
+    return _last_values({name: c[mask] for name, c in columns.items()})
+
+
+def _year_start(year):
+    return int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp())
+
+
+def trends(folder, root=None, now=None):
+    """
+    Andamento per fonte calcolato dallo storico: totale attuale, citazioni
+    guadagnate dall'inizio dell'anno e negli ultimi 365 giorni, H-index a fine
+    di ogni anno. Se lo storico inizia dopo l'inizio del periodo, si misura
+    dalla prima rilevazione ("since"). None se non c'e' storico.
+    """
+    columns = read_columns(folder, root)
+    if not len(columns["ts"]):
+        return None
+    now = int(time.time() if now is None else now)
+    first = int(columns["ts"].min())
+    current_year = datetime.fromtimestamp(now, timezone.utc).year
+    first_year = datetime.fromtimestamp(first, timezone.utc).year
+
+    snapshots = {year: values_at(columns, min(now, _year_start(year + 1) - 1))
+                 for year in range(first_year, current_year + 1)}
+    current = snapshots[current_year]
+    total_at = lambda at, s: values_at(columns, max(at, first)).get((int(AUTHOR_ROW), s))
+
+    result = {"since": datetime.fromtimestamp(first, timezone.utc).isoformat(timespec="seconds"),
+              "snapshots": int(len(np.unique(columns["ts"]))), "sources": {}}
+    for s, source in enumerate(SOURCES):
+        total = current.get((int(AUTHOR_ROW), s))
+        if total is None:
+            continue
+        gained = lambda at: total - (total_at(at, s) or 0)
+        result["sources"][source] = {
+            "total": total,
+            "gained_this_year": gained(_year_start(current_year)),
+            "gained_last_365_days": gained(now - 365 * 86400),
+            "h_index_by_year": [
+                {"year": year, "h_index": h_index([c for (pub, src), c in snap.items() if src == s and pub != AUTHOR_ROW])}
+                for year, snap in snapshots.items()
+            ],
+        }
+    return result
+
+
+def publication_history(folder, root=None):
+    """Storico per pubblicazione come DataFrame (title, year, source, date, citations)."""
+    columns = read_columns(folder, root)
+    pubs = _read_publications(history_dir(folder, root))
+    df = pd.DataFrame(columns)
+    df = df[(df["pub"] != AUTHOR_ROW) & (df["citations"] != TOMBSTONE)]
+    df["title"] = [pubs[i][1] if i < len(pubs) else "" for i in df["pub"]]
+    df["year"] = [pubs[i][2] if i < len(pubs) else "" for i in df["pub"]]
+    df["source"] = df["source"].map(dict(enumerate(SOURCES)))
+    df["date"] = pd.to_datetime(df["ts"], unit="s", utc=True)
+    return df[["title", "year", "source", "date", "citations"]].reset_index(drop=True)
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+coauthors.py
+============
+Rete dei coautori costruita dagli abstract Scopus gia' scaricati.
+
+fetch_author_details salva per ogni pubblicazione gli Scopus ID e i nomi degli
+autori (colonne author_ids / author_names, separati da ";"): il grafo non
+richiede nessuna chiamata API aggiuntiva.
+
+- author_summary(): grafo dell'autore e metriche (coautori distinti, coautori
+  per anno, quota interna/esterna alla coorte), calcolate una volta allo
+  stadio "coauthors" della pipeline e salvate nella cartella dei risultati
+- update_cohort(): aggiunge il grafo dell'autore al grafo di coorte
+  (data/coauthors/cohort.json), aggiornato in modo incrementale; l'elenco
+  dei membri sta anche in cohort.members.json, letto a ogni elaborazione
+  senza caricare il grafo
+- cohort_summary(): numeri aggregati del grafo di coorte
+
+La coorte e' l'insieme degli autori gia' elaborati (membri del grafo di coorte).
+Piu' processi (server e refresh) possono aggiornarla insieme: la lettura-modifica-
+scrittura di cohort.json avviene sotto un flock su cohort.lock.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: resta solo il lock del processo
+    fcntl = None
+
+import networkx as nx
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+COHORT_GRAPH = Path("data/coauthors/cohort.json")
+MAX_CLIQUE_AUTHORS = 50   # oltre questo numero di autori si collegano solo al ricercatore (no cricca)
+TOP_COLLABORATORS = 20
+
+_cohort_lock = threading.Lock()
+
+
+def _split(value):
+    if not isinstance(value, str) or not value.strip():
+        return []
+    return [v.strip() for v in value.split(";")]
+
+
+def paper_authors(scopus_df):
+    """[(anno, [(id, nome), ...])] per ogni pubblicazione con autori noti."""
+    if "author_ids" not in scopus_df.columns:
+        return []
+    names = scopus_df["author_names"] if "author_names" in scopus_df.columns else pd.Series("", index=scopus_df.index)
+    years = pd.to_numeric(scopus_df.get("year"), errors="coerce")
+    papers = []
+    for ids, labels, year in zip(scopus_df["author_ids"], names, years):
+        ids = _split(ids)
+        if ids:
+            labels = _split(labels) + [""] * len(ids)
+            papers.append((None if pd.isna(year) else int(year), list(zip(ids, labels))))
+    return papers
+
+
+def coauthor_ids(scopus_file):
+    """
+    Scopus ID di tutti gli autori delle pubblicazioni (legge solo la colonna
+    author_ids). Insieme vuoto se il file manca o non si legge: l'errore lo
+    riporta il merge.
+    """
+    try:
+        df = pd.read_csv(scopus_file, usecols=lambda c: c == "author_ids", dtype=str)
+    except (OSError, ValueError):
+        return set()
+    return {aid for ids in df.get("author_ids", []) for aid in _split(ids)}
+
+
+# ============================================================
+#  GRAFO E METRICHE PER AUTORE
+# ============================================================
+
+def author_graph(scopus_df, author_id):
+    """
+    Grafo di coautoraggio delle pubblicazioni dell'autore: un nodo per Scopus ID,
+    un arco per ogni coppia di autori dello stesso articolo (peso = articoli in comune).
+    """
+    author_id = str(author_id)
+    graph = nx.Graph()
+    graph.add_node(author_id)
+    for _, authors in paper_authors(scopus_df):
+        for aid, name in authors:
+            if aid not in graph:
+                graph.add_node(aid, name=name)
+            elif name and not graph.nodes[aid].get("name"):
+                graph.nodes[aid]["name"] = name
+        ids = sorted({aid for aid, _ in authors} | {author_id})
+        pairs = ([(a, b) for i, a in enumerate(ids) for b in ids[i + 1:]] if len(ids) <= MAX_CLIQUE_AUTHORS
+                 else [(author_id, a) for a in ids if a != author_id])
+        for a, b in pairs:
+            if graph.has_edge(a, b):
+                graph[a][b]["weight"] += 1
+            else:
+                graph.add_edge(a, b, weight=1)
+    return graph
+
+
+def author_summary(scopus_df, author_id, cohort_ids=()):
+    """
+    Metriche di rete dell'autore: {"graph", "metrics", "collaborators", "per_year"}.
+    collaborators: DataFrame (id, nome, articoli, primo/ultimo anno, interno alla coorte).
+    per_year: DataFrame (anno, coautori distinti, nuovi coautori).
+    """
+    author_id = str(author_id)
+    cohort = {str(c) for c in cohort_ids} - {author_id}
+    graph = author_graph(scopus_df, author_id)
+
+    papers = Counter()
+    years = defaultdict(set)
+    by_year = defaultdict(set)
+    for year, authors in paper_authors(scopus_df):
+        for aid, _ in authors:
+            if aid == author_id:
+                continue
+            papers[aid] += 1
+            if year:
+                years[aid].add(year)
+                by_year[year].add(aid)
+
+    collaborators = pd.DataFrame([
+        {
+            "author_id": aid,
+            "name": graph.nodes[aid].get("name", ""),
+            "papers": n,
+            "first_year": min(years[aid]) if years[aid] else None,
+            "last_year": max(years[aid]) if years[aid] else None,
+            "internal": aid in cohort,
+        }
+        for aid, n in papers.most_common()
+    ], columns=["author_id", "name", "papers", "first_year", "last_year", "internal"])
+
+    seen = set()
+    per_year_rows = []
+    for year in sorted(by_year):
+        per_year_rows.append({"year": year, "collaborators": len(by_year[year]), "new_collaborators": len(by_year[year] - seen)})
+        seen |= by_year[year]
+    per_year = pd.DataFrame(per_year_rows, columns=["year", "collaborators", "new_collaborators"])
+
+    total = len(collaborators)
+    internal = int(collaborators["internal"].sum()) if total else 0
+    metrics = {
+        "Coautori distinti": total,
+        "Articoli con coautori": sum(1 for _, authors in paper_authors(scopus_df) if len(authors) > 1),
+        "Coautori ricorrenti (>=2 articoli)": int((collaborators["papers"] >= 2).sum()) if total else 0,
+        "Quota coautori interni alla coorte": f"{internal / total * 100:.1f}%" if total else "N/A",
+        "Quota coautori esterni": f"{(total - internal) / total * 100:.1f}%" if total else "N/A",
+    }
+    return {"graph": graph, "metrics": metrics, "collaborators": collaborators, "per_year": per_year}
+
+
+def save_summary(summary, author_dir):
+    """Scrive coauthors.csv e coauthors_per_year.csv nella cartella dei risultati."""
+    author_dir = Path(author_dir)
+    summary["collaborators"].to_csv(author_dir / "coauthors.csv", index=False)
+    summary["per_year"].to_csv(author_dir / "coauthors_per_year.csv", index=False)
+
+
+def read_summary(author_dir, top=TOP_COLLABORATORS):
+    """Dati gia' calcolati per la dashboard: nessun ricalcolo, solo lettura dei CSV."""
+    author_dir = Path(author_dir)
+    try:
+        collaborators = pd.read_csv(author_dir / "coauthors.csv", dtype={"author_id": str})
+        per_year = pd.read_csv(author_dir / "coauthors_per_year.csv")
+    except (OSError, pd.errors.EmptyDataError):
+        return None
+    return {
+        "top_collaborators": collaborators.head(top).fillna("").to_dict(orient="records"),
+        "per_year": per_year.to_dict(orient="records"),
+        "total": len(collaborators),
+        "internal": int(collaborators["internal"].sum()) if len(collaborators) else 0,
+    }
+
+
+# ============================================================
+#  GRAFO DI COORTE (incrementale)
+# ============================================================
+
+def load_cohort(path=None):
+    path = Path(path or COHORT_GRAPH)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return nx.Graph(members=[])
+    return nx.node_link_graph(data, edges="edges")
+
+
+def members_file(path=None):
+    return Path(path or COHORT_GRAPH).with_suffix(".members.json")
+
+
+def cohort_members(path=None):
+    """Membri della coorte dall'indice cohort.members.json (dal grafo se l'indice manca)."""
+    path = Path(path or COHORT_GRAPH)
+    try:
+        return json.loads(members_file(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return list(load_cohort(path).graph.get("members", []))
+
+
+def _write_atomic(path, data):
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _contribution(cohort, author_id):
+    return {frozenset((a, b)): data["by_author"][author_id] for a, b, data in cohort.edges(data=True)
+            if author_id in data.get("by_author", {})}
+
+
+@contextmanager
+def _cohort_locked(path):
+    """Lock esclusivo sul grafo di coorte, tra thread e tra processi."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _cohort_lock, open(path.with_suffix(".lock"), "a") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def update_cohort(author_id, graph, path=None):
+    """
+    Sostituisce nel grafo di coorte il contributo dell'autore con il suo grafo
+    attuale (gli archi restano per autore, quindi un ricalcolo non raddoppia i pesi)
+    e lo salva in modo atomico, con l'indice dei membri. Se il contributo non e'
+    cambiato (es. ricalcolo per CORE/Scimago) il file non viene riscritto.
+    """
+    path = Path(path or COHORT_GRAPH)
+    author_id = str(author_id)
+    with _cohort_locked(path):
+        cohort = load_cohort(path)
+        new = {frozenset((a, b)): data["weight"] for a, b, data in graph.edges(data=True)}
+        if author_id in cohort.graph["members"] and _contribution(cohort, author_id) == new \
+                and members_file(path).exists():
+            return cohort
+        for a, b, data in list(cohort.edges(data=True)):
+            contributions = data.get("by_author", {})
+            if contributions.pop(author_id, None) is not None:
+                data["weight"] = sum(contributions.values())
+                if not contributions:
+                    cohort.remove_edge(a, b)
+        for node, attrs in graph.nodes(data=True):
+            cohort.add_node(node, **{k: v for k, v in attrs.items() if v})
+        for a, b, data in graph.edges(data=True):
+            if not cohort.has_edge(a, b):
+                cohort.add_edge(a, b, by_author={})
+            edge = cohort[a][b]
+            edge["by_author"][author_id] = data["weight"]
+            edge["weight"] = sum(edge["by_author"].values())
+        cohort.remove_nodes_from([n for n in list(cohort.nodes) if cohort.degree(n) == 0
+                                  and n not in cohort.graph["members"] and n != author_id])
+        if author_id not in cohort.graph["members"]:
+            cohort.graph["members"].append(author_id)
+
+        _write_atomic(path, nx.node_link_data(cohort, edges="edges"))
+        _write_atomic(members_file(path), cohort.graph["members"])
+    return cohort
+
+
+def cohort_summary(path=None):
+    """Numeri aggregati del grafo di coorte (membri, nodi, archi, collaborazioni interne)."""
+    cohort = load_cohort(path)
+    members = set(cohort.graph.get("members", []))
+    internal_edges = [(a, b) for a, b in cohort.edges if a in members and b in members]
+    return {
+        "members": len(members),
+        "authors": cohort.number_of_nodes(),
+        "edges": cohort.number_of_edges(),
+        "internal_collaborations": len(internal_edges),
+        "components": nx.number_connected_components(cohort) if cohort.number_of_nodes() else 0,
+    }
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+identity.py
+===========
+Controllo preliminare (pre-flight) dell'identita' dell'autore.
+
+Prima del download completo (un AbstractRetrieval per ogni paper Scopus e
+tutte le pagine Scholar) scarica un campione economico:
+- la prima pagina del profilo Scholar (ordinata per data, 1 chiamata)
+- l'elenco dei titoli Scopus senza abstract (1-2 chiamate ScopusSearch)
+
+e stima la sovrapposizione dei titoli nella finestra di anni coperta dal
+campione Scholar. Una scelta sbagliata costa cosi' un paio di chiamate
+invece di centinaia.
+
+Esiti possibili:
+- "ok":       sovrapposizione sufficiente, si procede col download completo
+- "uncertain": sovrapposizione bassa, serve una conferma dell'utente
+- "mismatch": sovrapposizione quasi nulla, si interrompe
+
+Lo stesso confronto ordina gli omonimi restituiti da AuthorSearch
+(rank_candidates): ogni candidato riceve una confidenza e, se uno
+emerge chiaramente, viene selezionato in automatico. Con molti omonimi
+si confrontano solo i primi RANKING_MAX_CANDIDATES per numero di documenti
+(likely_first): gli altri restano in coda senza confidenza e senza chiamate.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rapidfuzz import process, fuzz
+
+from src.core import telemetry
+from src.fetchers import scopus, scholar
+from src.merge import fuzzy_merge
+
+logger = logging.getLogger(__name__)
+
+# Sotto questa soglia si chiede conferma (default: la stessa del merge finale)
+PREFLIGHT_CONFIRM_BELOW = float(os.getenv("PREFLIGHT_CONFIRM_BELOW", fuzzy_merge.MIN_MATCH_RATIO))
+# Sotto questa soglia si interrompe senza chiedere
+PREFLIGHT_ABORT_BELOW = float(os.getenv("PREFLIGHT_ABORT_BELOW", "0.15"))
+# Con meno titoli Scopus confrontabili il campione non e' significativo
+PREFLIGHT_MIN_SAMPLE = int(os.getenv("PREFLIGHT_MIN_SAMPLE", "5"))
+
+# Selezione automatica: confidenza minima del primo e distacco dal secondo
+AUTO_SELECT_MIN = float(os.getenv("AUTO_SELECT_MIN", "0.6"))
+AUTO_SELECT_MARGIN = float(os.getenv("AUTO_SELECT_MARGIN", "0.25"))
+RANKING_WORKERS = int(os.getenv("RANKING_WORKERS", "4"))
+RANKING_MAX_CANDIDATES = int(os.getenv("RANKING_MAX_CANDIDATES", "5"))
+SAMPLE_TTL = 600  # secondi di validita' dei campioni in memoria
+
+_samples = {}
+_samples_lock = threading.Lock()
+_key_locks = {}
+
+
+# ============================================================
+#  CAMPIONI (con cache in memoria)
+# ============================================================
+
+def _prune(now):
+    """
+    Rimuove i campioni scaduti e i lock senza campione (chiamata con _samples_lock):
+    un worker longevo non accumula un elenco e un lock per ogni autore cercato.
+    I lock in uso (caricamento in corso) restano.
+    """
+    for key in [k for k, (t, _) in _samples.items() if now - t >= SAMPLE_TTL]:
+        del _samples[key]
+    for key in [k for k, lock in _key_locks.items() if k not in _samples and not lock.locked()]:
+        del _key_locks[key]
+
+
+def _cached(key, loader):
+    """
+    Memoizza per SAMPLE_TTL secondi il campione key, cosi' ricerca candidati,
+    pre-flight e download completo non ripetono le stesse chiamate.
+    """
+    with _samples_lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    # Un solo caricamento per chiave: chi arriva durante il download lo attende
+    with key_lock:
+        now = time.monotonic()
+        with _samples_lock:
+            hit = _samples.get(key)
+        if hit and now - hit[0] < SAMPLE_TTL:
+            telemetry.count("cache_hits_total", cache=key[0])
+            return hit[1]
+        value = loader()
+        with _samples_lock:
+            _prune(now)
+            _samples[key] = (now, value)
+        return value
+
+
+def scholar_sample(scholar_id):
+    """Prima pagina del profilo Scholar (una chiamata SerpApi)."""
+    return _cached(("scholar_sample", scholar_id), lambda: scholar.fetch_scholar_page(scholar_id))
+
+
+def scopus_listing(scopus_id):
+    """Titoli Scopus dell'autore senza abstract (cache anche su disco in pybliometrics)."""
+    return _cached(("scopus_listing", scopus_id), lambda: scopus.fetch_document_listing(scopus_id))
+
+
+def clear_samples():
+    with _samples_lock:
+        _samples.clear()
+        _key_locks.clear()
+
+
+# ============================================================
+#  CONFRONTO TITOLI
+# ============================================================
+
+
+def _year(value):
+    try:
+        return int(str(value)[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def _norm(title):
+    return str(title or "").lower().strip()
+
+
+def title_overlap(scopus_titles, scholar_sample, complete=False):
+    """
+    Stima la quota di titoli Scopus presenti nel campione Scholar.
+
+    scopus_titles / scholar_sample: liste di dict con "title" e "year".
+    Il campione Scholar e' la pagina piu' recente: si confrontano solo i titoli
+    Scopus degli anni interamente coperti (l'anno piu' vecchio del campione
+    puo' essere tagliato a meta', quindi viene escluso se complete=False).
+    Ritorna (matched, compared).
+    """
+    sample_titles = [_norm(r.get("title")) for r in scholar_sample if r.get("title")]
+    sample_years = [y for y in (_year(r.get("year")) for r in scholar_sample) if y]
+    if not sample_titles:
+        return 0, 0
+
+    if complete or not sample_years:
+        window = list(scopus_titles)
+    else:
+        oldest = min(sample_years)
+        window = [t for t in scopus_titles if (_year(t.get("year")) or 0) > oldest]
+        if not window:
+            window = [t for t in scopus_titles if (_year(t.get("year")) or 0) >= oldest]
+
+    matched = 0
+    for t in window:
+        if process.extractOne(_norm(t.get("title")), sample_titles,
+                              scorer=fuzz.token_sort_ratio, score_cutoff=70):
+            matched += 1
+    return matched, len(window)
+
+
+def verdict(matched, compared):
+    if compared < PREFLIGHT_MIN_SAMPLE:
+        return "ok"
+    ratio = matched / compared
+    if ratio < PREFLIGHT_ABORT_BELOW:
+        return "mismatch"
+    if ratio < PREFLIGHT_CONFIRM_BELOW:
+        return "uncertain"
+    return "ok"
+
+
+# ============================================================
+#  PRE-FLIGHT E ORDINAMENTO CANDIDATI
+# ============================================================
+
+def preflight(scopus_id, scholar_id):
+    """
+    Esegue il controllo preliminare e ritorna un dict con:
+    verdict, overlap, matched, compared, scholar_page (da riusare nel download).
+    Se il campione non si puo' scaricare il controllo non blocca ("ok").
+    """
+    with telemetry.stage_timer("preflight", logger, scopus_id=scopus_id, scholar_id=scholar_id):
+        try:
+            page = scholar_sample(scholar_id)
+            listing = scopus_listing(scopus_id)
+        except Exception as e:
+            logger.warning(f"Pre-flight non eseguito: {e}")
+            return {"verdict": "ok", "overlap": None, "matched": 0, "compared": 0, "scholar_page": None}
+
+        if "error" in page:
+            logger.warning(f"Pre-flight non eseguito: {page['error']}")
+            return {"verdict": "ok", "overlap": None, "matched": 0, "compared": 0, "scholar_page": None}
+
+        sample = page.get("articles", [])
+        complete = "next" not in page.get("serpapi_pagination", {})
+        matched, compared = title_overlap(listing, sample, complete=complete)
+
+    result = {
+        "verdict": verdict(matched, compared),
+        "overlap": round(matched / compared, 3) if compared else None,
+        "matched": matched,
+        "compared": compared,
+        "scholar_page": page,
+    }
+    logger.info("Pre-flight identita'", extra={k: v for k, v in result.items() if k != "scholar_page"})
+    telemetry.count("preflight_total", verdict=result["verdict"])
+    return result
+
+
+def _documents(candidate):
+    try:
+        return int(candidate.get("documents") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def likely_first(candidates):
+    """Candidati per numero di documenti Scopus decrescente (a parita', l'ordine di AuthorSearch)."""
+    return sorted(candidates, key=_documents, reverse=True)
+
+
+def rank_candidates(candidates, scholar_id):
+    """
+    Assegna ai primi RANKING_MAX_CANDIDATES candidati Scopus (likely_first) una
+    confidenza (quota dei loro titoli presenti nel campione Scholar) e ritorna
+    (candidati ordinati, id scelto). Gli altri seguono con confidenza None.
+    L'id scelto e' None se nessun candidato emerge chiaramente.
+    I titoli dei candidati vengono scaricati in parallelo.
+    """
+    if not candidates:
+        return candidates, None
+    ordered = likely_first(candidates)
+    candidates, unscored = ordered[:RANKING_MAX_CANDIDATES], ordered[RANKING_MAX_CANDIDATES:]
+
+    with telemetry.stage_timer("rank_candidates", logger, candidates=len(candidates), skipped=len(unscored)):
+        try:
+            page = scholar_sample(scholar_id)
+        except Exception as e:
+            logger.warning(f"Ordinamento candidati non eseguito: {e}")
+            return ordered, None
+        if "error" in page or not page.get("articles"):
+            return ordered, None
+
+        sample = page["articles"]
+        complete = "next" not in page.get("serpapi_pagination", {})
+
+        def score(candidate):
+            try:
+                matched, compared = title_overlap(scopus_listing(candidate["id"]), sample, complete=complete)
+            except Exception as e:
+                logger.warning(f"Titoli non disponibili per {candidate['id']}: {e}")
+                return None
+            return round(matched / compared, 3) if compared else 0.0
+
+        with ThreadPoolExecutor(max_workers=min(RANKING_WORKERS, len(candidates))) as pool:
+            scores = list(pool.map(score, candidates))
+
+    ranked = [dict(c, confidence=s) for c, s in zip(candidates, scores)]
+    ranked.sort(key=lambda c: c["confidence"] if c["confidence"] is not None else -1, reverse=True)
+    ranked += [dict(c, confidence=None) for c in unscored]
+
+    best = ranked[0]["confidence"] or 0
+    runner_up = (ranked[1]["confidence"] or 0) if len(ranked) > 1 else 0
+    selected = ranked[0]["id"] if best >= AUTO_SELECT_MIN and best - runner_up >= AUTO_SELECT_MARGIN else None
+    logger.info("Candidati ordinati", extra={"best": best, "runner_up": runner_up, "auto_select": selected})
+    return ranked, selected
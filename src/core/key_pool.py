@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+key_pool.py
+===========
+Pool di API key con rotazione per Scopus e SerpApi.
+
+Le chiavi si configurano come liste separate da virgola:
+- Scopus:  APIKey nel config.ini di pybliometrics (oppure SCOPUS_API_KEYS)
+- SerpApi: SERPAPI_KEYS (oppure la singola SERPAPI_KEY)
+
+choose(service) sceglie la chiave da usare (strategia KEY_POOL_STRATEGY):
+- "least_used":  meno chiamate nell'ultima ora (default)
+- "round_robin": usata meno di recente
+
+Una chiave che riceve un 429 esce dalla rotazione per THROTTLE_COOLDOWN
+secondi (o Retry-After); una chiave con quota esaurita fino al reset
+indicato dall'API. Lo stato e' nello stesso file SQLite del rate limiter,
+quindi condiviso tra processi. Nel database le chiavi compaiono solo come
+impronta (sha256 troncato), mai in chiaro.
+
+usage() riporta le statistiche per chiave (endpoint /rate_limit).
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.core import rate_limit, telemetry
+
+logger = logging.getLogger(__name__)
+
+KEY_POOL_STRATEGY = os.getenv("KEY_POOL_STRATEGY", "least_used")
+THROTTLE_COOLDOWN = 5.0            # secondi fuori rotazione dopo un 429
+MAX_SUSPENSION_WAIT = 30.0         # se tutte le chiavi tornano entro questo tempo si attende
+EXHAUSTED_COOLDOWN = 3600.0        # se l'API non indica il reset della quota
+USAGE_WINDOW = 3600.0
+
+SERVICES = ("scopus", "serpapi")
+_local = threading.local()
+
+
+class KeysExhausted(RuntimeError):
+    """Nessuna chiave disponibile per il servizio."""
+
+
+def fingerprint(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:10]
+
+
+def configured_keys(service):
+    """Chiavi configurate per il servizio, nell'ordine di configurazione."""
+    if service == "serpapi":
+        raw = os.getenv("SERPAPI_KEYS") or os.getenv("SERPAPI_KEY", "")
+        keys = raw.split(",")
+    elif service == "scopus":
+        if os.getenv("SCOPUS_API_KEYS"):
+            keys = os.getenv("SCOPUS_API_KEYS").split(",")
+        else:
+            from pybliometrics.utils import get_keys
+            keys = get_keys()
+    else:
+        raise ValueError(f"Servizio sconosciuto: {service}")
+    return [k.strip() for k in keys if k and k.strip()]
+
+
+# ============================================================
+#  DATABASE
+# ============================================================
+
+def _connect():
+    path = Path(rate_limit.DB_PATH)
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == path:
+        return conn
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS api_keys ("
+        " service TEXT, fp TEXT, calls INTEGER DEFAULT 0, throttled INTEGER DEFAULT 0,"
+        " window_start REAL DEFAULT 0, window_calls INTEGER DEFAULT 0, last_used REAL DEFAULT 0,"
+        " disabled_until REAL DEFAULT 0, reason TEXT, remaining INTEGER,"
+        " PRIMARY KEY (service, fp))"
+    )
+    _local.conn, _local.path = conn, path
+    return conn
+
+
+def _rows(conn, service, fps):
+    rows = {r[0]: r for r in conn.execute(
+        "SELECT fp, window_start, window_calls, last_used, disabled_until FROM api_keys WHERE service=?", (service,))}
+    return {fp: rows.get(fp, (fp, 0.0, 0, 0.0, 0.0)) for fp in fps}
+
+
+# ============================================================
+#  API PUBBLICA
+# ============================================================
+
+def choose(service, keys=None):
+    """
+    Ritorna la chiave da usare per la prossima chiamata e ne registra l'uso.
+    Se tutte le chiavi sono sospese ma una torna entro MAX_SUSPENSION_WAIT
+    secondi (tipico dopo un 429) la attende, altrimenti lancia KeysExhausted.
+    """
+    keys = configured_keys(service) if keys is None else keys
+    if not keys:
+        raise KeysExhausted(f"Nessuna API key configurata per {service}")
+    by_fp = {fingerprint(k): k for k in keys}
+
+    while True:
+        fp, back_at = _pick(service, by_fp)
+        if fp is not None:
+            telemetry.count("api_key_calls_total", service=service, key=fp)
+            return by_fp[fp]
+        wait = back_at - time.time()
+        if wait > MAX_SUSPENSION_WAIT:
+            raise KeysExhausted(f"Tutte le chiavi {service} sono sospese fino alle "
+                                f"{time.strftime('%H:%M:%S', time.localtime(back_at))}")
+        time.sleep(max(wait, 0.05))
+
+
+def _pick(service, by_fp):
+    """Sceglie e registra una chiave disponibile: (fp, None) oppure (None, primo rientro)."""
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = _rows(conn, service, by_fp)
+        available = [r for r in rows.values() if (r[4] or 0) <= now]
+        if not available:
+            conn.execute("COMMIT")
+            return None, min(r[4] for r in rows.values())
+
+        def window_calls(r):
+            return r[2] if now - (r[1] or 0) < USAGE_WINDOW else 0
+
+        if KEY_POOL_STRATEGY == "round_robin":
+            best = min(available, key=lambda r: r[3] or 0)
+        else:
+            best = min(available, key=lambda r: (window_calls(r), r[3] or 0))
+
+        fp = best[0]
+        fresh_window = now - (best[1] or 0) >= USAGE_WINDOW
+        conn.execute(
+            "INSERT INTO api_keys (service, fp, calls, window_start, window_calls, last_used) VALUES (?, ?, 1, ?, 1, ?) "
+            "ON CONFLICT(service, fp) DO UPDATE SET calls=calls+1, last_used=excluded.last_used, "
+            "window_start=CASE WHEN ? THEN excluded.window_start ELSE window_start END, "
+            "window_calls=CASE WHEN ? THEN 1 ELSE window_calls+1 END",
+            (service, fp, now, now, fresh_window, fresh_window),
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return fp, None
+
+
+def report(service, key, status_code=200, remaining=None, reset=None, retry_after=None, exhausted=False):
+    """
+    Registra l'esito di una chiamata: 429 e quota esaurita tolgono la chiave
+    dalla rotazione fino al reset.
+    """
+    fp = fingerprint(key)
+    now = time.time()
+    disabled_until, reason = None, None
+    if exhausted or (remaining is not None and remaining <= 0):
+        disabled_until, reason = (reset if reset and reset > now else now + EXHAUSTED_COOLDOWN), "quota"
+    elif status_code == 429:
+        disabled_until, reason = now + (retry_after or THROTTLE_COOLDOWN), "429"
+
+    conn = _connect()
+    conn.execute(
+        "INSERT INTO api_keys (service, fp) VALUES (?, ?) ON CONFLICT(service, fp) DO NOTHING", (service, fp))
+    if remaining is not None:
+        conn.execute("UPDATE api_keys SET remaining=? WHERE service=? AND fp=?", (remaining, service, fp))
+    if disabled_until:
+        conn.execute(
+            "UPDATE api_keys SET disabled_until=?, reason=?, throttled=throttled+? WHERE service=? AND fp=?",
+            (disabled_until, reason, int(status_code == 429), service, fp))
+        logger.warning("API key fuori rotazione", extra={"service": service, "key": fp, "reason": reason,
+                                                         "until": time.strftime("%H:%M:%S", time.localtime(disabled_until))})
+        telemetry.count("api_key_disabled_total", service=service, reason=reason)
+
+
+def usage(service=None):
+    """Statistiche per chiave: chiamate totali e nell'ultima ora, 429, quota, sospensione."""
+    conn = _connect()
+    now = time.time()
+    out = {}
+    for svc in ([service] if service else SERVICES):
+        try:
+            fps = [fingerprint(k) for k in configured_keys(svc)]
+        except Exception:
+            fps = []
+        rows = {r[0]: r for r in conn.execute(
+            "SELECT fp, calls, throttled, window_start, window_calls, last_used, disabled_until, reason, remaining "
+            "FROM api_keys WHERE service=?", (svc,))}
+        out[svc] = [
+            {
+                "key": fp,
+                "calls": rows[fp][1] if fp in rows else 0,
+                "calls_last_hour": (rows[fp][4] if now - (rows[fp][3] or 0) < USAGE_WINDOW else 0) if fp in rows else 0,
+                "throttled": rows[fp][2] if fp in rows else 0,
+                "quota_remaining": rows[fp][8] if fp in rows else None,
+                "available": not (fp in rows and (rows[fp][6] or 0) > now),
+                "disabled_reason": rows[fp][7] if fp in rows and (rows[fp][6] or 0) > now else None,
+            }
+            for fp in fps
+        ]
+    return out
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+pipeline.py
+===========
+Memoizzazione per stadio della pipeline di elaborazione.
+
+Gli stadi (vedi processing_logic.run_stages):
+
+    fetch Scopus ─┐
+                  ├─> title_match ─> venue_match ─> [citations] ─> metrics ─> export
+    fetch Scholar ┘      (oppure scopus_only)                                     ^
+    fetch Scopus ─────> coauthors ────────────────────────────────────────────────┘
+
+citations c'e' solo dopo un aggiornamento rapido delle citazioni (file
+.citations.csv in raw_store): cambia metriche ed export, non l'abbinamento
+dei titoli ne' l'arricchimento CORE/Scimago.
+
+Ogni stadio ha una chiave = hash di (nome, STAGE_VERSIONS, sorgente del
+modulo della funzione, chiavi degli ingressi, parametri). L'uscita e' salvata in
+    data/stages/<stadio>/<chiave>.pkl
+e riusata finche' la chiave non cambia. Un'uscita illeggibile (pickle troncato,
+classe non piu' esistente) vale come mancante: si elimina e si ricalcola. Gli stadi fetch sono i file di
+raw_store, identificati dall'hash del contenuto.
+
+Cosi' si riesegue solo cio' che sta a valle di una modifica: un nuovo
+core.csv cambia la chiave di venue_match (e quindi metrics ed export),
+ma non quella di title_match, e nessuno stadio fetch chiama le API.
+
+La cartella dei risultati contiene pipeline.json (manifest) con le chiavi
+usate: se la chiave di export coincide il risultato e' gia' aggiornato.
+
+Ogni modifica di codice, riferimenti o dati lascia le uscite con le chiavi
+precedenti: prune() elimina quelle che nessun manifest usa piu'.
+
+USO (ricalcolo di tutta la coorte dopo un aggiornamento di CORE/Scimago o del codice):
+    python -m src.core.pipeline --rebuild     # ricalcolo, poi pulizia delle uscite inutilizzate
+    python -m src.core.pipeline --prune       # solo pulizia
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.core import telemetry
+
+logger = logging.getLogger(__name__)
+
+STAGE_DIR = Path(os.getenv("PIPELINE_STAGE_DIR", "data/stages"))
+MANIFEST = "pipeline.json"
+# Le uscite piu' recenti non si eliminano: possono appartenere a un'elaborazione
+# in corso che non ha ancora scritto il manifest
+PRUNE_MIN_AGE_HOURS = float(os.getenv("PIPELINE_PRUNE_MIN_AGE_HOURS", "24"))
+
+# Versione esplicita per stadio: da incrementare quando cambia il comportamento
+# in codice non coperto dall'hash del modulo (es. funzioni di supporto in altri moduli)
+STAGE_VERSIONS = {
+    "title_match": "2",
+    "scopus_only": "2",
+    "venue_match": "2",
+    "citations": "1",
+    "metrics": "1",
+    "coauthors": "1",
+    "export": "2",  # 2: anno mancante vuoto invece di 0
+}
+
+_code_hashes = {}
+
+
+# ============================================================
+#  CHIAVI
+# ============================================================
+
+def file_digest(path):
+    """Hash del contenuto di un file (ingresso degli stadi fetch)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def file_stat(path):
+    """(nome, dimensione, mtime) del file, None se manca: firma economica senza leggerlo."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [Path(path).name, st.st_size, st.st_mtime_ns]
+
+
+def code_version(fn):
+    """
+    Hash del sorgente del modulo che definisce la funzione dello stadio: cambia
+    anche con le funzioni di supporto dello stesso modulo. fn puo' essere una tupla.
+    """
+    if isinstance(fn, tuple):
+        return "+".join(code_version(f) for f in fn)
+    name = getattr(fn, "__module__", None) or getattr(fn, "__qualname__", type(fn).__name__)
+    if name not in _code_hashes:
+        try:
+            source = inspect.getsource(sys.modules[name])
+        except (KeyError, OSError, TypeError):
+            source = name
+        _code_hashes[name] = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return _code_hashes[name]
+
+
+def stage_key(stage, fn, inputs, params=None):
+    """Chiave dello stadio: dipende solo da ingressi, parametri e versione del codice."""
+    payload = json.dumps({
+        "stage": stage,
+        "version": STAGE_VERSIONS[stage],
+        "code": code_version(fn),
+        "inputs": inputs,
+        "params": params or {},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# ============================================================
+#  ESECUZIONE
+# ============================================================
+
+def memoize(stage, key, fn, *args, **kwargs):
+    """
+    Ritorna (uscita, eseguito): l'uscita salvata per (stage, key) oppure quella
+    di fn(*args, **kwargs), che viene salvata. La scrittura e' atomica: processi
+    paralleli al massimo ricalcolano lo stesso stadio, senza mai leggere un file a meta'.
+    Un'uscita che non si riesce a leggere viene eliminata e ricalcolata.
+    """
+    path = STAGE_DIR / stage / f"{key}.pkl"
+    try:
+        value = pd.read_pickle(path)
+        telemetry.count("cache_hits_total", cache=f"stage_{stage}")
+        return value, False
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Uscita dello stadio illeggibile, la ricalcolo", extra={"stage": stage, "key": key, "error": e})
+        path.unlink(missing_ok=True)
+
+    with telemetry.stage_timer(stage, logger, key=key):
+        value = fn(*args, **kwargs)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    pd.to_pickle(value, tmp)
+    os.replace(tmp, path)
+    return value, True
+
+
+def read_manifest(author_dir):
+    """Manifest della cartella risultati, oppure {} (cartelle precedenti alla pipeline a stadi)."""
+    try:
+        return json.loads((Path(author_dir) / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(author_dir, manifest):
+    (Path(author_dir) / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def manifests(cache_dir):
+    """(cartella, manifest) per ogni risultato in cache prodotto dalla pipeline a stadi."""
+    if not Path(cache_dir).is_dir():
+        return
+    for author_dir in sorted(Path(cache_dir).iterdir()):
+        manifest = read_manifest(author_dir) if author_dir.is_dir() else {}
+        if manifest:
+            yield author_dir, manifest
+
+
+def prune(cache_dir, min_age_hours=None, now=None):
+    """
+    Elimina da STAGE_DIR le uscite (e i .tmp rimasti) che nessun manifest in
+    cache_dir usa e piu' vecchie di min_age_hours. Ritorna (file, byte) eliminati.
+    """
+    min_age = (PRUNE_MIN_AGE_HOURS if min_age_hours is None else min_age_hours) * 3600
+    now = time.time() if now is None else now
+    used = {(stage, key) for _, manifest in manifests(cache_dir)
+            for stage, key in manifest.get("stages", {}).items()}
+    removed, freed = 0, 0
+    for path in STAGE_DIR.glob("*/*"):
+        key = path.name.split(".", 1)[0]
+        if (path.parent.name, key) in used and path.suffix == ".pkl":
+            continue
+        try:
+            st = path.stat()
+            if now - st.st_mtime < min_age:
+                continue
+            path.unlink()
+        except OSError:
+            continue
+        removed, freed = removed + 1, freed + st.st_size
+    logger.info("Pulizia stadi completata", extra={"removed": removed, "bytes": freed})
+    return removed, freed
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.core import processing_logic
+
+    parser = argparse.ArgumentParser(description="Pipeline a stadi memoizzati")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="riesegue gli stadi non aggiornati per tutti i risultati in cache (nessuna chiamata API)")
+    parser.add_argument("--prune", action="store_true",
+                        help="elimina le uscite degli stadi non usate da nessun risultato in cache")
+    args = parser.parse_args()
+    if args.rebuild:
+        for folder, ran in processing_logic.rebuild_cohort():
+            print(f"{'✓ aggiornato' if ran else '= invariato'} {folder}: {', '.join(ran) or '-'}")
+    if args.rebuild or args.prune:
+        removed, freed = prune(processing_logic.CACHE_DIR)
+        print(f"Eliminate {removed} uscite inutilizzate ({freed / 2**20:.1f} MB)")
+    else:
+        parser.print_help()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+prefetch.py
+===========
+Download speculativi in background.
+
+/search_scopus conosce gia' lo Scholar ID: mentre l'utente sceglie il
+candidato nel popup si scaricano il profilo Scholar completo e gli elenchi
+titoli Scopus dei candidati. La successiva /process_author attende il lavoro
+gia' avviato invece di ripartire da zero.
+
+I lavori sono indicizzati per chiave (es. ("scholar", id)): la stessa chiave
+non viene mai avviata due volte in parallelo.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from src.core import telemetry
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") != "0"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+PREFETCH_WAIT = float(os.getenv("PREFETCH_WAIT", "600"))  # secondi massimi di attesa in /process_author
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+    return _executor
+
+
+def _run(key, fn, args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        logger.warning("Prefetch fallito", extra={"job": key, "error": e})
+        raise
+
+
+def submit(key, fn, *args):
+    """Avvia fn(*args) in background se la stessa chiave non e' gia' in corso."""
+    if not PREFETCH_ENABLED:
+        return None
+    with _lock:
+        job = _jobs.get(key)
+        if job is not None and not job.done():
+            return job
+        job = _jobs[key] = _pool().submit(_run, key, fn, args)
+    job.add_done_callback(lambda f: _forget(key, f))
+    telemetry.count("prefetch_started_total", job=key[0])
+    return job
+
+
+def _forget(key, job):
+    # I risultati restano su disco o nella cache di identity: il future non serve piu'
+    with _lock:
+        if _jobs.get(key) is job:
+            del _jobs[key]
+
+
+def wait(key, timeout=None, cancel=None):
+    """
+    Attende il lavoro in corso per key (se c'e').
+    Ritorna True se era in corso ed e' terminato senza errori.
+    cancel: threading.Event opzionale che interrompe l'attesa (il lavoro continua).
+    """
+    with _lock:
+        job = _jobs.get(key)
+    if job is None:
+        return False
+    deadline = time.monotonic() + (PREFETCH_WAIT if timeout is None else timeout)
+    ok = False
+    while True:
+        try:
+            job.result(timeout=0.5)
+            ok = True
+            break
+        except FutureTimeout:
+            if (cancel is not None and cancel.is_set()) or time.monotonic() > deadline:
+                return False
+        except Exception:
+            break
+    telemetry.count("prefetch_used_total", job=key[0], outcome="ok" if ok else "error")
+    return ok
+
+
+def pending(key):
+    with _lock:
+        job = _jobs.get(key)
+    return job is not None and not job.done()
+
+
+def shutdown():
+    """Attende i lavori in corso (usata nei test e all'arresto)."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+        _jobs.clear()
+    if executor is not None:
+        executor.shutdown(wait=True)
@@ -1,4 +1,11 @@
 import os, sys
+import json
+import logging
+import shutil
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
 
@@ -13,14 +20,46 @@ from src.fetchers import scopus
 from src.fetchers import scholar
 from src.merge import fuzzy_merge
 from pyblio_config import AuthorSearch
+from src.core import telemetry
+from src.core import identity
+from src.core import raw_store
+from src.core import prefetch
+from src.core import pipeline
+from src.core import coauthors
+from src.core import charts
+from src.core import refresh
+from src.core import citation_history
+from src.merge import title_index
+
+logger = logging.getLogger(__name__)
 
 RAW_DIR = Path("data/raw")
 MERGE_DIR = Path("data/merged")
 CACHE_DIR = Path("data/cache")
 
-# Crea cartelle se non esistono
-for d in (RAW_DIR, MERGE_DIR, CACHE_DIR):
-    d.mkdir(parents=True, exist_ok=True)
+# Risultato parziale (solo Scopus): file marcatore nella cartella cache e attese
+# in secondi tra i tentativi di completamento Scholar in background
+PARTIAL_MARKER = "partial.json"
+SCHOLAR_RETRY_DELAYS = [float(x) for x in os.getenv("SCHOLAR_RETRY_DELAYS", "30,120,600,1800").split(",")]
+# Elenchi titoli Scopus scaricati in anticipo per /search_scopus (i primi candidati)
+PREFETCH_MAX_CANDIDATES = int(os.getenv("PREFETCH_MAX_CANDIDATES", "3"))
+COMPLETION_WORKERS = int(os.getenv("COMPLETION_WORKERS", "2"))
+
+# Completamenti pianificati: chiave -> Timer dell'attesa o del tentativo in corso
+_completions = {}
+_completions_lock = threading.Lock()
+_completion_executor = None
+
+
+def ensure_data_dirs():
+    """
+    Crea le cartelle dati se non esistono.
+    Non viene eseguita all'import: la chiama la pipeline al primo utilizzo.
+    """
+    for d in (RAW_DIR, MERGE_DIR, CACHE_DIR):
+        d.mkdir(parents=True, exist_ok=True)
+    for source in raw_store.SOURCES:
+        (RAW_DIR / source).mkdir(exist_ok=True)
 
 
 # ============================================================
@@ -50,16 +89,67 @@ def calculate_h_index_from_list(citation_list):
             
     return h_index
 
-def save_author_cache(merged_df, author_name, scholar_id, metrics):
+def numeric_columns(merged_df):
+    """
+    Citazioni e anno in formato numerico (in place). Citazioni mancanti a 0;
+    l'anno mancante resta vuoto (Int16 nullable), non diventa l'anno 0.
+    """
+    for c in ["citations_scopus", "citations_scholar"]:
+        merged_df[c] = pd.to_numeric(merged_df[c], errors="coerce").fillna(0)
+    merged_df["year"] = pd.to_numeric(merged_df["year"], errors="coerce").round().astype("Int16")
+    return merged_df
+
+def compute_metrics(merged_df, partial=False, year_from=None, year_to=None):
+    """
+    Calcola le metriche aggregate per il report a partire dal dataset unificato.
+    Converte in numerico (in place) le colonne citazioni e anno.
+    partial=True: dataset solo Scopus, l'H-index usa le citazioni Scopus.
+    year_from / year_to: finestra di valutazione, gli anni mancanti si contano al suo interno.
+    """
+    h_column = "citations_scopus" if partial else "citations_scholar"
+    calculated_h_index = calculate_h_index_from_list(merged_df[h_column].tolist())
+
+    numeric_columns(merged_df)
+    
+    # Calcolo anni mancanti (buchi temporali)
+    miss_yrs = "N/A"
+    if "year" in merged_df.columns:
+        yrs = merged_df.loc[merged_df["year"] > 0, "year"].astype(int)
+        if not yrs.empty:
+            first = yrs.min() if year_from is None else year_from
+            last = yrs.max() if year_to is None else year_to
+            miss_yrs = ", ".join(map(str, sorted(set(range(first, last+1)) - set(yrs)))) or "Nessuno"
+
+    metrics = {
+        "Totale pubblicazioni": len(merged_df),
+        "Totale citazioni Scopus": int(merged_df["citations_scopus"].sum()),
+        "Totale citazioni Scholar": int(merged_df["citations_scholar"].sum()),
+        "Percentuale Q1": f"{(merged_df['scimago_quartile'].eq('Q1').mean()*100):.1f}%",
+        "Percentuale A": f"{(merged_df['core_rank'].eq('A').mean()*100):.1f}%",
+        "Percentuale A*": f"{(merged_df['core_rank'].eq('A*').mean()*100):.1f}%",
+        "Numero Journal": len(merged_df[merged_df["type"].str.lower()=="journal"]),
+        "Numero Conference": len(merged_df[merged_df["type"].str.lower()=="conference proceeding"]),
+        "Numero Other Works": len(merged_df[~merged_df["type"].str.lower().isin(["journal","conference proceeding"])]),
+        "Anni di non pubblicazione": miss_yrs,
+        "H-index Calcolato (Aggregato)": int(calculated_h_index)
+    }
+    if year_from is not None or year_to is not None:
+        metrics["Finestra di valutazione"] = f"{year_from or 'inizio'}-{year_to or 'oggi'}"
+    if partial:
+        metrics["Stato"] = "Parziale: solo Scopus, dati Scholar in aggiornamento"
+    return metrics
+
+def save_author_cache(merged_df, author_name, scholar_id, metrics, author_dir=None):
     """
     Salva i risultati finali (divisi per categoria) nella cartella cache.
-    Viene chiamata SOLO se il merge ha avuto successo.
+    Viene chiamata SOLO se il merge ha avuto successo (o per il risultato parziale solo Scopus).
+    author_dir: cartella di destinazione esplicita (es. temporanea per lo scambio atomico).
     """
     safe_name = author_name.replace(",", "").replace(" ", "_")
-    author_dir = CACHE_DIR / f"{safe_name}_{scholar_id}"
+    author_dir = Path(author_dir) if author_dir else CACHE_DIR / f"{safe_name}_{scholar_id}"
     author_dir.mkdir(parents=True, exist_ok=True)
     
-    print(f"\n Salvataggio risultati in: {author_dir}")
+    logger.info(f"Salvataggio risultati in: {author_dir}")
 
     # 1. Salva le metriche riassuntive
     pd.DataFrame(metrics.items(), columns=["Metric", "Value"]).to_csv(author_dir/"metrics.csv", index=False)
@@ -117,9 +207,10 @@ def save_author_cache(merged_df, author_name, scholar_id, metrics):
 def search_scopus_candidates(full_name):
     """
     Cerca autori su Scopus. NON blocca il server.
-    Ritorna una lista pulita di candidati per il frontend.
+    Ritorna una lista pulita di candidati per il frontend, ordinata per numero
+    di documenti (identity.likely_first): prefetch e ordinamento partono dai primi.
     """
-    print(f"🔎 Ricerca Scopus: {full_name}")
+    logger.info(f"🔎 Ricerca Scopus: {full_name}")
     try:
         # Parsing sicuro del nome
         parts = full_name.strip().split()
@@ -132,7 +223,8 @@ def search_scopus_candidates(full_name):
         else:
             query = f'AUTHLASTNAME({last})'
             
-        s = AuthorSearch(query)
+        with telemetry.stage_timer("search", logger):
+            s = AuthorSearch(query)
 
         candidates = []
         if s.authors:
@@ -154,95 +246,261 @@ def search_scopus_candidates(full_name):
                 except Exception:
                     continue # Salta singolo autore corrotto
                     
-        return candidates
+        return identity.likely_first(candidates)
 
     except Exception as e:
-        print(f"❌ Errore Scopus Critico: {e}")
+        logger.error(f"❌ Errore Scopus Critico: {e}")
         return []
 
 
+def rank_scopus_candidates(candidates, scholar_id):
+    """
+    Ordina gli omonimi confrontandone i titoli col profilo Scholar.
+    Ritorna (candidati con 'confidence', id selezionato automaticamente o None).
+    """
+    if len(candidates) < 2:
+        return candidates, (candidates[0]["id"] if candidates else None)
+    return identity.rank_candidates(candidates, scholar_id)
+
+
+def _prefetch_scholar(scholar_id, scholar_file):
+    if scholar_file.exists():
+        return
+    page = identity.scholar_sample(scholar_id)
+    if "error" in page:
+        return
+    if scholar.fetch_scholar_by_id(scholar_id, first_page=page, filename=str(scholar_file)):
+        raw_store.record_fetch("scholar", scholar_id, RAW_DIR)
+
+
+def start_prefetch(scholar_id, candidate_ids=()):
+    """
+    Avvia in background, mentre l'utente sceglie il candidato, il download
+    completo del profilo Scholar e gli elenchi titoli Scopus dei primi
+    PREFETCH_MAX_CANDIDATES candidati (per numero di documenti): con molti
+    omonimi non si consuma quota ne' si occupano i worker del download Scholar.
+    /process_author li ritrova tramite prefetch.wait / la cache di identity.
+    """
+    ensure_data_dirs()
+    scholar_file = raw_store.raw_file("scholar", scholar_id, RAW_DIR)
+    if not scholar_file.exists():
+        prefetch.submit(("scholar", scholar_id), _prefetch_scholar, scholar_id, scholar_file)
+    for scopus_id in list(candidate_ids)[:PREFETCH_MAX_CANDIDATES]:
+        if not raw_store.raw_file("scopus", scopus_id, RAW_DIR).exists():
+            prefetch.submit(("scopus_listing", scopus_id), identity.scopus_listing, scopus_id)
+
+
+# ============================================================
+#  3. DOWNLOAD DATI GREZZI
+# ============================================================
+
+def author_paths(scopus_id, scholar_id, safe_name, year_from=None, year_to=None):
+    """Cartella dei risultati e file grezzi (Scopus, Scholar) per la coppia di autori e la finestra di anni."""
+    suffix = "" if year_from is None and year_to is None else f"_{year_from or ''}-{year_to or ''}"
+    return (
+        CACHE_DIR / f"{safe_name}_{scholar_id}{suffix}",
+        raw_store.raw_file("scopus", raw_store.window_key(scopus_id, year_from, year_to), RAW_DIR),
+        raw_store.raw_file("scholar", raw_store.window_key(scholar_id, year_from, year_to), RAW_DIR),
+    )
+
+
+def _citation_files(scopus_id, scholar_id, year_from=None, year_to=None):
+    """File .citations.csv piu' recenti del rispettivo CSV grezzo (un nuovo download completo li supera)."""
+    files = {}
+    for source, source_id in (("scopus", scopus_id), ("scholar", scholar_id)):
+        key = raw_store.window_key(source_id, year_from, year_to)
+        raw, counts = raw_store.raw_file(source, key, RAW_DIR), raw_store.citations_file(source, key, RAW_DIR)
+        try:
+            fresh = counts.stat().st_mtime >= raw.stat().st_mtime
+        except OSError:
+            continue
+        if fresh:
+            files[source] = counts
+    return files
+
+
+def _slice_full_download(source, source_id, target_file, year_from=None, year_to=None):
+    """
+    Con una finestra di anni ricava target_file filtrando il download completo
+    della fonte, se esiste gia' (nessuna chiamata API). Ritorna True se l'ha creato.
+    """
+    full_file = raw_store.raw_file(source, source_id, RAW_DIR)
+    if full_file == target_file or not full_file.exists():
+        return False
+    df = pd.read_csv(full_file)
+    df = df[df["year"].apply(raw_store.in_year_window, args=(year_from, year_to))]
+    df.to_csv(str(target_file) + ".tmp", index=False)
+    os.replace(str(target_file) + ".tmp", target_file)
+    raw_store.record_fetch(source, raw_store.window_key(source_id, year_from, year_to), RAW_DIR,
+                           rows=len(df), sliced_from=full_file.name)
+    logger.info(f"{source}: finestra {year_from}-{year_to} ricavata dal download completo ({len(df)} righe)")
+    return True
+
+
+def _download_scopus(scopus_id, safe_name, scopus_file, cancel, year_from=None, year_to=None, fresh=False):
+    """
+    Scarica Scopus in scopus_file. Ritorna None se va a buon fine, altrimenti il dict di errore.
+    fresh=True (aggiornamento programmato): elenco dei documenti riletto da Scopus (non dalla
+    cache di pybliometrics) e metadati del download scritti dal chiamante.
+    """
+    try:
+        logger.info("Download Scopus in corso...")
+        data = scopus.fetch_author_details(scopus_id, cancel=cancel, year_from=year_from, year_to=year_to,
+                                           refresh=fresh)
+        if data: 
+            scopus.save_to_csv(data, safe_name, filename=str(scopus_file))
+            if not fresh:
+                raw_store.record_fetch("scopus", raw_store.window_key(scopus_id, year_from, year_to), RAW_DIR,
+                                       name=data.get("author_name"), rows=len(data.get("publications", [])))
+            return None
+        if cancel.is_set():
+            return None  # annullato perche' Scholar e' fallito: l'errore lo riporta l'altra fonte
+        return {"status": "error", "msg": "Scopus API ha restituito dati vuoti"}
+    except Exception as e: 
+        return {"status": "error", "msg": f"Errore Download Scopus: {e}"}
+
+
+def _download_scholar(scholar_id, scholar_file, scholar_page, cancel, year_from=None, year_to=None, fresh=False):
+    """
+    Scarica Scholar in scholar_file. Ritorna None se va a buon fine, altrimenti il dict di errore.
+    fresh=True (aggiornamento programmato): nessun riuso di prefetch o del download completo,
+    e i metadati del download li scrive il chiamante.
+    """
+    try:
+        # Download gia' avviato da /search_scopus (profilo completo): si attende quello
+        if not fresh:
+            prefetch.wait(("scholar", scholar_id), cancel=cancel)
+        if not fresh and (scholar_file.exists() or _slice_full_download("scholar", scholar_id, scholar_file, year_from, year_to)):
+            logger.info("Profilo Scholar gia' scaricato in background.")
+            return None
+        logger.info("📡 Download Scholar in corso...")
+        if scholar.fetch_scholar_by_id(scholar_id, first_page=scholar_page, filename=str(scholar_file), cancel=cancel,
+                                       year_from=year_from, year_to=year_to) and not fresh:
+            raw_store.record_fetch("scholar", raw_store.window_key(scholar_id, year_from, year_to), RAW_DIR)
+        return None
+    except Exception as e: 
+        return {"status": "error", "msg": f"Errore Download Scholar: {e}"}
+
+
+def download_sources(scopus_id, scholar_id, safe_name, scopus_file, scholar_file,
+                     need_scopus=True, need_scholar=True, scholar_page=None, year_from=None, year_to=None,
+                     fresh=False):
+    """
+    Scarica in parallelo le fonti mancanti: sono servizi e quote indipendenti,
+    quindi la latenza totale e' il massimo dei due e non la somma.
+    Se Scopus fallisce il download Scholar viene annullato tra una richiesta e la
+    successiva; se fallisce Scholar invece Scopus prosegue, perche' basta per il
+    risultato parziale. Un download gia' completato resta comunque in raw_store.
+    Ritorna None oppure il dict di errore (a parita', prima quello Scopus).
+    fresh=True: riscarica Scholar anche se un profilo (completo o in prefetch) esiste gia',
+    rilegge da Scopus l'elenco dei documenti e non scrive la data di download (raw_store.record_fetch): i file sono di prova
+    finche' il chiamante non li accetta.
+    """
+    if not need_scopus:
+        telemetry.count("cache_hits_total", cache="raw_scopus")
+    if not need_scholar:
+        telemetry.count("cache_hits_total", cache="raw_scholar")
+
+    cancel = threading.Event()
+    jobs = {}
+    with telemetry.stage_timer("download", logger, scopus=need_scopus, scholar=need_scholar):
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="download") as pool:
+            # Il contesto (es. priorita' del rate limiter) passa ai thread di download
+            if need_scopus:
+                jobs["scopus"] = pool.submit(contextvars.copy_context().run, _download_scopus,
+                                             scopus_id, safe_name, scopus_file, cancel, year_from, year_to, fresh)
+            if need_scholar:
+                jobs["scholar"] = pool.submit(contextvars.copy_context().run, _download_scholar,
+                                              scholar_id, scholar_file, scholar_page, cancel, year_from, year_to, fresh)
+
+            if "scopus" in jobs:
+                jobs["scopus"].add_done_callback(lambda f: f.result() and cancel.set())
+            errors = [future.result() for future in jobs.values()]
+
+    return next((e for e in errors if e), None)
+
+
 # ============================================================
-#  3. LOGICA DI ELABORAZIONE (Main Pipeline)
+#  4. LOGICA DI ELABORAZIONE (Main Pipeline)
 # ============================================================
 
-def process_chosen_author(scopus_id, scopus_name, scholar_id):
+def process_chosen_author(scopus_id, scopus_name, scholar_id, force=False, year_from=None, year_to=None):
     """
-    Gestisce il processo completo: Download -> Merge -> Salvataggio.
-    Gestisce Cache esistente, Mismatch (<60%) e Pulizia file.
+    Gestisce il processo completo: Pre-flight -> Download -> Merge -> Salvataggio.
+    Gestisce Cache esistente e Mismatch (<60%); i dati grezzi restano in raw_store.
+    force=True salta il controllo preliminare (l'utente ha gia' confermato).
+    year_from / year_to: finestra di valutazione (estremi inclusi); i fetcher
+    scaricano solo le pubblicazioni al suo interno.
     """
-    print(f" Avvio elaborazione finale: {scopus_name} ({scopus_id}) - Scholar: {scholar_id}")
+    logger.info(f"Avvio elaborazione finale: {scopus_name} ({scopus_id}) - Scholar: {scholar_id}")
+    ensure_data_dirs()
+    window = {"year_from": year_from, "year_to": year_to}
     
     safe_name = scopus_name.replace(",", "").replace(" ", "_")
-    author_dir = CACHE_DIR / f"{safe_name}_{scholar_id}"
+    # Dati grezzi indicizzati per ID della fonte e finestra (condivisi tra tentativi e omonimi)
+    author_dir, scopus_file, scholar_file = author_paths(scopus_id, scholar_id, safe_name, **window)
     
     # --- 1. CONTROLLO CACHE ---
     if author_dir.exists():
-        print(f"⚡ Cache già presente: {safe_name}. Recupero dati esistenti.")
+        logger.info(f"⚡ Cache già presente: {safe_name}. Recupero dati esistenti.")
+        telemetry.count("cache_hits_total", cache="author")
+        refresh.record_access(author_dir.name)
+        if (author_dir / PARTIAL_MARKER).exists():
+            # Risultato solo Scopus: il completamento riparte se non e' gia' in corso (es. dopo un riavvio)
+            schedule_completion(scopus_id, scholar_id, safe_name, **window)
+            return _partial_response(author_dir)
+        manifest = pipeline.read_manifest(author_dir)
+        if manifest and manifest.get("signature") != quick_signature(scopus_id, scholar_id, **window):
+            # Dati, codice, coorte o file CORE/Scimago cambiati: si rieseguono solo gli stadi a valle, senza API
+            try:
+                run_stages(scopus_id, scholar_id, safe_name, **window)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Aggiornamento stadi non riuscito, uso la cache esistente: {e}")
         return {"status": "success", "folder": author_dir.name}
 
-    # Percorsi dei file temporanei (Raw Data)
-    scopus_file = RAW_DIR / f"{safe_name}_Scopus.csv"
-    scholar_file = RAW_DIR / f"{safe_name}_Scholar.csv"
+    need_scopus = not scopus_file.exists()
+    need_scholar = not scholar_file.exists()
+    if year_from is not None or year_to is not None:
+        # Download completo gia' presente: la finestra si ricava filtrandolo
+        need_scopus = need_scopus and not _slice_full_download("scopus", scopus_id, scopus_file, **window)
+        need_scholar = need_scholar and not _slice_full_download("scholar", scholar_id, scholar_file, **window)
+
+    # --- 2. CONTROLLO PRELIMINARE (campione economico prima del download completo) ---
+    scholar_page = None
+    if (need_scopus or need_scholar) and not force:
+        check = identity.preflight(scopus_id, scholar_id)
+        scholar_page = check["scholar_page"]
+        if check["verdict"] == "mismatch":
+            logger.warning("Interrotto dal pre-flight: titoli quasi del tutto diversi.")
+            return {
+                "status": "mismatch",
+                "message": "Attenzione: Gli autori sembrano diversi.",
+                "overlap": check["overlap"]
+            }
+        if check["verdict"] == "uncertain":
+            return {
+                "status": "confirm",
+                "message": f"Solo {check['matched']} titoli su {check['compared']} in comune nel campione. Procedere comunque?",
+                "overlap": check["overlap"]
+            }
 
-    # --- 2. DOWNLOAD DATI ---
-    if not scopus_file.exists():
-        try:
-            print(" Download Scopus in corso...")
-            data = scopus.fetch_author_details(scopus_id)
-            if data: 
-               scopus.save_to_csv(data, safe_name)
-            else: 
-                return {"status": "error", "msg": "Scopus API ha restituito dati vuoti"}
-        except Exception as e: 
-            return {"status": "error", "msg": f"Errore Download Scopus: {e}"}
+    # --- 3. DOWNLOAD DATI (Scopus e Scholar in parallelo) ---
+    error = download_sources(scopus_id, scholar_id, safe_name, scopus_file, scholar_file,
+                             need_scopus, need_scholar, scholar_page, **window)
+    if error:
+        # Scopus c'e', Scholar no: risultato parziale subito, Scholar e merge in background
+        if scopus_file.exists() and not scholar_file.exists():
+            return serve_partial(scopus_id, scholar_id, safe_name, error.get("msg"), **window)
+        return error
 
-    if not scholar_file.exists():
-        try:
-            print("📡 Download Scholar in corso...")
-            scholar.fetch_scholar_by_id(scholar_id, output_name=safe_name)
-        except Exception as e: 
-            return {"status": "error", "msg": f"Errore Download Scholar: {e}"}
-
-    # --- 3. MERGE E GESTIONE INTELLIGENTE ERRORI ---
+    # --- 4. MERGE E GESTIONE INTELLIGENTE ERRORI ---
     if scopus_file.exists() and scholar_file.exists():
         try:
-            # Tenta il merge. 
-            # Se il match è < 60%, fuzzy_merge lancerà ValueError("LOW_MATCH_SCORE")
-            merged_df = fuzzy_merge.fuzzy_merge_datasets(scopus_file, scholar_file)
-            calculated_h_index = calculate_h_index_from_list(merged_df["citations_scholar"].tolist())
-
-            if merged_df.empty:
-                 return {"status": "error", "msg": "Il merge ha prodotto un risultato vuoto."}
+            # Merge -> arricchimento -> metriche -> salvataggio, stadi memoizzati.
+            # Se il match è < 60%, title_match lancerà ValueError("LOW_MATCH_SCORE")
+            run_stages(scopus_id, scholar_id, safe_name, **window)
 
             # --- SE SIAMO QUI, IL MERGE È ANDATO BENE (MATCH >= 60%) ---
-            
-            # Calcolo delle metriche aggregate per il report
-            for c in ["citations_scopus", "citations_scholar", "year"]:
-                merged_df[c] = pd.to_numeric(merged_df[c], errors="coerce").fillna(0)
-            
-            # Calcolo anni mancanti (buchi temporali)
-            miss_yrs = "N/A"
-            if "year" in merged_df.columns:
-                yrs = merged_df.loc[merged_df["year"] > 0, "year"].astype(int)
-                if not yrs.empty:
-                    miss_yrs = ", ".join(map(str, sorted(set(range(yrs.min(), yrs.max()+1)) - set(yrs)))) or "Nessuno"
-
-            metrics = {
-                "Totale pubblicazioni": len(merged_df),
-                "Totale citazioni Scopus": int(merged_df["citations_scopus"].sum()),
-                "Totale citazioni Scholar": int(merged_df["citations_scholar"].sum()),
-                "Percentuale Q1": f"{(merged_df['scimago_quartile'].eq('Q1').mean()*100):.1f}%",
-                "Percentuale A": f"{(merged_df['core_rank'].eq('A').mean()*100):.1f}%",
-                "Percentuale A*": f"{(merged_df['core_rank'].eq('A*').mean()*100):.1f}%",
-                "Numero Journal": len(merged_df[merged_df["type"].str.lower()=="journal"]),
-                "Numero Conference": len(merged_df[merged_df["type"].str.lower()=="conference proceeding"]),
-                "Numero Other Works": len(merged_df[~merged_df["type"].str.lower().isin(["journal","conference proceeding"])]),
-                "Anni di non pubblicazione": miss_yrs,
-                "H-index Calcolato (Aggregato)": int(calculated_h_index)
-            }
-            
-            # SALVATAGGIO CACHE (Solo ora salviamo i risultati definitivi)
-            save_author_cache(merged_df, safe_name, scholar_id, metrics)
             return {"status": "success", "folder": author_dir.name}
 
         except ValueError as ve:
@@ -250,14 +508,10 @@ def process_chosen_author(scopus_id, scopus_name, scholar_id):
             
             # === CASO: MATCH TROPPO BASSO (< 60%) ===
             if error_msg == "LOW_MATCH_SCORE":
-                print(" Interrotto: Match < 60%. Nessuna cache salvata.")
-                
-            
-                try:
-                    if scopus_file.exists(): os.remove(scopus_file)
-                    if scholar_file.exists(): os.remove(scholar_file)
-                except Exception as e:
-                    print(f" Errore pulizia file: {e}")
+                logger.warning("Interrotto: Match < 60%. Nessuna cache salvata.")
+
+                # I dati grezzi restano in archivio: scegliendo un altro candidato
+                # si ricalcola solo l'abbinamento, senza riscaricare l'altra fonte.
 
                 # Ritorna status speciale 'mismatch' con messaggio chiaro per l'utente
                 return {
@@ -267,6 +521,9 @@ def process_chosen_author(scopus_id, scopus_name, scholar_id):
             
             elif error_msg == "NO_MATCHES":
                 return {"status": "error", "message": "Nessuna corrispondenza trovata."}
+
+            elif error_msg == "EMPTY_MERGE":
+                return {"status": "error", "msg": "Il merge ha prodotto un risultato vuoto."}
             
             else:
                 return {"status": "error", "message": f"Errore dati: {error_msg}"}
@@ -274,9 +531,346 @@ def process_chosen_author(scopus_id, scopus_name, scholar_id):
         except Exception as e:
             return {"status": "error", "message": f"Errore imprevisto nel Merge: {e}"}
             
+    elif scopus_file.exists():
+        return serve_partial(scopus_id, scholar_id, safe_name, "Profilo Scholar vuoto o non disponibile", **window)
     else:
         return {"status": "error", "message": "File CSV mancanti, impossibile procedere."}
-            
-    
 
-       
\ No newline at end of file
+
+# ============================================================
+#  5. RISULTATI PARZIALI (solo Scopus) E COMPLETAMENTO IN BACKGROUND
+# ============================================================
+
+def _swap_cache_dir(tmp_dir, author_dir):
+    """Sostituisce author_dir con tmp_dir: chi scarica lo zip vede sempre una versione completa."""
+    old_dir = author_dir.with_name(author_dir.name + ".old")
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    if author_dir.exists():
+        os.replace(author_dir, old_dir)
+    os.replace(tmp_dir, author_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _build_cache(merged_df, safe_name, scholar_id, metrics, author_dir, marker=None, manifest=None,
+                 coauthor_summary=None):
+    tmp_dir = author_dir.with_name(author_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    if coauthor_summary is not None:
+        metrics = {**metrics, **coauthor_summary["metrics"]}
+    save_author_cache(merged_df, safe_name, scholar_id, metrics, author_dir=tmp_dir)
+    if coauthor_summary is not None:
+        coauthors.save_summary(coauthor_summary, tmp_dir)
+    if manifest is not None:
+        pipeline.write_manifest(tmp_dir, manifest)
+    if marker is not None:
+        (tmp_dir / PARTIAL_MARKER).write_text(json.dumps(marker, indent=2), encoding="utf-8")
+    _swap_cache_dir(tmp_dir, author_dir)
+    # I grafici si disegnano in un processo separato e compaiono nella cartella appena pronti
+    charts.schedule(charts.chart_data(merged_df, metrics), author_dir)
+
+
+def _partial_response(author_dir):
+    return {
+        "status": "success",
+        "folder": author_dir.name,
+        "partial": True,
+        "message": "Dati Scholar non disponibili: risultati solo Scopus, aggiornamento in background."
+    }
+
+
+def serve_partial(scopus_id, scholar_id, safe_name, reason, year_from=None, year_to=None):
+    """Salva subito il risultato solo Scopus (marcato come parziale) e pianifica il completamento."""
+    author_dir = author_paths(scopus_id, scholar_id, safe_name, year_from, year_to)[0]
+    logger.warning(f"Scholar non disponibile ({reason}): risultato parziale solo Scopus.")
+    try:
+        run_stages(scopus_id, scholar_id, safe_name, year_from, year_to, partial=True,
+                   marker={"reason": reason, "scopus_id": str(scopus_id), "since": time.time()})
+    except Exception as e:
+        return {"status": "error", "message": f"Errore nel risultato parziale: {e}"}
+    telemetry.count("partial_results_total")
+    schedule_completion(scopus_id, scholar_id, safe_name, year_from, year_to)
+    return _partial_response(author_dir)
+
+
+def complete_attempt(scopus_id, scholar_id, safe_name, year_from=None, year_to=None, attempt=1):
+    """
+    Un tentativo di completamento: Scholar e merge; se riesce sostituisce in modo
+    atomico la cartella parziale con quella completa. Se il merge rivela autori
+    diversi il risultato parziale viene rimosso. Ritorna l'esito, None = da ritentare.
+    """
+    author_dir, _, scholar_file = author_paths(scopus_id, scholar_id, safe_name, year_from, year_to)
+    if not (author_dir / PARTIAL_MARKER).exists():
+        return "done"  # completato da un'altra richiesta
+    if not scholar_file.exists():
+        error = _download_scholar(scholar_id, scholar_file, None, threading.Event(), year_from, year_to)
+        if error or not scholar_file.exists():
+            logger.warning("Completamento Scholar fallito", extra={"attempt": attempt, "scholar_id": scholar_id})
+            telemetry.count("retries_total", service="serpapi_background")
+            return None
+    try:
+        run_stages(scopus_id, scholar_id, safe_name, year_from, year_to)
+    except ValueError as ve:
+        if str(ve) == "LOW_MATCH_SCORE":
+            logger.warning(f"Completamento: autori diversi, rimuovo il risultato parziale {author_dir.name}")
+            shutil.rmtree(author_dir, ignore_errors=True)
+            return "mismatch"
+        logger.error(f"Completamento interrotto: {ve}")
+        return "error"
+    logger.info(f"Risultato completato con Scholar: {author_dir.name}")
+    telemetry.count("partial_completed_total")
+    return "success"
+
+
+def _completion_pool():
+    global _completion_executor
+    with _completions_lock:
+        if _completion_executor is None:
+            _completion_executor = ThreadPoolExecutor(max_workers=COMPLETION_WORKERS, thread_name_prefix="complete")
+        return _completion_executor
+
+
+def _run_completion(key, args, attempt):
+    try:
+        outcome = complete_attempt(*args, attempt=attempt + 1)
+    except Exception as e:
+        logger.warning("Completamento fallito", extra={"job": key, "error": e})
+        outcome = None
+    if outcome is None:
+        _schedule_attempt(key, args, attempt + 1)
+    else:
+        with _completions_lock:
+            _completions.pop(key, None)
+
+
+def _schedule_attempt(key, args, attempt):
+    """Attesa con un Timer (nessun worker occupato), poi il solo tentativo nel pool dedicato."""
+    with _completions_lock:
+        if attempt >= len(SCHOLAR_RETRY_DELAYS):
+            logger.warning("Completamento abbandonato", extra={"job": key})
+            _completions.pop(key, None)
+            return None
+        timer = threading.Timer(SCHOLAR_RETRY_DELAYS[attempt],
+                                lambda: _completion_pool().submit(_run_completion, key, args, attempt))
+        timer.daemon = True
+        _completions[key] = timer
+        timer.start()
+        return timer
+
+
+def schedule_completion(scopus_id, scholar_id, safe_name, year_from=None, year_to=None):
+    """
+    Pianifica il completamento in background (una sola volta per coppia di autori
+    e finestra) con le attese di SCHOLAR_RETRY_DELAYS. Indipendente dal prefetch:
+    le attese non occupano i worker dei download speculativi.
+    """
+    key = ("complete", str(scopus_id), str(scholar_id), year_from, year_to)
+    with _completions_lock:
+        if key in _completions:
+            return _completions[key]
+    return _schedule_attempt(key, (scopus_id, scholar_id, safe_name, year_from, year_to), 0)
+
+
+def wait_completions(timeout=None):
+    """Attende la fine dei completamenti pianificati (test e arresto ordinato). True se finiti."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        with _completions_lock:
+            if not _completions:
+                return True
+        if deadline is not None and time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+
+
+# ============================================================
+#  6. PIPELINE A STADI MEMOIZZATI (vedi pipeline.py)
+# ============================================================
+
+# Funzioni degli stadi: il loro codice entra nella firma rapida del manifest
+STAGE_FUNCTIONS = (fuzzy_merge.merge_titles, fuzzy_merge.match_titles, fuzzy_merge.scopus_only_rows,
+                   fuzzy_merge.enrich_venues, fuzzy_merge.apply_citations, compute_metrics,
+                   coauthors.author_summary, save_author_cache, coauthors.save_summary)
+
+
+def quick_signature(scopus_id, scholar_id, year_from=None, year_to=None):
+    """
+    Firma economica di tutto cio' che puo' cambiare le chiavi degli stadi: solo stat
+    dei file (grezzi, citazioni, indice della coorte), firma CORE/Scimago e versioni
+    del codice, nessuna lettura. Salvata nel manifest: con la stessa firma una
+    richiesta in cache non ricalcola nessuna chiave (run_stages non serve).
+    """
+    files = []
+    for source, source_id in (("scopus", scopus_id), ("scholar", scholar_id)):
+        key = raw_store.window_key(source_id, year_from, year_to)
+        files += [pipeline.file_stat(raw_store.raw_file(source, key, RAW_DIR)),
+                  pipeline.file_stat(raw_store.citations_file(source, key, RAW_DIR))]
+    return {
+        "files": files + [pipeline.file_stat(coauthors.members_file())],
+        "references": fuzzy_merge.reference_signature(),
+        "versions": pipeline.STAGE_VERSIONS,
+        "code": pipeline.code_version(STAGE_FUNCTIONS),
+    }
+
+
+def run_stages(scopus_id, scholar_id, safe_name, year_from=None, year_to=None, partial=False, marker=None):
+    """
+    Esegue gli stadi a valle dei file grezzi gia' scaricati e aggiorna la cartella
+    dei risultati. Ogni stadio e' memoizzato sulla chiave dei suoi ingressi: si
+    riesegue solo cio' che sta a valle di una modifica (dati, parametri, codice,
+    file CORE/Scimago). Ritorna l'elenco degli stadi eseguiti ([] = gia' aggiornato).
+    partial=True: solo Scopus (stadio scopus_only al posto di title_match).
+    Lancia ValueError("LOW_MATCH_SCORE") / ValueError("EMPTY_MERGE").
+    """
+    window = {"year_from": year_from, "year_to": year_to}
+    author_dir, scopus_file, scholar_file = author_paths(scopus_id, scholar_id, safe_name, **window)
+    # Prima di leggere i file: una modifica durante l'esecuzione fa ripartire la richiesta successiva
+    signature = quick_signature(scopus_id, scholar_id, **window)
+
+    # Chiavi di tutti gli stadi: dipendono solo dagli ingressi, non serve eseguire nulla
+    inputs = {"scopus": pipeline.file_digest(scopus_file)}
+    if partial:
+        match_stage, match_fn, match_params = "scopus_only", fuzzy_merge.scopus_only_rows, {}
+    else:
+        inputs["scholar"] = pipeline.file_digest(scholar_file)
+        match_stage, match_fn = "title_match", (fuzzy_merge.merge_titles, fuzzy_merge.match_titles)
+        match_params = {"cutoff": title_index.MATCH_CUTOFF, "min_ratio": fuzzy_merge.MIN_MATCH_RATIO}
+    keys = {match_stage: pipeline.stage_key(match_stage, match_fn, inputs, match_params)}
+    keys["venue_match"] = pipeline.stage_key("venue_match", fuzzy_merge.enrich_venues,
+                                             {"rows": keys[match_stage], "references": fuzzy_merge.reference_signature()})
+    # Citazioni piu' recenti dei file grezzi (aggiornamento rapido): stadio in piu' dopo l'arricchimento
+    counts = {source: path for source, path in _citation_files(scopus_id, scholar_id, **window).items()
+              if not (partial and source == "scholar")}
+    enriched_key = keys["venue_match"]
+    if counts:
+        inputs["citations"] = {source: pipeline.file_digest(path) for source, path in counts.items()}
+        enriched_key = keys["citations"] = pipeline.stage_key("citations", fuzzy_merge.apply_citations,
+                                                              {"enriched": keys["venue_match"], "counts": inputs["citations"]})
+    keys["metrics"] = pipeline.stage_key("metrics", compute_metrics, {"enriched": enriched_key},
+                                         dict(window, partial=partial))
+    # La quota di coautori interni dipende solo dai membri della coorte che sono
+    # coautori: un nuovo autore estraneo non invalida la rete (ne' l'export)
+    coauthor_ids = coauthors.coauthor_ids(scopus_file) - {str(scopus_id)}
+    cohort = sorted(set(coauthors.cohort_members()) & coauthor_ids)
+    keys["coauthors"] = pipeline.stage_key("coauthors", coauthors.author_summary,
+                                           {"scopus": inputs["scopus"], "cohort": cohort})
+    keys["export"] = pipeline.stage_key("export", (save_author_cache, coauthors.save_summary),
+                                        {"enriched": enriched_key, "metrics": keys["metrics"],
+                                         "coauthors": keys["coauthors"]},
+                                        {"folder": author_dir.name, "partial": partial})
+
+    current = pipeline.read_manifest(author_dir)
+    if current.get("stages", {}).get("export") == keys["export"]:
+        if current.get("signature") != signature:
+            pipeline.write_manifest(author_dir, dict(current, signature=signature))
+        return []
+
+    ran = []
+    def stage(name, fn):
+        value, computed = pipeline.memoize(name, keys[name], fn)
+        if computed:
+            ran.append(name)
+        return value
+
+    if partial:
+        rows = stage(match_stage, lambda: fuzzy_merge.scopus_only_rows(pd.read_csv(scopus_file)))
+    else:
+        rows = stage(match_stage, lambda: fuzzy_merge.merge_titles(scopus_file, scholar_file))
+    if rows.empty:
+        raise ValueError("EMPTY_MERGE")
+    enriched = stage("venue_match", lambda: fuzzy_merge.enrich_venues(rows.copy()))
+    if counts:
+        enriched = stage("citations", lambda: fuzzy_merge.apply_citations(
+            enriched, **{f"{source}_counts": pd.read_csv(path) for source, path in counts.items()}))
+    metrics = stage("metrics", lambda: compute_metrics(enriched.copy(), partial=partial, **window))
+    network = stage("coauthors", lambda: coauthors.author_summary(pd.read_csv(scopus_file), scopus_id, cohort))
+
+    if partial and marker is None:
+        # Ricalcolo di un risultato parziale: il marcatore resta quello originale
+        try:
+            marker = json.loads((author_dir / PARTIAL_MARKER).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            marker = {"scopus_id": str(scopus_id)}
+    manifest = {
+        "scopus_id": str(scopus_id), "scholar_id": str(scholar_id), "safe_name": safe_name,
+        "partial": partial, **window, "inputs": inputs, "stages": keys, "signature": signature,
+    }
+    with telemetry.stage_timer("export", logger, partial=partial):
+        _build_cache(numeric_columns(enriched.copy()), safe_name, scholar_id, metrics, author_dir,
+                     marker=marker if partial else None, manifest=manifest, coauthor_summary=network)
+    members = coauthors.update_cohort(scopus_id, network["graph"]).graph["members"]
+    if sorted(set(members) & coauthor_ids) == cohort:
+        # Il nuovo indice della coorte contiene solo questo autore in piu': la firma resta valida
+        signature["files"][-1] = pipeline.file_stat(coauthors.members_file())
+        pipeline.write_manifest(author_dir, manifest)
+    try:
+        citation_history.record(author_dir.name, enriched)
+    except OSError as e:
+        logger.warning(f"Storico citazioni non aggiornato: {e}")
+    ran.append("export")
+    logger.info("Pipeline a stadi completata", extra={"folder": author_dir.name, "stages": ",".join(ran)})
+    return ran
+
+
+def refresh_citations(scopus_id, scholar_id, safe_name, year_from=None, year_to=None):
+    """
+    Aggiornamento rapido delle sole citazioni di un risultato gia' in cache:
+    citations_scopus dall'elenco documenti (ScopusSearch, 25 documenti per
+    chiamata, nessun abstract) e citations_scholar dalle pagine Scholar (100
+    articoli per chiamata). Poi si rieseguono solo gli stadi citations,
+    metrics ed export: abbinamento titoli e arricchimento CORE/Scimago restano
+    quelli memoizzati.
+    """
+    window = {"year_from": year_from, "year_to": year_to}
+    author_dir = author_paths(scopus_id, scholar_id, safe_name, **window)[0]
+    manifest = pipeline.read_manifest(author_dir)
+    if not manifest:
+        return {"status": "error", "message": "Nessun risultato in cache da aggiornare"}
+    partial = manifest.get("partial", False)
+
+    updated = []
+    with telemetry.stage_timer("citation_refresh", logger, folder=author_dir.name):
+        try:
+            listing = pd.DataFrame(scopus.fetch_document_listing(scopus_id, refresh=True),
+                                   columns=["title", "year", "doi", "citations_scopus"])
+            listing = listing[listing["year"].apply(raw_store.in_year_window, args=(year_from, year_to))]
+            target = raw_store.citations_file("scopus", raw_store.window_key(scopus_id, year_from, year_to), RAW_DIR)
+            listing.to_csv(str(target) + ".tmp", index=False)
+            os.replace(str(target) + ".tmp", target)
+            updated.append("scopus")
+        except Exception as e:
+            logger.warning(f"Citazioni Scopus non aggiornate: {e}")
+        if not partial:
+            # Un profilo interrotto a meta' non viene salvato: restano le citazioni precedenti
+            target = raw_store.citations_file("scholar", raw_store.window_key(scholar_id, year_from, year_to), RAW_DIR)
+            try:
+                if scholar.fetch_scholar_by_id(scholar_id, filename=str(target), **window):
+                    updated.append("scholar")
+            except Exception as e:
+                logger.warning(f"Citazioni Scholar non aggiornate: {e}")
+
+    if not updated:
+        return {"status": "error", "message": "Nessuna citazione aggiornata"}
+    telemetry.count("citation_refresh_total", sources="+".join(updated))
+    try:
+        ran = run_stages(scopus_id, scholar_id, safe_name, partial=partial, **window)
+    except (OSError, ValueError) as e:
+        return {"status": "error", "message": f"Ricalcolo non riuscito: {e}"}
+    return {"status": "success", "folder": author_dir.name, "sources": updated, "stages": ran}
+
+
+def rebuild_cohort():
+    """
+    Aggiorna tutti i risultati in cache prodotti dalla pipeline a stadi: dopo un
+    aggiornamento di core.csv/Scimago o del codice si rieseguono solo gli stadi
+    a valle, senza chiamate API. Genera (cartella, stadi eseguiti).
+    """
+    for author_dir, manifest in pipeline.manifests(CACHE_DIR):
+        try:
+            ran = run_stages(manifest["scopus_id"], manifest["scholar_id"], manifest["safe_name"],
+                             manifest.get("year_from"), manifest.get("year_to"), partial=manifest.get("partial", False))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ricalcolo non riuscito per {author_dir.name}: {e}")
+            ran = []
+        yield author_dir.name, ran
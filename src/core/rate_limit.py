@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+rate_limit.py
+=============
+Limitatore di richieste Scopus condiviso tra processi (token bucket su SQLite).
+
+Ogni chiamata HTTP di pybliometrics passa da acquire() (vedi
+pyblio_config._instrument_sessions), quindi worker Flask, job batch e script
+si coordinano sullo stesso file:
+
+- un bucket per API con i limiti al secondo di Elsevier (RATES)
+- la quota residua letta dagli header X-RateLimit-Remaining / X-RateLimit-Reset
+- dopo un 429 tutte le richieste di quella API attendono (COOLDOWN / Retry-After)
+- priorita': le richieste "batch" lasciano sempre una riserva di token alle
+  richieste "interactive" e si fermano quando la quota scende sotto QUOTA_BATCH_FLOOR
+
+status() espone budget residuo e attese stimate (endpoint /rate_limit).
+
+USO:
+    with rate_limit.priority("batch"):
+        scopus.fetch_author_details(author_id)
+"""
+
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.core import telemetry
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.getenv("RATE_LIMIT_DB", "data/rate_limit.sqlite"))
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+
+# Richieste al secondo per API (limiti Elsevier per chiave)
+RATES = {
+    "AuthorSearch": 2,
+    "AuthorRetrieval": 3,
+    "AffiliationSearch": 6,
+    "AffiliationRetrieval": 9,
+    "AbstractRetrieval": 9,
+    "ScopusSearch": 9,
+    "SerialTitle": 3,
+    "SerialSearch": 3,
+}
+DEFAULT_RATE = 2
+BATCH_RESERVE = 0.5        # quota del bucket riservata alle richieste interattive
+QUOTA_BATCH_FLOOR = int(os.getenv("QUOTA_BATCH_FLOOR", "500"))
+COOLDOWN = 2.0             # secondi di pausa dopo un 429 senza Retry-After
+MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "300"))
+
+PRIORITIES = ("interactive", "batch")
+_priority = contextvars.ContextVar("rate_limit_priority", default="interactive")
+_local = threading.local()
+
+
+class QuotaExhausted(RuntimeError):
+    """Quota settimanale esaurita (o riservata alle richieste interattive)."""
+
+    def __init__(self, api, reset):
+        self.api = api
+        self.reset = reset
+        super().__init__(f"Quota Scopus esaurita per {api}, ripristino alle {time.strftime('%Y-%m-%d %H:%M', time.localtime(reset))}")
+
+
+class RateLimitTimeout(RuntimeError):
+    """Attesa del token oltre MAX_WAIT secondi."""
+
+
+# ============================================================
+#  PRIORITA'
+# ============================================================
+
+@contextmanager
+def priority(level):
+    """Imposta la priorita' delle chiamate Scopus nel blocco ("interactive" o "batch")."""
+    if level not in PRIORITIES:
+        raise ValueError(f"Priorita' sconosciuta: {level}")
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+# ============================================================
+#  DATABASE
+# ============================================================
+
+def _connect():
+    path = Path(DB_PATH)
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == path:
+        return conn
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS buckets (api TEXT PRIMARY KEY, tokens REAL, updated REAL, blocked_until REAL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS quotas (api TEXT PRIMARY KEY, remaining INTEGER, reset REAL, updated REAL)")
+    _local.conn, _local.path = conn, path
+    return conn
+
+
+def _rate(bucket):
+    # Il bucket puo' essere "API@impronta_chiave": i limiti Elsevier valgono per chiave
+    return RATES.get(bucket.split("@")[0], DEFAULT_RATE)
+
+
+def _bucket(conn, api, now):
+    """Legge il bucket e ricarica i token maturati da updated a now."""
+    rate = _rate(api)
+    row = conn.execute("SELECT tokens, updated, blocked_until FROM buckets WHERE api=?", (api,)).fetchone()
+    if row is None:
+        return float(rate), 0.0
+    tokens, updated, blocked_until = row
+    return min(float(rate), tokens + max(0.0, now - updated) * rate), blocked_until or 0.0
+
+
+def _try_acquire(api, level):
+    """Ritorna 0 se il token e' stato preso, altrimenti i secondi da attendere."""
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        quota = conn.execute("SELECT remaining, reset FROM quotas WHERE api=?", (api,)).fetchone()
+        if quota and quota[0] is not None and (quota[1] or 0) > now:
+            floor = QUOTA_BATCH_FLOOR if level == "batch" else 0
+            if quota[0] <= floor:
+                raise QuotaExhausted(api, quota[1])
+
+        tokens, blocked_until = _bucket(conn, api, now)
+        rate = _rate(api)
+        need = 1 + (rate * BATCH_RESERVE if level == "batch" else 0)
+
+        if blocked_until > now:
+            wait = blocked_until - now
+        elif tokens >= need:
+            tokens -= 1
+            wait = 0.0
+            if quota and quota[0] is not None:
+                # Scalo subito la quota: gli altri processi la vedono prima della risposta
+                conn.execute("UPDATE quotas SET remaining=remaining-1 WHERE api=?", (api,))
+        else:
+            wait = (need - tokens) / rate
+
+        conn.execute("INSERT OR REPLACE INTO buckets (api, tokens, updated, blocked_until) VALUES (?, ?, ?, ?)",
+                     (api, tokens, now, blocked_until))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return wait
+
+
+# ============================================================
+#  API PUBBLICA
+# ============================================================
+
+def acquire(api, level=None, max_wait=None):
+    """
+    Attende un token per una chiamata all'API indicata e ritorna i secondi attesi.
+    Lancia QuotaExhausted se la quota non basta per questa priorita',
+    RateLimitTimeout se l'attesa supera max_wait.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return 0.0
+    level = level or current_priority()
+    max_wait = MAX_WAIT if max_wait is None else max_wait
+    start = time.monotonic()
+    while True:
+        wait = _try_acquire(api, level)
+        waited = time.monotonic() - start
+        if wait == 0:
+            telemetry.observe("rate_limit_wait_seconds", waited, api=api, priority=level)
+            return waited
+        if waited + wait > max_wait:
+            raise RateLimitTimeout(f"Attesa per {api} oltre {max_wait:.0f}s")
+        time.sleep(min(wait, 1.0))
+
+
+def record_response(api, status_code, headers):
+    """Aggiorna quota residua e blocchi a partire dalla risposta HTTP."""
+    if not RATE_LIMIT_ENABLED:
+        return
+    conn = _connect()
+    now = time.time()
+    remaining = headers.get("X-RateLimit-Remaining")
+    reset = headers.get("X-RateLimit-Reset")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if remaining is not None:
+            try:
+                conn.execute("INSERT OR REPLACE INTO quotas (api, remaining, reset, updated) VALUES (?, ?, ?, ?)",
+                             (api, int(remaining), float(reset) if reset else now + 7 * 86400, now))
+            except ValueError:
+                pass
+        if status_code == 429:
+            try:
+                pause = float(headers.get("Retry-After", COOLDOWN))
+            except ValueError:
+                pause = COOLDOWN
+            logger.warning("Scopus 429: pausa condivisa", extra={"api": api, "pause_s": pause})
+            conn.execute("INSERT OR REPLACE INTO buckets (api, tokens, updated, blocked_until) VALUES (?, 0, ?, ?)",
+                         (api, now, now + pause))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def status():
+    """Budget attuale per API: token, attesa stimata per priorita', quota residua."""
+    conn = _connect()
+    now = time.time()
+    apis = {r[0] for r in conn.execute("SELECT api FROM buckets UNION SELECT api FROM quotas")}
+    out = {}
+    for api in sorted(apis):
+        tokens, blocked_until = _bucket(conn, api, now)
+        rate = _rate(api)
+        quota = conn.execute("SELECT remaining, reset, updated FROM quotas WHERE api=?", (api,)).fetchone()
+        waits = {}
+        for level in PRIORITIES:
+            need = 1 + (rate * BATCH_RESERVE if level == "batch" else 0)
+            waits[level] = round(max(blocked_until - now, (need - tokens) / rate, 0.0), 3)
+        out[api] = {
+            "rate_per_s": rate,
+            "tokens": round(tokens, 3),
+            "wait_s": waits,
+            "quota_remaining": quota[0] if quota else None,
+            "quota_reset": quota[1] if quota else None,
+        }
+    return out
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+raw_store.py
+============
+Archivio dei dati grezzi scaricati, indicizzato per ID della fonte.
+
+    data/raw/scopus/{scopus_id}.csv    + {scopus_id}.json
+    data/raw/scholar/{scholar_id}.csv  + {scholar_id}.json
+
+Con una finestra di valutazione (anni) il file e' indicizzato anche per la
+finestra, es. {scholar_id}_2015-2024.csv (vedi window_key): se esiste gia'
+il download completo la finestra si ricava filtrandolo, senza chiamate API.
+
+Il file .citations.csv (se c'e') contiene solo titoli e citazioni aggiornate
+dall'aggiornamento rapido delle citazioni.
+
+Il file .json accompagna ogni CSV con data di download, nome dell'autore e
+numero di righe. I file non vengono cancellati in caso di mismatch: se
+l'utente prova un altro candidato Scopus si ricalcola solo l'abbinamento,
+senza riscaricare il profilo Scholar (e viceversa).
+"""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+RAW_DIR = Path("data/raw")
+SOURCES = ("scopus", "scholar")
+
+
+def raw_file(source, source_id, root=None):
+    """Percorso del CSV grezzo per (fonte, ID)."""
+    if source not in SOURCES:
+        raise ValueError(f"Fonte sconosciuta: {source}")
+    safe_id = str(source_id).replace("/", "_").replace("\\", "_")
+    return Path(root or RAW_DIR) / source / f"{safe_id}.csv"
+
+
+def citations_file(source, source_id, root=None):
+    """
+    Citazioni aggiornate senza riscaricare i dati (processing_logic.refresh_citations):
+    valgono solo se piu' recenti del CSV grezzo accanto.
+    """
+    return raw_file(source, source_id, root).with_suffix(".citations.csv")
+
+
+def meta_file(source, source_id, root=None):
+    return raw_file(source, source_id, root).with_suffix(".json")
+
+
+def record_fetch(source, source_id, root=None, **fields):
+    """Scrive i metadati del download appena completato (fetched_at in UTC)."""
+    path = meta_file(source, source_id, root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "source": source,
+        "id": str(source_id),
+        "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **fields,
+    }
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    tmp.replace(path)
+    return meta
+
+
+def read_meta(source, source_id, root=None):
+    """Metadati del download, oppure None se non disponibili."""
+    try:
+        return json.loads(meta_file(source, source_id, root).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def fetched_at(source, source_id, root=None):
+    """Data del download (datetime UTC) oppure None."""
+    meta = read_meta(source, source_id, root)
+    if not meta or "fetched_at" not in meta:
+        return None
+    return datetime.fromisoformat(meta["fetched_at"])
+
+
+# ============================================================
+#  FINESTRA DI VALUTAZIONE (anni)
+# ============================================================
+
+def year_of(value):
+    """Anno come int da 2020, "2020", "2020-05-01", 2020.0; None se mancante o non valido."""
+    try:
+        return int(str(value).strip()[:4])
+    except (TypeError, ValueError):
+        return None
+
+
+def in_year_window(value, year_from=None, year_to=None):
+    """True se l'anno rientra nella finestra (estremi inclusi); senza finestra sempre True."""
+    if year_from is None and year_to is None:
+        return True
+    year = year_of(value)
+    if year is None:
+        return False
+    return (year_from is None or year >= year_from) and (year_to is None or year <= year_to)
+
+
+def window_key(source_id, year_from=None, year_to=None):
+    """ID usato per i file grezzi: invariato senza finestra, altrimenti con il suffisso _DA-A."""
+    if year_from is None and year_to is None:
+        return str(source_id)
+    return f"{source_id}_{year_from or ''}-{year_to or ''}"
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+refresh.py
+==========
+Aggiornamento programmato degli autori in cache.
+
+Una cartella in data/cache non si aggiorna mai da sola: questo modulo
+riscarica in background gli autori con dati vecchi, cosi' le richieste
+interattive trovano sempre una cache recente.
+
+- record_access(): conta gli accessi a una cartella risultati (con
+  decadimento: un accesso vale la meta' dopo ACCESS_HALF_LIFE giorni)
+- plan(): autori da aggiornare, ordinati per eta' dei dati x frequenza di
+  accesso, entro il budget di chiamate API stimate
+- run_pass(): un giro di aggiornamento nella fascia notturna REFRESH_HOURS.
+  Con citations=True (--citations) si aggiornano solo le citazioni
+  (processing_logic.refresh_citations): poche chiamate per autore, soglia
+  REFRESH_CITATIONS_MAX_AGE_DAYS.
+  I download girano con priorita' "batch" del limitatore Scopus (lasciano
+  sempre spazio alle richieste interattive); i nuovi dati passano da file di
+  appoggio e la cartella risultati viene sostituita in modo atomico da run_stages.
+
+Gli accessi stanno in data/refresh.sqlite (condiviso tra processi).
+
+USO (es. da cron ogni ora, esegue solo nella fascia notturna):
+    python -m src.core.refresh
+    python -m src.core.refresh --now --budget 2000    # subito, budget esplicito
+    python -m src.core.refresh --loop                 # processo residente
+    python -m src.core.refresh --citations            # solo citazioni (settimanale)
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from src.core import telemetry, raw_store
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(os.getenv("REFRESH_DB", "data/refresh.sqlite"))
+REFRESH_MAX_AGE_DAYS = float(os.getenv("REFRESH_MAX_AGE_DAYS", "30"))   # dati piu' vecchi: da aggiornare
+REFRESH_CITATIONS_MAX_AGE_DAYS = float(os.getenv("REFRESH_CITATIONS_MAX_AGE_DAYS", "7"))
+REFRESH_API_BUDGET = int(os.getenv("REFRESH_API_BUDGET", "5000"))       # chiamate API stimate per giro
+REFRESH_HOURS = os.getenv("REFRESH_HOURS", "1-6")                       # fascia oraria locale (inizio-fine)
+REFRESH_INTERVAL = int(os.getenv("REFRESH_INTERVAL", "3600"))           # secondi tra un controllo e l'altro (--loop)
+ACCESS_HALF_LIFE = 14.0  # giorni
+# Un profilo riscaricato molto piu' corto del precedente e' un download interrotto: si tiene il vecchio
+MIN_ROWS_RATIO = 0.9
+SCHOLAR_PAGE_SIZE = 100
+SCOPUS_SEARCH_PAGE_SIZE = 25
+
+_local = threading.local()
+
+
+def _connect():
+    path = Path(DB_PATH)
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == path:
+        return conn
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS access (folder TEXT PRIMARY KEY, score REAL, last_access REAL)")
+    _local.conn, _local.path = conn, path
+    return conn
+
+
+def _decayed(score, since, now):
+    return score * 0.5 ** (max(0.0, now - since) / (ACCESS_HALF_LIFE * 86400))
+
+
+# ============================================================
+#  ACCESSI
+# ============================================================
+
+def record_access(folder, now=None):
+    """Un accesso alla cartella risultati (cache hit, API JSON, download)."""
+    now = now or time.time()
+    try:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT score, last_access FROM access WHERE folder=?", (folder,)).fetchone()
+        score = (_decayed(*row, now) if row else 0.0) + 1.0
+        conn.execute("INSERT OR REPLACE INTO access (folder, score, last_access) VALUES (?, ?, ?)", (folder, score, now))
+        conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        # Il conteggio degli accessi non deve mai far fallire una richiesta
+        logger.warning("Accesso non registrato", extra={"folder": folder, "error": e})
+
+
+def access_scores(now=None):
+    now = now or time.time()
+    return {folder: _decayed(score, last, now)
+            for folder, score, last in _connect().execute("SELECT folder, score, last_access FROM access")}
+
+
+# ============================================================
+#  PIANIFICAZIONE
+# ============================================================
+
+def in_refresh_hours(now=None, hours=None):
+    """True se l'ora locale cade nella fascia "inizio-fine" (puo' scavalcare la mezzanotte, es. 22-5)."""
+    start, end = (int(h) for h in (hours or REFRESH_HOURS).split("-"))
+    hour = (now or datetime.now()).hour
+    return start <= hour <= end if start <= end else hour >= start or hour <= end
+
+
+def _csv_rows(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return max(0, sum(1 for _ in f) - 1)
+    except OSError:
+        return 0
+
+
+def estimated_calls(scopus_id, scholar_id, year_from=None, year_to=None, raw_dir=None, citations=False):
+    """
+    Chiamate API stimate per riscaricare l'autore: un abstract Scopus per
+    pubblicazione (piu' ricerca e profilo) e una pagina SerpApi ogni 100 articoli.
+    citations=True: solo l'elenco documenti Scopus (25 per pagina) e le pagine SerpApi.
+    """
+    raw = lambda source, source_id: raw_store.raw_file(source, raw_store.window_key(source_id, year_from, year_to), raw_dir)
+    scopus_rows = _csv_rows(raw("scopus", scopus_id))
+    scholar_pages = max(1, math.ceil(_csv_rows(raw("scholar", scholar_id)) / SCHOLAR_PAGE_SIZE))
+    if citations:
+        return max(1, math.ceil(scopus_rows / SCOPUS_SEARCH_PAGE_SIZE)) + scholar_pages
+    return scopus_rows + 2 + scholar_pages
+
+
+def _age_days(manifest, raw_dir, now, citations=False):
+    """Eta' (giorni) del dato piu' vecchio tra le fonti; per le citazioni conta anche il file .citations.csv."""
+    window = (manifest.get("year_from"), manifest.get("year_to"))
+    dates = []
+    for source in raw_store.SOURCES:
+        key = raw_store.window_key(manifest[f"{source}_id"], *window)
+        fetched = raw_store.fetched_at(source, key, raw_dir)
+        counts = raw_store.citations_file(source, key, raw_dir)
+        if citations and counts.exists():
+            refreshed = datetime.fromtimestamp(counts.stat().st_mtime, timezone.utc)
+            fetched = max(fetched, refreshed) if fetched else refreshed
+        dates.append(fetched)
+    known = [d for d in dates if d is not None]
+    if not known:
+        return float("inf")
+    return (now - min(known)).total_seconds() / 86400
+
+
+def plan(cache_dir, raw_dir, budget=None, max_age_days=None, now=None, citations=False):
+    """
+    Autori da aggiornare: [(cartella, manifest, priorita', chiamate stimate)].
+    Priorita' = eta' dei dati in giorni (al massimo 10 volte la soglia) x (1 + accessi
+    recenti); si scorre la lista in ordine di priorita' prendendo gli autori che
+    stanno nel budget.
+    """
+    from src.core import pipeline
+
+    budget = REFRESH_API_BUDGET if budget is None else budget
+    if max_age_days is None:
+        max_age_days = REFRESH_CITATIONS_MAX_AGE_DAYS if citations else REFRESH_MAX_AGE_DAYS
+    now = now or datetime.now(timezone.utc)
+    scores = access_scores(now.timestamp())
+
+    candidates = []
+    for author_dir, manifest in pipeline.manifests(cache_dir):
+        if manifest.get("partial"):
+            continue  # i risultati parziali li completa gia' processing_logic.schedule_completion
+        age = _age_days(manifest, raw_dir, now, citations)
+        if age < max_age_days:
+            continue
+        priority = min(age, 10 * max_age_days) * (1 + scores.get(author_dir.name, 0.0))
+        calls = estimated_calls(manifest["scopus_id"], manifest["scholar_id"],
+                                manifest.get("year_from"), manifest.get("year_to"), raw_dir, citations)
+        candidates.append((author_dir.name, manifest, priority, calls))
+
+    selected = []
+    for candidate in sorted(candidates, key=lambda c: c[2], reverse=True):
+        if candidate[3] <= budget:
+            selected.append(candidate)
+            budget -= candidate[3]
+    return selected
+
+
+# ============================================================
+#  AGGIORNAMENTO
+# ============================================================
+
+def _promote(staging, target):
+    """Sostituisce target con il file appena scaricato, salvo che sia molto piu' corto (download interrotto)."""
+    if not staging.exists():
+        return False
+    try:
+        old_rows = len(pd.read_csv(target)) if target.exists() else 0
+        new_rows = len(pd.read_csv(staging))
+    except (OSError, pd.errors.EmptyDataError):
+        new_rows = 0
+    if new_rows < old_rows * MIN_ROWS_RATIO:
+        logger.warning("Nuovo download scartato: troppe righe in meno",
+                       extra={"file": target.name, "old_rows": old_rows, "new_rows": new_rows})
+        staging.unlink(missing_ok=True)
+        return False
+    os.replace(staging, target)
+    return True
+
+
+def refresh_author(manifest):
+    """
+    Riscarica Scopus e Scholar dell'autore e ricostruisce la cartella risultati.
+    Ritorna "updated", "unchanged" (nessun dato nuovo utilizzabile) o "error".
+    La cartella in uso viene sostituita solo a ricalcolo completato, e la data di
+    download si aggiorna solo per i file accettati da _promote: un download scartato
+    lascia l'autore tra quelli da aggiornare.
+    """
+    from src.core import processing_logic, rate_limit
+
+    window = {"year_from": manifest.get("year_from"), "year_to": manifest.get("year_to")}
+    scopus_id, scholar_id, safe_name = manifest["scopus_id"], manifest["scholar_id"], manifest["safe_name"]
+    _, scopus_file, scholar_file = processing_logic.author_paths(scopus_id, scholar_id, safe_name, **window)
+    sources = {scopus_file: ("scopus", scopus_id), scholar_file: ("scholar", scholar_id)}
+    staging = {f: f.with_name(f.stem + ".refresh.csv") for f in sources}
+
+    with rate_limit.priority("batch"):
+        error = processing_logic.download_sources(scopus_id, scholar_id, safe_name,
+                                                  staging[scopus_file], staging[scholar_file],
+                                                  fresh=True, **window)
+    if error:
+        logger.warning("Aggiornamento: download incompleto", extra={"author": safe_name, "error": error.get("msg")})
+
+    promoted = [_promote(new, target) for target, new in staging.items()]
+    for target, ok in zip(staging, promoted):
+        if ok:
+            source, source_id = sources[target]
+            raw_store.record_fetch(source, raw_store.window_key(source_id, **window), processing_logic.RAW_DIR,
+                                   rows=len(pd.read_csv(target)))
+    if not any(promoted):
+        return "error" if error else "unchanged"
+    try:
+        processing_logic.run_stages(scopus_id, scholar_id, safe_name, **window)
+    except (OSError, ValueError) as e:
+        # Es. LOW_MATCH_SCORE sui nuovi dati: resta la cartella risultati precedente
+        logger.warning("Aggiornamento: ricalcolo non riuscito", extra={"author": safe_name, "error": e})
+        return "error"
+    return "updated"
+
+
+def refresh_citations(manifest):
+    """Solo citazioni (processing_logic.refresh_citations), con priorita' "batch"."""
+    from src.core import processing_logic, rate_limit
+
+    with rate_limit.priority("batch"):
+        result = processing_logic.refresh_citations(manifest["scopus_id"], manifest["scholar_id"], manifest["safe_name"],
+                                                    manifest.get("year_from"), manifest.get("year_to"))
+    return "updated" if result["status"] == "success" else "error"
+
+
+def run_pass(budget=None, force=False, now=None, citations=False):
+    """Un giro di aggiornamento. Genera (cartella, esito); niente fuori dalla fascia oraria salvo force."""
+    from src.core import processing_logic
+
+    if not force and not in_refresh_hours(now):
+        logger.info(f"Fuori dalla fascia di aggiornamento ({REFRESH_HOURS}): nessun autore aggiornato")
+        return
+    mode = "citations" if citations else "full"
+    for folder, manifest, _, calls in plan(processing_logic.CACHE_DIR, processing_logic.RAW_DIR, budget,
+                                           citations=citations):
+        with telemetry.stage_timer("refresh_author", logger, folder=folder, estimated_calls=calls, mode=mode):
+            outcome = refresh_citations(manifest) if citations else refresh_author(manifest)
+        telemetry.count("refresh_total", outcome=outcome, mode=mode)
+        yield folder, outcome
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    telemetry.configure_logging()
+
+    parser = argparse.ArgumentParser(description="Aggiornamento programmato degli autori in cache")
+    parser.add_argument("--now", action="store_true", help="ignora la fascia oraria REFRESH_HOURS")
+    parser.add_argument("--loop", action="store_true", help=f"resta attivo e ricontrolla ogni {REFRESH_INTERVAL}s")
+    parser.add_argument("--budget", type=int, default=None, help="chiamate API stimate per giro")
+    parser.add_argument("--citations", action="store_true", help="aggiorna solo le citazioni (poche chiamate per autore)")
+    args = parser.parse_args()
+    while True:
+        for folder, outcome in run_pass(args.budget, force=args.now, citations=args.citations):
+            print(f"{outcome:>9} {folder}")
+        if not args.loop:
+            break
+        time.sleep(REFRESH_INTERVAL)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+results_api.py
+==============
+Lettura dei risultati in cache per le API JSON della dashboard.
+
+- folder_etag(): ETag della cartella risultati (nome, dimensione e data dei CSV,
+  di pipeline.json e del marcatore dei risultati parziali; con charts=True anche
+  dei grafici): cambia solo quando i risultati vengono ricostruiti, non quando si
+  scaricano report.xlsx o lo ZIP, quindi i client possono rivalidare con
+  If-None-Match senza riscaricare nulla
+- read_metrics(): metriche riassuntive (metrics.csv) e grafici gia' disegnati
+- query_publications(): pubblicazioni filtrate, ordinate e paginate lato server
+
+Le pubblicazioni sono i tre CSV di save_author_cache (conferences, journals,
+other_works) riuniti con la colonna "category"; la tabella letta resta in
+memoria (per cartella ed ETag) e le pagine successive non rileggono i file.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+from src.core.charts import CHARTS
+
+PARTIAL_MARKER = "partial.json"  # come processing_logic.PARTIAL_MARKER
+MANIFEST = "pipeline.json"       # come pipeline.MANIFEST
+CATEGORIES = {"conference": "conferences.csv", "journal": "journals.csv", "other": "other_works.csv"}
+SORTABLE = ["year", "title", "citations_scopus", "citations_scholar", "venue", "core_rank", "scimago_quartile", "sjr_score"]
+RANK_ORDER = {"A*": 1, "A": 2, "B": 3, "C": 4}
+QUARTILE_ORDER = {"Q1": 1, "Q2": 2, "Q3": 3, "Q4": 4}
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+MAX_CACHED_TABLES = 16
+
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+
+def author_dir(cache_dir, folder):
+    """Cartella risultati dell'autore, oppure None (inesistente o fuori da cache_dir)."""
+    base = Path(cache_dir).resolve()
+    path = (base / folder).resolve()
+    if path.parent != base or not path.is_dir():
+        return None
+    return path
+
+
+def folder_etag(path, charts=False):
+    path = Path(path)
+    files = sorted(path.glob("*.csv")) + [path / MANIFEST, path / PARTIAL_MARKER]
+    if charts:
+        files += [path / f"{name}.png" for name in CHARTS]
+    h = hashlib.sha256()
+    for f in files:
+        try:
+            st = f.stat()
+        except OSError:
+            continue
+        h.update(f"{f.name}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return h.hexdigest()[:20]
+
+
+def read_metrics(path):
+    path = Path(path)
+    try:
+        df = pd.read_csv(path / "metrics.csv", dtype=str, keep_default_na=False)
+    except (OSError, pd.errors.EmptyDataError):
+        df = pd.DataFrame(columns=["Metric", "Value"])
+    # ?v= cambia con il file: l'URL del grafico puo' restare in cache a lungo nel browser
+    charts = [{"name": name, "url": f"/charts/{path.name}/{name}?v={(path / f'{name}.png').stat().st_mtime_ns}"}
+              for name in CHARTS if (path / f"{name}.png").exists()]
+    return {
+        "metrics": dict(zip(df["Metric"], df["Value"])),
+        "partial": (path / PARTIAL_MARKER).exists(),
+        "charts": charts,
+    }
+
+
+# ============================================================
+#  PUBBLICAZIONI
+# ============================================================
+
+def load_publications(path):
+    """Tabella unica delle pubblicazioni dell'autore (colonna "category" = CSV di provenienza)."""
+    path = Path(path)
+    etag = folder_etag(path)
+    with _tables_lock:
+        cached = _tables.get(path)
+        if cached is not None and cached[0] == etag:
+            _tables.move_to_end(path)
+            return cached[1]
+
+    frames = []
+    for category, filename in CATEGORIES.items():
+        try:
+            # "N/A" (rank o quartile mancante) resta un valore filtrabile, non NaN
+            df = pd.read_csv(path / filename, keep_default_na=False, na_values=[""])
+        except (OSError, pd.errors.EmptyDataError):
+            continue
+        frames.append(df.assign(category=category))
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["title", "year", "category"])
+    table["year"] = pd.to_numeric(table["year"], errors="coerce").round().astype("Int16")
+
+    with _tables_lock:
+        _tables[path] = (etag, table)
+        _tables.move_to_end(path)
+        while len(_tables) > MAX_CACHED_TABLES:
+            _tables.popitem(last=False)
+    return table
+
+
+def _values(args, name):
+    """Parametro multi-valore: ?rank=A*,A oppure ?rank=A*&rank=A."""
+    raw = args.getlist(name) if hasattr(args, "getlist") else [args.get(name)] if args.get(name) else []
+    return [v.strip() for item in raw for v in str(item).split(",") if v.strip()]
+
+
+def _int_param(args, name, default, low, high):
+    value = args.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"Parametro {name} non valido: {value}") from None
+    if not low <= number <= high:
+        raise ValueError(f"Parametro {name} fuori intervallo ({low}-{high}): {value}")
+    return number
+
+
+def query_publications(table, args):
+    """
+    Filtra, ordina e pagina la tabella delle pubblicazioni. Parametri (query string):
+      type        conference, journal, other (anche piu' valori separati da virgola)
+      rank        rank CORE (A*, A, B, C, N/A)
+      quartile    quartile Scimago (Q1..Q4, N/A)
+      year_from / year_to   estremi inclusi
+      sort        colonna di SORTABLE, "-" davanti per l'ordine decrescente (default -year)
+      page / per_page       pagina da 1, massimo MAX_PER_PAGE righe
+    ValueError per parametri non validi.
+    """
+    df = table
+    types = _values(args, "type")
+    unknown = set(types) - set(CATEGORIES)
+    if unknown:
+        raise ValueError(f"Tipo non valido: {', '.join(sorted(unknown))}")
+    if types:
+        df = df[df["category"].isin(types)]
+    for param, column in (("rank", "core_rank"), ("quartile", "scimago_quartile")):
+        wanted = _values(args, param)
+        if wanted:
+            df = df[df[column].isin(wanted)] if column in df.columns else df.iloc[0:0]
+
+    year_from = _int_param(args, "year_from", None, 1900, 2100)
+    year_to = _int_param(args, "year_to", None, 1900, 2100)
+    if year_from is not None:
+        df = df[df["year"] >= year_from]
+    if year_to is not None:
+        df = df[df["year"] <= year_to]
+
+    sort = args.get("sort") or "-year"
+    column = sort.lstrip("-")
+    if column not in SORTABLE:
+        raise ValueError(f"Ordinamento non valido: {sort}")
+    if column in df.columns:
+        order = {"core_rank": RANK_ORDER, "scimago_quartile": QUARTILE_ORDER}.get(column)
+        # Rank e quartili seguono l'ordine di merito (A* prima di A, Q1 prima di Q2), non quello alfabetico
+        key = (lambda s: s.map(order).fillna(99)) if order else None
+        df = df.sort_values(column, ascending=not sort.startswith("-"), key=key, kind="stable", na_position="last")
+
+    per_page = _int_param(args, "per_page", DEFAULT_PER_PAGE, 1, MAX_PER_PAGE)
+    page = _int_param(args, "page", 1, 1, 10 ** 6)
+    total = len(df)
+    rows = df.iloc[(page - 1) * per_page: page * per_page]
+    return {
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "pages": max(1, -(-total // per_page)),
+        "items": json.loads(rows.to_json(orient="records")),
+    }
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+telemetry.py
+============
+Logging strutturato, timer per fase e contatori della pipeline.
+
+- configure_logging(): formato "chiave=valore" con livello da LOG_LEVEL
+- stage_timer("title_match"): misura la durata di una fase (istogramma)
+- count("api_calls_total", service="scopus"): contatori con etichette
+- render_prometheus(): esposizione in formato testo Prometheus (/metrics)
+
+Modulo leggero (solo libreria standard): importabile all'avvio dell'app.
+Le metriche sono per processo; con piu' worker ogni processo espone le proprie.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_lock = threading.Lock()
+_counters = {}     # (nome, etichette) -> valore
+_histograms = {}   # (nome, etichette) -> [conteggi per bucket..., somma, conteggio]
+_help = {
+    "pipeline_stage_seconds": "Durata delle fasi della pipeline",
+    "http_request_seconds": "Durata delle richieste HTTP servite da Flask",
+    "api_calls_total": "Chiamate alle API esterne",
+    "api_throttled_total": "Risposte 429 ricevute dalle API esterne",
+    "cache_hits_total": "Risultati serviti da cache locale",
+    "retries_total": "Tentativi ripetuti dopo un errore",
+    "prefetch_started_total": "Download speculativi avviati da /search_scopus",
+    "prefetch_used_total": "Download speculativi riusati da /process_author",
+    "rate_limit_wait_seconds": "Attesa di un token del limitatore Scopus condiviso",
+    "partial_results_total": "Risultati parziali solo Scopus serviti",
+    "partial_completed_total": "Risultati parziali completati in background con Scholar",
+    "preflight_total": "Esiti del controllo preliminare di identita'",
+    "refresh_total": "Esiti dell'aggiornamento programmato degli autori in cache",
+    "citation_refresh_total": "Aggiornamenti rapidi delle sole citazioni",
+    "scholar_aborted_total": "Profili Scholar interrotti a meta' paginazione e non salvati",
+}
+
+
+# ============================================================
+#  LOGGING
+# ============================================================
+
+class KeyValueFormatter(logging.Formatter):
+    """Aggiunge in coda al messaggio i campi passati con extra={...} come chiave=valore."""
+
+    _standard = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+    def format(self, record):
+        base = super().format(record)
+        extra = {k: v for k, v in record.__dict__.items() if k not in self._standard}
+        if extra:
+            base += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return base
+
+
+def configure_logging(level=None):
+    """Configura il logger radice una sola volta (idempotente)."""
+    root = logging.getLogger()
+    if any(isinstance(h.formatter, KeyValueFormatter) for h in root.handlers):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(KeyValueFormatter("%(asctime)s level=%(levelname)s logger=%(name)s msg=%(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO").upper())
+
+
+# ============================================================
+#  METRICHE
+# ============================================================
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def count(name, value=1, **labels):
+    """Incrementa un contatore (es. count("api_calls_total", service="serpapi"))."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * len(STAGE_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += seconds
+        hist[-1] += 1
+
+
+@contextmanager
+def stage_timer(stage, logger=None, **fields):
+    """Misura una fase della pipeline e la registra in pipeline_stage_seconds{stage=...}."""
+    log = logger or logging.getLogger(__name__)
+    t0 = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        observe("pipeline_stage_seconds", elapsed, stage=stage, outcome=outcome)
+        log.info("fase completata", extra={"stage": stage, "seconds": round(elapsed, 3), "outcome": outcome, **fields})
+
+
+def snapshot():
+    """Copia dei contatori come {nome: {etichette: valore}} (per test e debug)."""
+    out = {}
+    with _lock:
+        for (name, labels), value in _counters.items():
+            out.setdefault(name, {})[labels] = value
+    return out
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def render_prometheus():
+    """Testo in formato di esposizione Prometheus 0.0.4."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items())
+
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {_help.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for (name, labels), hist in histograms:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {_help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        for bound, n in zip(STAGE_BUCKETS, hist):
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {n}")
+        lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {hist[-1]}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {hist[-2]:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {hist[-1]}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+xlsx_export.py
+==============
+Export Excel dei risultati in cache, con openpyxl in modalita' write-only.
+
+- author_workbook(): un file per autore (Metriche, Conferenze, Journal,
+  Altri lavori e, se presenti, Coautori), salvato come report.xlsx accanto
+  ai CSV alla prima richiesta. La cartella dei risultati viene sostituita
+  per intero ad ogni ricalcolo, quindi un report.xlsx presente e' sempre
+  aggiornato.
+- cohort_workbook(): un file per piu' autori (tutta la cache o una selezione,
+  es. un dipartimento), con la colonna "Autore" in ogni foglio. Il nome del
+  file contiene l'impronta dei CSV usati: se nessun autore cambia si riusa.
+
+I CSV si leggono a blocchi di CHUNK_ROWS righe e le righe vengono accodate al
+foglio in streaming (Workbook(write_only=True)): la memoria resta limitata
+anche per export di molti autori.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from src.core import telemetry
+
+logger = logging.getLogger(__name__)
+
+AUTHOR_WORKBOOK = "report.xlsx"
+CHUNK_ROWS = 5000
+SHEETS = [
+    ("Metriche", "metrics.csv"),
+    ("Conferenze", "conferences.csv"),
+    ("Journal", "journals.csv"),
+    ("Altri lavori", "other_works.csv"),
+    ("Coautori", "coauthors.csv"),
+]
+OPTIONAL_SHEETS = {"Coautori"}
+
+_build_lock = threading.Lock()
+
+
+def _chunks(csv_path):
+    """Blocchi del CSV (nessun blocco se il file manca o e' vuoto)."""
+    try:
+        yield from pd.read_csv(csv_path, chunksize=CHUNK_ROWS)
+    except (OSError, pd.errors.EmptyDataError):
+        return
+
+
+def _rows(chunk):
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    return chunk.itertuples(index=False, name=None)
+
+
+def _header(ws, columns):
+    bold = Font(bold=True)
+    cells = []
+    for name in columns:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = bold
+        cells.append(cell)
+    ws.append(cells)
+
+
+def _save(wb, path):
+    """Salvataggio atomico: chi scarica non vede mai un file a meta'."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+    wb.save(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+# ============================================================
+#  EXPORT PER AUTORE
+# ============================================================
+
+def author_workbook(author_dir):
+    """Percorso di report.xlsx, generato alla prima richiesta."""
+    author_dir = Path(author_dir)
+    path = author_dir / AUTHOR_WORKBOOK
+    if path.exists():
+        telemetry.count("cache_hits_total", cache="xlsx")
+        return path
+
+    with telemetry.stage_timer("xlsx_author", logger, dir=author_dir.name):
+        wb = Workbook(write_only=True)
+        for title, filename in SHEETS:
+            if title in OPTIONAL_SHEETS and not (author_dir / filename).exists():
+                continue
+            ws = wb.create_sheet(title)
+            for i, chunk in enumerate(_chunks(author_dir / filename)):
+                if i == 0:
+                    _header(ws, chunk.columns)
+                for row in _rows(chunk):
+                    ws.append(row)
+        return _save(wb, path)
+
+
+# ============================================================
+#  EXPORT DI COORTE
+# ============================================================
+
+def _fingerprint(author_dirs):
+    h = hashlib.sha256()
+    for author_dir in author_dirs:
+        for f in sorted(Path(author_dir).glob("*.csv")):
+            st = f.stat()
+            h.update(f"{author_dir.name}/{f.name}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _cohort_sheet(ws, filename, author_dirs):
+    """Accoda al foglio i CSV di tutti gli autori, con le colonne del primo CSV non vuoto."""
+    columns = None
+    for author_dir in author_dirs:
+        for chunk in _chunks(author_dir / filename):
+            if columns is None:
+                columns = list(chunk.columns)
+                _header(ws, ["Autore"] + columns)
+            chunk = chunk.reindex(columns=columns)
+            for row in _rows(chunk):
+                ws.append((author_dir.name,) + row)
+
+
+def cohort_workbook(cache_dir, export_dir, folders=None):
+    """
+    File Excel di coorte per le cartelle indicate (default: tutta la cache).
+    Le metriche diventano una riga per autore; le pubblicazioni un foglio per tipo.
+    """
+    cache_dir = Path(cache_dir)
+    author_dirs = sorted(d for d in cache_dir.iterdir()
+                         if d.is_dir() and (d / "metrics.csv").exists() and not d.name.endswith((".tmp", ".old")))
+    if folders:
+        author_dirs = [d for d in author_dirs if d.name in set(folders)]
+    if not author_dirs:
+        raise ValueError("Nessun autore in cache per l'export")
+
+    export_dir = Path(export_dir)
+    path = export_dir / f"cohort_{_fingerprint(author_dirs)}.xlsx"
+    if path.exists():
+        telemetry.count("cache_hits_total", cache="xlsx")
+        return path
+
+    with _build_lock, telemetry.stage_timer("xlsx_cohort", logger, authors=len(author_dirs)):
+        if path.exists():
+            return path
+        export_dir.mkdir(parents=True, exist_ok=True)
+        wb = Workbook(write_only=True)
+
+        # Metriche: una riga per autore (le metriche sono poche righe per cartella)
+        ws = wb.create_sheet("Metriche")
+        names = []
+        rows = []
+        for author_dir in author_dirs:
+            metrics = pd.read_csv(author_dir / "metrics.csv", dtype=str, keep_default_na=False)
+            values = dict(zip(metrics["Metric"], metrics["Value"]))
+            names += [n for n in values if n not in names]
+            rows.append((author_dir.name, values))
+        _header(ws, ["Autore"] + names)
+        for name, values in rows:
+            ws.append([name] + [values.get(n) for n in names])
+
+        for title, filename in SHEETS[1:]:
+            _cohort_sheet(wb.create_sheet(title), filename, author_dirs)
+        _save(wb, path)
+
+    # Gli export di coorte piu' vecchi di un'ora si eliminano: se servono si rigenerano su richiesta
+    for old in export_dir.glob("cohort_*.xlsx"):
+        if old != path and old.stat().st_mtime < path.stat().st_mtime - 3600:
+            old.unlink(missing_ok=True)
+    return path
@@ -1,99 +1,181 @@
 
 from serpapi import GoogleSearch
 import pandas as pd
+import logging
 import os
+import time
 
-# La tua API Key
+from src.core import telemetry, key_pool, raw_store
+
+logger = logging.getLogger(__name__)
+
+# La tua API Key (per piu' chiavi in rotazione: SERPAPI_KEYS=chiave1,chiave2)
 SERPAPI_KEY = os.getenv("SERPAPI_KEY")
+# URL alternativo (es. server finto per i test di carico), vuoto = serpapi.com
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "")
+RETRY_BACKOFF = 2  # secondi, raddoppia a ogni tentativo
+
+def _is_quota_error(message):
+    message = str(message).lower()
+    return "run out of searches" in message or "rate limit" in message or "too many requests" in message
+
+
+def fetch_scholar_page(author_id: str, start: int = 0, page_size: int = 100, max_retries: int = 3):
+    """
+    Scarica una singola pagina del profilo (una chiamata SerpApi).
+    Ripete la richiesta in caso di eccezione di rete, con backoff esponenziale.
+    Con piu' chiavi configurate usa il pool (key_pool): una chiave esaurita o
+    limitata esce dalla rotazione e la richiesta riparte subito con un'altra.
+    """
+    params = {
+        "engine": "google_scholar_author",
+        "author_id": author_id,
+        "start": start,
+        "num": page_size,
+        "sort": "pubdate" # Ordina per data (opzionale)
+    }
+
+    pooled = bool(key_pool.configured_keys("serpapi"))
+    for attempt in range(max_retries + 1):
+        try:
+            key = key_pool.choose("serpapi") if pooled else SERPAPI_KEY
+            search = GoogleSearch(dict(params, api_key=key))
+            if SERPAPI_BASE_URL:
+                search.BACKEND = SERPAPI_BASE_URL.rstrip("/")
+            telemetry.count("api_calls_total", service="serpapi", api="google_scholar_author")
+            results = search.get_dict()
+            if pooled and "error" in results and _is_quota_error(results["error"]):
+                key_pool.report("serpapi", key, status_code=429,
+                                exhausted="run out of searches" in results["error"].lower())
+                if attempt < max_retries:
+                    telemetry.count("retries_total", service="serpapi")
+                    continue
+            return results
+        except key_pool.KeysExhausted:
+            raise
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            telemetry.count("retries_total", service="serpapi")
+            wait = RETRY_BACKOFF * 2 ** attempt
+            logger.warning("Errore SerpApi, nuovo tentativo", extra={"error": e, "attempt": attempt + 1, "wait_s": wait})
+            time.sleep(wait)
+
+def _aborted(author_id, start):
+    if start:
+        logger.warning(f"Profilo Scholar incompleto per {author_id} (interrotto a {start}): non salvato")
+        telemetry.count("scholar_aborted_total")
+    return None
+
+
+def fetch_scholar_by_id(author_id: str, output_name: str | None = None, max_retries: int = 3,
+                        first_page: dict | None = None, filename: str | None = None, cancel=None,
+                        year_from: int | None = None, year_to: int | None = None):
+    """
+    Scarica tutte le pagine del profilo e salva data/raw/{nome}_Scholar.csv
+    (oppure nel percorso esplicito filename).
+    first_page: prima pagina gia' scaricata (es. dal pre-flight), non viene richiesta di nuovo.
+    cancel: threading.Event opzionale; se impostato si ferma tra una pagina e l'altra
+    e ritorna None senza salvare un profilo incompleto.
+    Lo stesso vale per un errore SerpApi a meta' paginazione: il profilo troncato
+    non viene salvato (chi lo usa ritenta o tiene il file precedente).
+    year_from / year_to: finestra di valutazione (estremi inclusi). Le pagine sono
+    ordinate per data (sort=pubdate): alla prima pagina che contiene articoli piu'
+    vecchi di year_from la paginazione si ferma.
+    """
+    windowed = year_from is not None or year_to is not None
+
+    logger.info(f"Ricerca Author ID: {author_id}")
 
-def fetch_scholar_by_id(author_id: str, output_name: str | None = None, max_retries: int = 3):
-   
-    print(f"\n Ricerca Author ID: {author_id}")
-    
     all_articles = []
     start = 0
     page_size = 100 # SerpApi permette fino a 100 risultati per pagina
     author_name = "Unknown_Author"
-    
-    while True:
-        print(f" Scarico pagina risultati {start} - {start + page_size}...")
-        
-        params = {
-            "api_key": SERPAPI_KEY,
-            "engine": "google_scholar_author",
-            "author_id": author_id,
-            "start": start,
-            "num": page_size,
-            "sort": "pubdate" # Ordina per data (opzionale)
-        }
 
-        try:
-            search = GoogleSearch(params)
-            results = search.get_dict()
-            
-            # Gestione errori API
-            if "error" in results:
-                print(f" Errore SerpApi: {results['error']}")
-                break
-
-            # Recupera il nome autore (solo al primo giro)
-            if start == 0 and "author" in results:
-                author_name = results["author"].get("name", "Unknown_Author")
-                print(f" Autore Trovato: {author_name}")
-
-            # Estrazione articoli
-            if "articles" in results:
-                articles = results["articles"]
-                if not articles:
-                    print("   🏁 Nessun altro articolo trovato.")
-                    break 
-                
-                for art in articles:
-                    # Mappatura dei dati nel formato che il tuo merge si aspetta
-                    row = {
-                        "title": art.get("title", ""),
-                        "year": art.get("year", ""),
-                        # SerpApi restituisce le citazioni dentro 'cited_by' -> 'value'
-                        "citations_scholar": art.get("cited_by", {}).get("value", 0),
-                        "venue": art.get("publication", ""), 
-                        "link": art.get("link", ""),
-                        "source": "Scholar"
-                    }
-                    all_articles.append(row)
-            else:
-                # Se non c'è la chiave 'articles', abbiamo finito
-                break 
-
-            # Gestione Paginazione 
-            if "serpapi_pagination" in results and "next" in results["serpapi_pagination"]:
-                start += page_size 
-            else:
-                print(" Fine delle pagine disponibili.")
-                break
-            
-        except Exception as e:
-            print(f" Eccezione durante la richiesta SerpApi: {e}")
-            break
+    with telemetry.stage_timer("scholar_pages", logger, author_id=author_id):
+        while True:
+            if cancel is not None and cancel.is_set():
+                logger.info(f"Download Scholar annullato per {author_id}")
+                return None
+
+            logger.info(f"Scarico pagina risultati {start} - {start + page_size}...")
+
+            try:
+                if start == 0 and first_page is not None:
+                    results = first_page
+                else:
+                    results = fetch_scholar_page(author_id, start, page_size, max_retries)
+
+                # Gestione errori API
+                if "error" in results:
+                    logger.error(f"Errore SerpApi: {results['error']}")
+                    return _aborted(author_id, start)
+
+                # Recupera il nome autore (solo al primo giro)
+                if start == 0 and "author" in results:
+                    author_name = results["author"].get("name", "Unknown_Author")
+                    logger.info(f"Autore Trovato: {author_name}")
+
+                # Estrazione articoli
+                if "articles" in results:
+                    articles = results["articles"]
+                    if not articles:
+                        logger.info("Nessun altro articolo trovato.")
+                        break
+
+                    older_than_window = False
+                    for art in articles:
+                        year = raw_store.year_of(art.get("year"))
+                        if windowed and not raw_store.in_year_window(year, year_from, year_to):
+                            older_than_window |= year is not None and year_from is not None and year < year_from
+                            continue
+                        # Mappatura dei dati nel formato che il tuo merge si aspetta
+                        row = {
+                            "title": art.get("title", ""),
+                            "year": art.get("year", ""),
+                            # SerpApi restituisce le citazioni dentro 'cited_by' -> 'value'
+                            "citations_scholar": art.get("cited_by", {}).get("value", 0),
+                            "venue": art.get("publication", ""),
+                            "link": art.get("link", ""),
+                            "source": "Scholar"
+                        }
+                        all_articles.append(row)
+                else:
+                    # Se non c'è la chiave 'articles', abbiamo finito
+                    break
+
+                # Gestione Paginazione
+                if older_than_window:
+                    logger.info(f"Raggiunti articoli precedenti al {year_from}: stop paginazione.")
+                    break
+                if "serpapi_pagination" in results and "next" in results["serpapi_pagination"]:
+                    start += page_size
+                else:
+                    logger.info("Fine delle pagine disponibili.")
+                    break
+
+            except Exception as e:
+                logger.error(f"Eccezione durante la richiesta SerpApi: {e}")
+                return _aborted(author_id, start)
 
     # --- SALVATAGGIO ---
     if not all_articles:
-        print(" Nessun articolo trovato o errore nel download.")
+        logger.warning("Nessun articolo trovato o errore nel download.")
         return None
 
-    print(f" Totale scaricati: {len(all_articles)} articoli.")
-    
+    logger.info(f"Totale scaricati: {len(all_articles)} articoli.")
+
     df = pd.DataFrame(all_articles)
-    
-    # test se la cartella esiste, altrimenti creala
-    os.makedirs("data/raw", exist_ok=True)
 
     # Determina il nome del file
-    if output_name:
-        base = output_name
-    else:
-        base = author_name.replace(" ", "_")
-
-    filename = f"data/raw/{base}_Scholar.csv"
-    df.to_csv(filename, index=False)
-    print(f"\n File salvato: {filename}")
+    if filename is None:
+        base = output_name if output_name else author_name.replace(" ", "_")
+        filename = f"data/raw/{base}_Scholar.csv"
+
+    # test se la cartella esiste, altrimenti creala
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    # Scrittura atomica: un download in background non espone mai un file a meta'
+    df.to_csv(filename + ".tmp", index=False)
+    os.replace(filename + ".tmp", filename)
+    logger.info(f"File salvato: {filename}")
     return filename
\ No newline at end of file
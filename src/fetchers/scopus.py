@@ -10,6 +10,7 @@ Salva i CSV con nome pulito (senza punti).
 """
 
 from pathlib import Path
+import logging
 import os, sys
 import pandas as pd
 from tqdm import tqdm
@@ -21,7 +22,10 @@ project_root = os.path.dirname(os.path.dirname(current_dir))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from pyblio_config import AuthorSearch, AuthorRetrieval, AbstractRetrieval
+from pyblio_config import AuthorSearch, AuthorRetrieval, AbstractRetrieval, ScopusSearch
+from src.core import telemetry, raw_store
+
+logger = logging.getLogger(__name__)
 
 
 # ------------------------------------------------------------
@@ -40,7 +44,7 @@ def ensure_pybliometrics_dirs():
     ]
     for sub in subdirs:
         (base / sub).mkdir(parents=True, exist_ok=True)
-    print("📁 Pybliometrics directories verified.")
+    logger.info("📁 Pybliometrics directories verified.")
 
 
 def clean_name_for_filename(name: str) -> str:
@@ -65,7 +69,7 @@ def ensure_pybliometrics_dirs():
     ]
     for sub in subdirs:
         (base / sub).mkdir(parents=True, exist_ok=True)
-    print("📁 Pybliometrics directories verified.")
+    logger.info("📁 Pybliometrics directories verified.")
 
 
 def clean_name_for_filename(name: str) -> str:
@@ -80,7 +84,7 @@ def search_author_by_name(full_name: str):
     Versione sicura per Web App:
     NON usa input(). Ritorna una lista di dizionari con i candidati.
     """
-    print(f"\n Searching Scopus for author: {full_name}")
+    logger.info(f"Searching Scopus for author: {full_name}")
 
     try:
         parts = full_name.strip().split()
@@ -88,9 +92,10 @@ def search_author_by_name(full_name: str):
         last, first = parts[-1], parts[0] if len(parts) > 1 else ""
         
         query = f'AUTHLASTNAME({last}) AND AUTHFIRST({first})' if first else f'AUTHLASTNAME({last})'
-        print(f"Query Scopus: {query}")
+        logger.info(f"Query Scopus: {query}")
 
-        s = AuthorSearch(query)
+        with telemetry.stage_timer("search", logger):
+            s = AuthorSearch(query)
         
         candidates = []
         if s.authors:
@@ -115,71 +120,130 @@ def search_author_by_name(full_name: str):
         return candidates
 
     except Exception as e:
-        print(f" Errore critico ricerca Scopus: {e}")
+        logger.error(f"Errore critico ricerca Scopus: {e}")
         return []
 
 
+# ------------------------------------------------------------
+# Elenco titoli (senza abstract) per il controllo preliminare
+# ------------------------------------------------------------
+def fetch_document_listing(author_id: str, refresh: bool = False):
+    """
+    Ritorna [{title, year, eid, doi, citations_scopus}] dei documenti dell'autore
+    con una sola ScopusSearch paginata (25 documenti per chiamata), senza AbstractRetrieval.
+    Usa la stessa query di AuthorRetrieval.get_documents(), quindi il download
+    completo successivo trova gia' il risultato nella cache di pybliometrics.
+    refresh=True: ignora la cache di pybliometrics (citazioni aggiornate).
+    """
+    s = ScopusSearch(f"AU-ID({author_id})", refresh=refresh)
+    return [
+        {
+            "title": getattr(doc, "title", "") or "",
+            "year": (getattr(doc, "coverDate", "") or "")[:4],
+            "eid": getattr(doc, "eid", None),
+            "doi": getattr(doc, "doi", None) or "",
+            "citations_scopus": getattr(doc, "citedby_count", 0) or 0,
+        }
+        for doc in (s.results or [])
+    ]
+
+
+def _issn_text(value):
+    """
+    ISSN della rivista come testo: con view FULL pybliometrics restituisce
+    ISSN(print, electronic), salvato come "print,electronic" (vuoti esclusi).
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, tuple):
+        return ",".join(str(v) for v in value if v)
+    return ""
+
+
 # ------------------------------------------------------------
 # Dettagli + pubblicazioni autore (CON BARRA CARICAMENTO)
 # ------------------------------------------------------------
-def fetch_author_details(author_id: str):
+def fetch_author_details(author_id: str, cancel=None, year_from=None, year_to=None, refresh=False):
     """
     Ritorna un dict con metadata autore + lista pubblicazioni.
     Usa TQDM per mostrare il progresso nel terminale.
+    cancel: threading.Event opzionale; se viene impostato il download si ferma
+    tra un abstract e l'altro e la funzione ritorna None (gli abstract gia'
+    scaricati restano nella cache di pybliometrics).
+    year_from / year_to: finestra di valutazione (estremi inclusi). I documenti
+    con coverDate fuori finestra vengono scartati prima di AbstractRetrieval,
+    quindi le chiamate crescono con la finestra e non con la carriera.
+    refresh=True: rilegge anche l'elenco dei documenti (get_documents ignora il
+    refresh di AuthorRetrieval e riusa la ricerca in cache di pybliometrics).
     """
-    print(f"\n Fetching details for author ID: {author_id}\n")
+    logger.info(f"Fetching details for author ID: {author_id}")
 
     try:
-        au = AuthorRetrieval(author_id, refresh=True)
+        with telemetry.stage_timer("author_retrieval", logger, author_id=author_id):
+            au = AuthorRetrieval(author_id, refresh=True)
     except Exception as e:
-        print(f" Errore nel recupero autore: {e}")
+        logger.error(f"Errore nel recupero autore: {e}")
         return None
 
-    print("✓ Author data retrieved:")
-    print(f"✓ Name: {au.given_name} {au.surname}")
-    print(f"✓ Total Documents: {au.document_count}")
-    print("=" * 60)
+    logger.info(f"✓ Author data retrieved: {au.given_name} {au.surname}, documents={au.document_count}")
 
     publications = []
     try:
-        docs = au.get_documents() or []
-        
+        with telemetry.stage_timer("document_listing", logger, author_id=author_id):
+            docs = au.get_documents(refresh=refresh) or []
+        if year_from is not None or year_to is not None:
+            in_window = [d for d in docs if raw_store.in_year_window(getattr(d, "coverDate", None), year_from, year_to)]
+            logger.info(f"Finestra {year_from or ''}-{year_to or ''}: {len(in_window)} documenti su {len(docs)}")
+            docs = in_window
+
         # --- BARRA DI CARICAMENTO TQDM ---
         # desc: Testo accanto alla barra
         # unit: Unità di misura (es. "paper")
-        for doc in tqdm(docs, desc="⬇ Scaricando Abstract", unit="paper", ncols=100):
-            
-            eid = getattr(doc, "eid", None)
-            if eid:
-                try:
+        with telemetry.stage_timer("abstracts", logger, author_id=author_id, documents=len(docs)):
+            for doc in tqdm(docs, desc="⬇ Scaricando Abstract", unit="paper", ncols=100):
+                if cancel is not None and cancel.is_set():
+                    logger.info(f"Download Scopus annullato per {author_id}")
+                    return None
+
+                eid = getattr(doc, "eid", None)
+                authors = []
+                if eid:
+                    try:
             
-                    ab = AbstractRetrieval(eid, view='FULL')  
-                    doc_type = getattr(ab, "aggregationType", "N/A") 
-                    source_type = getattr(ab, "subtype", "N/A")      
+                        ab = AbstractRetrieval(eid, view='FULL')  
+                        doc_type = getattr(ab, "aggregationType", "N/A") 
+                        source_type = getattr(ab, "subtype", "N/A")      
+                        # Autori gia' presenti nell'abstract: servono al grafo dei coautori
+                        authors = getattr(ab, "authors", None) or []
                     
-                except Exception:
-                    doc_type, source_type = "ERROR", "ERROR"
-            else:
-                doc_type, source_type = "N/A", "N/A"
-
-            title = getattr(doc, "title", "")
-            year = getattr(doc, "coverDate", "")[:4]
-            cited = getattr(doc, "citedby_count", 0)
-            doi = getattr(doc, "doi", "")
-            source = getattr(doc, "publicationName", "")
+                    except Exception:
+                        doc_type, source_type = "ERROR", "ERROR"
+                else:
+                    doc_type, source_type = "N/A", "N/A"
+
+                title = getattr(doc, "title", "")
+                year = getattr(doc, "coverDate", "")[:4]
+                cited = getattr(doc, "citedby_count", 0)
+                doi = getattr(doc, "doi", "")
+                source = getattr(doc, "publicationName", "")
+                issn = _issn_text(getattr(doc, "issn", None))
             
-            publications.append({
-                "title": title,
-                "year": year,
-                "citations_scopus": cited,
-                "venue_scopus": source,
-                "doi": doi,
-                "document_type": doc_type,
-                "source_type": source_type
-            })
+                publications.append({
+                    "title": title,
+                    "year": year,
+                    "citations_scopus": cited,
+                    "venue_scopus": source,
+                    "issn": issn,
+                    "doi": doi,
+                    "document_type": doc_type,
+                    "source_type": source_type,
+                    "author_ids": ";".join(str(a.auid) for a in authors if getattr(a, "auid", None)),
+                    "author_names": ";".join(str(a.indexed_name or "").replace(";", ",")
+                                             for a in authors if getattr(a, "auid", None))
+                })
             
     except Exception as e:
-        print(f" Errore nel recupero delle pubblicazioni: {e}")
+        logger.error(f"Errore nel recupero delle pubblicazioni: {e}")
 
     aff_str = "N/A"
     if au.affiliation_current:
@@ -203,9 +267,12 @@ def fetch_author_details(author_id: str):
 # ------------------------------------------------------------
 # Salvataggio CSV
 # ------------------------------------------------------------
-def save_to_csv(author_data: dict, selected_name: str):
-    os.makedirs("data/raw", exist_ok=True)
-    filename = f"data/raw/{selected_name}_Scopus.csv"
+def save_to_csv(author_data: dict, selected_name: str, filename: str | None = None):
+    """filename: percorso esplicito (es. archivio per ID), altrimenti data/raw/{nome}_Scopus.csv."""
+    if filename is None:
+        filename = f"data/raw/{selected_name}_Scopus.csv"
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
     df = pd.DataFrame(author_data.get("publications", []))
-    df.to_csv(filename, index=False)
-    print(f"\n ✓ Dati salvati in: {filename}")
\ No newline at end of file
+    df.to_csv(filename + ".tmp", index=False)
+    os.replace(filename + ".tmp", filename)
+    logger.info(f"✓ Dati salvati in: {filename}")
\ No newline at end of file
@@ -8,12 +8,27 @@ Unisce i dati Scopus e Google Scholar.
 Interrompe l'esecuzione se il match rate è inferiore al 60%.
 """
 
+import logging
 import os
+import re
+from pathlib import Path
+
 import pandas as pd
 from rapidfuzz import process, fuzz
 
+from src.core import telemetry
+from src.merge import reference_store
+from src.merge import title_index
+
+logger = logging.getLogger(__name__)
+
 CORE_PATH = "data/external/core.csv"
 SCIMAGO_DIR = "data/external/scimago_clean.csv"
+# Un CSV Scimago per anno (es. "scimagojr 2023.csv"): se presenti sostituiscono SCIMAGO_DIR
+SCIMAGO_YEARS_DIR = "data/external/scimago"
+MIN_MATCH_RATIO = 0.60  # sotto questa quota di titoli abbinati gli autori sono considerati diversi
+# Stringhe con pochi valori distinti: categorie (un codice intero per riga invece di un oggetto)
+CATEGORY_COLUMNS = ["venue", "type", "source_type", "source", "core_rank", "scimago_quartile"]
 
 # ============================================================
 #  NORMALIZZAZIONE E MATCHING 
@@ -30,11 +45,35 @@ def normalize_venue(v):
         v = v.replace(old, new)
     return " ".join(v.split()).strip()
 
+def normalize_issn(v):
+    """ISSN senza trattino e in maiuscolo ("1570-826x" -> "1570826X"); "" se non valido."""
+    v = re.sub(r"[^0-9X]", "", str(v).upper())
+    return v if len(v) == 8 else ""
+
 def find_best_match(venue, ref_list):
     if not isinstance(venue, str) or not venue.strip(): return None
     match = process.extractOne(venue, ref_list, scorer=fuzz.token_sort_ratio, score_cutoff=70)
     return match[0] if match else None
 
+def compact_dtypes(df):
+    """
+    Tipi compatti (in place) per le colonne presenti: anno Int16 (mancante resta <NA>:
+    non e' un anno, ne' per il quartile dell'anno ne' per filtri e grafici), citazioni
+    int32 (mancanti a 0, come in numeric_columns), SJR float32, CATEGORY_COLUMNS categoriche.
+    I CSV scritti non cambiano; i DataFrame in memoria e gli stadi memoizzati si riducono.
+    """
+    if "year" in df.columns:
+        df["year"] = pd.to_numeric(df["year"], errors="coerce").round().astype("Int16")
+    for c in ("citations_scopus", "citations_scholar"):
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype("int32")
+    if "sjr_score" in df.columns:
+        df["sjr_score"] = pd.to_numeric(df["sjr_score"], errors="coerce").astype("float32")
+    for c in CATEGORY_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].fillna("").astype(str).astype("category")
+    return df
+
 # ============================================================
 #  CARICAMENTO DATI ESTERNI 
 # ============================================================
@@ -48,73 +87,142 @@ def load_core_data():
         return df, rank_col
     except: return pd.DataFrame(), None
 
-def load_scimago_data():
-    if not os.path.exists(SCIMAGO_DIR): return pd.DataFrame()
+def scimago_year_files():
+    """{anno: file} dei CSV Scimago annuali (anno ricavato dal nome del file)."""
+    files = {}
+    for path in sorted(Path(SCIMAGO_YEARS_DIR).glob("*.csv")):
+        match = re.search(r"(19|20)\d{2}", path.stem)
+        if match:
+            files[int(match.group(0))] = str(path)
+    return files
+
+def scimago_sources():
+    return list(scimago_year_files().values()) or [SCIMAGO_DIR]
+
+def load_scimago_data(path=SCIMAGO_DIR):
+    if not os.path.exists(path): return pd.DataFrame()
     try:
-        df = pd.read_csv(SCIMAGO_DIR, on_bad_lines="skip", quotechar='"')
+        df = pd.read_csv(path, on_bad_lines="skip", quotechar='"')
         df.columns = [c.strip().lower() for c in df.columns]
         name_col = next((c for c in df.columns if "title" in c), None)
         if name_col: df["venue_norm"] = df[name_col].fillna("").apply(normalize_venue)
         return df
     except: return pd.DataFrame()
 
+# ============================================================
+#  DATI DI RIFERIMENTO COMPILATI (memory-mapped, condivisi tra worker)
+# ============================================================
+
+def _core_table():
+    df, rank_col = load_core_data()
+    if df.empty or not rank_col: return None
+    return df, "venue_norm", {"core_rank": rank_col}, {}
+
+def _scimago_columns(df):
+    quartile_col = next((c for c in df.columns if "quartile" in c), None)
+    sjr_col = next((c for c in df.columns if "sjr" in c and "quartile" not in c), None)
+    return quartile_col, sjr_col
+
+def _issn_list(value):
+    """ISSN normalizzati validi di un campo "a, b" (Scimago) o "a,b" (Scopus)."""
+    return [n for n in map(normalize_issn, str(value).split(",")) if n]
+
+def _scimago_table():
+    """
+    Con i file annuali (SCIMAGO_YEARS_DIR) una tabella unica (rivista, anno):
+    di ogni file si tengono solo le colonne usate, i nomi vengono compilati una volta.
+    Altrimenti il singolo SCIMAGO_DIR, senza anno. Gli ISSN normalizzati vanno nella
+    colonna issn_norm (compilata a parte, solo per il match esatto).
+    """
+    years = scimago_year_files()
+    frames = []
+    for year, path in (years.items() or [(None, SCIMAGO_DIR)]):
+        df = load_scimago_data(path)
+        if df.empty or "venue_norm" not in df.columns: continue
+        issn_col = next((c for c in df.columns if "issn" in c), None)
+        df = df[["venue_norm"] + [c for c in _scimago_columns(df) if c]].assign(
+            issn_norm=df[issn_col].fillna("").map(lambda v: ",".join(_issn_list(v))) if issn_col else "")
+        frames.append(df if year is None else df.assign(year=year))
+    if not frames: return None
+    df = pd.concat(frames, ignore_index=True)
+    quartile_col, sjr_col = _scimago_columns(df)
+    categorical = {"scimago_quartile": quartile_col} if quartile_col else {}
+    numeric = {"sjr_score": sjr_col} if sjr_col else {}
+    return df, "venue_norm", categorical, numeric, "year" if years else None, "issn_norm"
+
+REFERENCE_SOURCES = {
+    "core": (lambda: [CORE_PATH], _core_table),
+    "scimago": (scimago_sources, _scimago_table),
+}
+
+def get_reference(name):
+    sources, loader = REFERENCE_SOURCES[name]
+    return reference_store.open_reference(name, sources(), loader)
+
+def reference_signature():
+    """Firma dei file CORE/Scimago (None se assenti): ingresso dello stadio di arricchimento."""
+    signatures = {}
+    for name, (sources, _) in REFERENCE_SOURCES.items():
+        paths = sources()
+        signatures[name] = reference_store.source_signature(paths) if all(os.path.exists(p) for p in paths) else None
+    return signatures
+
+def enrich_from_reference(merged_df, ref, columns):
+    """
+    Aggiunge a merged_df le colonne richieste cercando ogni venue (una volta sola) nel riferimento;
+    se il riferimento ha gli ISSN (Scimago) si provano prima gli ISSN della pubblicazione
+    (cartaceo ed elettronico, separati da virgola), nell'ordine.
+    Riferimenti annuali: il valore e' quello dell'anno della pubblicazione (o del
+    piu' vicino), con accesso diretto alla matrice per ogni riga.
+    """
+    matches = {v: ref.find(v) for v in merged_df["venue_norm"].unique()}
+    idx = merged_df["venue_norm"].map(matches)
+    if "issn" in merged_df.columns:
+        issns = merged_df["issn"].fillna("").astype(str).map(_issn_list)
+        by_issn = {v: ref.find_issn(v) for v in set().union(*issns)}
+        found = issns.map(lambda values: next((by_issn[v] for v in values if by_issn[v] is not None), None))
+        idx = found.fillna(idx)
+    for col in columns:
+        merged_df[col] = [ref.value(None if pd.isna(i) else int(i), col, year)
+                          for i, year in zip(idx, merged_df["year"])]
+
 # ============================================================
 #  MERGE PRINCIPALE 
 # ============================================================
 
 def fuzzy_merge_datasets(scopus_file, scholar_file):
-    print(f"\n Avvio confronto tra: {scopus_file.name} e {scholar_file.name}")
+    with telemetry.stage_timer("title_match", logger):
+        merged_df = merge_titles(scopus_file, scholar_file)
+    with telemetry.stage_timer("venue_match", logger, rows=len(merged_df)):
+        return enrich_venues(merged_df)
 
-    scopus_df = pd.read_csv(scopus_file)
-    scholar_df = pd.read_csv(scholar_file)
+def merge_titles(scopus_file, scholar_file):
+    """Legge i CSV grezzi e ne abbina i titoli (vedi match_titles), senza arricchimento."""
+    logger.info(f"Avvio confronto tra: {scopus_file.name} e {scholar_file.name}")
+    return match_titles(pd.read_csv(scopus_file), pd.read_csv(scholar_file))
 
+def match_titles(scopus_df, scholar_df):
+    """
+    Abbina i titoli Scopus a quelli Scholar e aggiunge i record solo-Scholar.
+    Lancia ValueError("LOW_MATCH_SCORE") se il match rate e' inferiore al 60%.
+    """
     # 1. Normalizzazione Titoli
     scopus_df["title_norm"] = scopus_df["title"].fillna("").astype(str).str.lower().str.strip()
     scholar_df["title_norm"] = scholar_df["title"].fillna("").astype(str).str.lower().str.strip()
     
     scholar_title_list = scholar_df["title_norm"].tolist()
-    scholar_titles_map = scholar_df.set_index("title_norm")
-
-    merged_rows = []
-    match_count = 0
-    matched_scholar_titles = set()
-
-    # 2. Matching Scopus/Scholar 
-    for _, s_row in scopus_df.iterrows():
-        title_norm = s_row["title_norm"]
-        print(f" Elaborazione: {s_row['title']}")
-        match = process.extractOne(title_norm, scholar_title_list, scorer=fuzz.token_sort_ratio, score_cutoff=70)
-        
-        base_row = {
-            "title": s_row["title"].title(),
-            "doi": s_row.get("doi", ""),
-            "type": s_row.get("document_type", ""),
-            "source_type": s_row.get("source_type", "")
-        }
+    # Sopra TITLE_INDEX_MIN_ROWS titoli Scholar si usa l'indice di trigrammi (sub-quadratico)
+    matcher = title_index.make_matcher(scholar_title_list)
 
-        if match:
-            match_title_norm = match[0]
-            sch_row = scholar_titles_map.loc[match_title_norm]
-            
-            matched_scholar_titles.add(match_title_norm)
-            match_count += 1
-            
-            base_row.update({
-                "year": s_row.get("year", sch_row.get("year", "")),
-                "citations_scopus": s_row.get("citations_scopus", 0),
-                "citations_scholar": sch_row.get("citations_scholar", 0),
-                "venue": s_row.get("venue_scopus", sch_row.get("venue", "")),
-                "source": "Scopus + Scholar"
-            })
-        else:
-            base_row.update({
-                "year": s_row.get("year", ""),
-                "citations_scopus": s_row.get("citations_scopus", 0),
-                "citations_scholar": 0,
-                "venue": s_row.get("venue_scopus", ""),
-                "source": "Scopus"
-            })
-        merged_rows.append(base_row)
+    # 2. Matching Scopus/Scholar: si cerca solo il titolo, le colonne si costruiscono intere
+    matches = []
+    for title_norm in scopus_df["title_norm"]:
+        logger.debug("Elaborazione: %s", title_norm)
+        match = matcher.find(title_norm)
+        matches.append(match[0] if match else None)
+    match_norm = pd.Series(matches, index=scopus_df.index, dtype=object)
+    matched = match_norm.notna()
+    match_count = int(matched.sum())
 
     # =========================================================
     # 3.CONTROLLO PERCENTUALE
@@ -123,51 +231,60 @@ def fuzzy_merge_datasets(scopus_file, scholar_file):
     total_scopus = len(scopus_df)
     match_ratio = match_count / total_scopus if total_scopus > 0 else 0
 
-    print(f"Match trovati: {match_count}/{total_scopus} ({match_ratio:.1%})")
+    logger.info(f"Match trovati: {match_count}/{total_scopus} ({match_ratio:.1%})")
 
-    if match_ratio < 0.60:
-        print(f"Match < 60% ({match_ratio:.1%}): Probabilmente non sono la stessa persona.")
+    if match_ratio < MIN_MATCH_RATIO:
+        logger.warning(f"Match < 60% ({match_ratio:.1%}): Probabilmente non sono la stessa persona.")
     
         raise ValueError("LOW_MATCH_SCORE") 
   
-    print("Percentuale valida. Integrazione dati in corso...")
+    logger.info("Percentuale valida. Integrazione dati in corso...")
+
+    # Colonna della riga Scholar abbinata (a parita' di titolo vale la prima)
+    scholar_by_title = scholar_df.drop_duplicates(subset="title_norm").set_index("title_norm")
+    col = lambda df, name, default="": df[name] if name in df.columns else pd.Series(default, index=df.index)
+    matched_col = lambda name, default="": match_norm.map(col(scholar_by_title, name, default)).where(matched, default)
 
- 
+    scopus_part = pd.DataFrame({
+        "title": scopus_df["title"].fillna("").astype(str).str.title(),
+        "doi": col(scopus_df, "doi"),
+        "issn": col(scopus_df, "issn"),
+        "type": col(scopus_df, "document_type"),
+        "source_type": col(scopus_df, "source_type"),
+        "year": scopus_df["year"] if "year" in scopus_df.columns else matched_col("year"),
+        "citations_scopus": col(scopus_df, "citations_scopus", 0),
+        "citations_scholar": matched_col("citations_scholar", 0),
+        "venue": scopus_df["venue_scopus"] if "venue_scopus" in scopus_df.columns else matched_col("venue"),
+        "source": matched.map({True: "Scopus + Scholar", False: "Scopus"}),
+    })
 
     # Aggiunta record Scholar 
-    unmatched_scholar = scholar_df[~scholar_df["title_norm"].isin(matched_scholar_titles)]
-    for _, row in unmatched_scholar.iterrows():
-        merged_rows.append({
-            "title": row["title"].title(),
-            "year": row.get("year", ""),
-            "citations_scopus": 0,
-            "citations_scholar": row.get("citations_scholar", 0),
-            "venue": row.get("venue", ""),
-            "source": "Scholar",
-            "type": "", "source_type": "", "doi": ""
-        })
-
-    merged_df = pd.DataFrame(merged_rows)
-    merged_df["venue_norm"] = merged_df["venue"].fillna("").apply(normalize_venue)
-
-    # Merge con CORE
-    core_df, core_rank_col = load_core_data()
-    if not core_df.empty:
-        core_list = core_df["venue_norm"].unique().tolist()
-        merged_df["core_match"] = merged_df["venue_norm"].apply(lambda v: find_best_match(v, core_list))
-        merged_df = merged_df.merge(core_df, how="left", left_on="core_match", right_on="venue_norm", suffixes=("", "_core"))
-        if core_rank_col: merged_df.rename(columns={core_rank_col: "core_rank"}, inplace=True)
-
-    # Merge con SCIMAGO
-    sjr_df = load_scimago_data()
-    if not sjr_df.empty:
-        sjr_list = sjr_df["venue_norm"].unique().tolist()
-        merged_df["sjr_match"] = merged_df["venue_norm"].apply(lambda v: find_best_match(v, sjr_list))
-        merged_df = merged_df.merge(sjr_df, how="left", left_on="sjr_match", right_on="venue_norm", suffixes=("", "_sjr"))
-        
-        for col in merged_df.columns:
-            if "quartile" in col: merged_df.rename(columns={col: "scimago_quartile"}, inplace=True)
-            if "sjr" in col and "match" not in col: merged_df.rename(columns={col: "sjr_score"}, inplace=True)
+    unmatched = scholar_df[~scholar_df["title_norm"].isin(set(match_norm.dropna()))]
+    scholar_part = pd.DataFrame({
+        "title": unmatched["title"].fillna("").astype(str).str.title(),
+        "doi": "", "issn": "", "type": "", "source_type": "",
+        "year": col(unmatched, "year"),
+        "citations_scopus": 0,
+        "citations_scholar": col(unmatched, "citations_scholar", 0),
+        "venue": col(unmatched, "venue"),
+        "source": "Scholar",
+    }, index=unmatched.index)
+
+    return compact_dtypes(pd.concat([scopus_part, scholar_part], ignore_index=True))
+
+def enrich_venues(merged_df):
+    """Aggiunge rank CORE e quartile/SJR Scimago e riduce alle colonne finali."""
+    merged_df["venue_norm"] = merged_df["venue"].fillna("").astype(str).map(normalize_venue)
+
+    # Arricchimento con CORE (solo la colonna rank, dal formato memory-mapped)
+    core_ref = get_reference("core")
+    if core_ref is not None:
+        enrich_from_reference(merged_df, core_ref, ["core_rank"])
+
+    # Arricchimento con SCIMAGO (quartile e SJR)
+    sjr_ref = get_reference("scimago")
+    if sjr_ref is not None:
+        enrich_from_reference(merged_df, sjr_ref, sjr_ref.columns)
 
     # Pulizia Finale
     keep_cols = ["title", "year", "citations_scopus", "citations_scholar", "venue", "doi", "core_rank", "scimago_quartile", "sjr_score", "type", "source"]
@@ -179,6 +296,78 @@ def fuzzy_merge_datasets(scopus_file, scholar_file):
     merged_df["core_rank"] = merged_df["core_rank"].fillna("N/A").replace("", "N/A")
     merged_df["scimago_quartile"] = merged_df["scimago_quartile"].fillna("N/A").replace("", "N/A")
 
-    print("Merge completato.")
-    return merged_df
+    logger.info("Merge completato.")
+    return compact_dtypes(merged_df)
+
+
+
+def _replace_counts(df, column, rows, new):
+    """Colonna intera: i nuovi conteggi sulle righe abbinate, il valore precedente altrove."""
+    new = pd.Series(new, index=df.index[rows], dtype="float64").reindex(df.index)
+    df[column] = new.fillna(pd.to_numeric(df[column], errors="coerce"))
+
+
+def apply_citations(enriched_df, scopus_counts=None, scholar_counts=None):
+    """
+    Aggiornamento rapido: sostituisce citations_scopus / citations_scholar del
+    dataset gia' abbinato e arricchito con i conteggi appena scaricati
+    (DataFrame con title e citations_<fonte>). Tipi, venue e rank non cambiano.
+    Scopus si abbina per DOI o titolo esatto; Scholar per titolo, con lo stesso
+    matcher di match_titles per le righe che hanno il titolo Scopus.
+    Le pubblicazioni nuove non vengono aggiunte (serve un aggiornamento completo).
+    """
+    df = enriched_df.copy()
+    norm = lambda titles: titles.fillna("").astype(str).str.lower().str.strip()
+    titles = norm(df["title"])
+
+    if scopus_counts is not None and not scopus_counts.empty:
+        counts = pd.to_numeric(scopus_counts["citations_scopus"], errors="coerce")
+        by_title = dict(zip(norm(scopus_counts["title"]), counts))
+        by_doi = {d: c for d, c in zip(scopus_counts.get("doi", pd.Series(dtype=str)).fillna(""), counts) if d}
+        rows = df["source"].astype(str).str.contains("Scopus")
+        new = [by_doi.get(doi) if isinstance(doi, str) and doi in by_doi else by_title.get(t)
+               for doi, t in zip(df.get("doi", pd.Series("", index=df.index))[rows], titles[rows])]
+        _replace_counts(df, "citations_scopus", rows, new)
+
+    if scholar_counts is not None and not scholar_counts.empty:
+        scholar_titles = norm(scholar_counts["title"]).tolist()
+        counts = pd.to_numeric(scholar_counts["citations_scholar"], errors="coerce").tolist()
+        exact = dict(zip(scholar_titles, counts))
+        matcher = title_index.make_matcher(scholar_titles)
+        rows = df["source"].astype(str).str.contains("Scholar")
+        new = []
+        for t in titles[rows]:
+            if t in exact:
+                new.append(exact[t])
+            else:
+                match = matcher.find(t)
+                new.append(counts[match[2]] if match else None)
+        _replace_counts(df, "citations_scholar", rows, new)
+
+    return compact_dtypes(df)
+
+
+def scopus_only_dataset(scopus_file):
+    """
+    Dataset nel formato finale a partire dai soli dati Scopus (risultato parziale,
+    usato quando Scholar non e' disponibile): stesse colonne e stesso arricchimento.
+    """
+    merged_df = scopus_only_rows(pd.read_csv(scopus_file))
+    with telemetry.stage_timer("venue_match", logger, rows=len(merged_df), partial=True):
+        return enrich_venues(merged_df)
 
+def scopus_only_rows(scopus_df):
+    """Righe Scopus nello stesso formato di match_titles, senza abbinamento Scholar."""
+    col = lambda name, default="": scopus_df[name] if name in scopus_df.columns else default
+    return compact_dtypes(pd.DataFrame({
+        "title": scopus_df["title"].fillna("").astype(str).str.title(),
+        "year": col("year"),
+        "citations_scopus": col("citations_scopus", 0),
+        "citations_scholar": 0,
+        "venue": col("venue_scopus"),
+        "doi": col("doi"),
+        "issn": col("issn"),
+        "type": col("document_type"),
+        "source_type": col("source_type"),
+        "source": "Scopus",
+    }))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+reference_store.py
+==================
+Formato compilato e memory-mapped per i dati di riferimento (CORE, Scimago).
+
+Ogni tabella viene compilata una volta in una cartella immutabile
+    data/external/compiled/<nome>-<firma sorgenti>/
+contenente array numpy (.npy) aperti in sola lettura con mmap: nomi normalizzati
+ordinati, codici interi (uint8) per le colonne categoriche (rank, quartile) e float32 per
+quelle numeriche. Tutti i worker WSGI condividono le stesse pagine tramite la
+page cache del sistema operativo invece di caricare ciascuno un DataFrame.
+
+Tabelle annuali (Scimago, un file per anno): i nomi sono salvati una sola volta
+e ogni colonna diventa una matrice nomi x anni (intervallo contiguo di anni).
+Gli anni mancanti per una rivista prendono il valore dell'anno disponibile piu'
+vicino gia' in compilazione: la lettura per (nome, anno) e' un accesso diretto.
+
+Gli ISSN (Scimago) stanno in un array ordinato a parte (issns.npy, con l'indice
+del nome in issn_names.npy): solo ricerca esatta, il fuzzy scorre i soli nomi.
+
+USO (precompilazione prima di avviare i worker):
+    python -m src.merge.reference_store
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import process, fuzz
+
+COMPILED_DIR = Path("data/external/compiled")
+FORMAT_VERSION = 3  # 2: matrice per anno e chiavi ISSN; 3: ISSN in un array a parte
+MATCH_CUTOFF = 70
+
+_open_refs = {}
+_open_lock = threading.Lock()
+
+
+# ============================================================
+#  LETTURA
+# ============================================================
+
+class MappedReference:
+    """Vista in sola lettura su una tabella compilata (nessuna copia in memoria)."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        with open(self.directory / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.labels = meta["labels"]
+        self.years = meta.get("years")  # [primo, ultimo] per le tabelle annuali, altrimenti None
+        self.names = np.load(self.directory / "names.npy", mmap_mode="r")
+        self._codes = {c: np.load(self.directory / f"{c}.npy", mmap_mode="r") for c in self.labels}
+        self._floats = {c: np.load(self.directory / f"{c}.npy", mmap_mode="r") for c in meta["floats"]}
+        if meta.get("issns"):
+            self.issns = np.load(self.directory / "issns.npy", mmap_mode="r")
+            self._issn_names = np.load(self.directory / "issn_names.npy", mmap_mode="r")
+        else:
+            self.issns = self._issn_names = np.array([], dtype=str)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def columns(self):
+        return list(self._codes) + list(self._floats)
+
+    def find(self, venue_norm, fuzzy=True):
+        """Indice del nome piu' simile (match esatto in O(log n), poi fuzzy se richiesto)."""
+        if not isinstance(venue_norm, str) or not venue_norm.strip() or len(self.names) == 0:
+            return None
+        pos = int(np.searchsorted(self.names, venue_norm))
+        if pos < len(self.names) and self.names[pos] == venue_norm:
+            return pos
+        if not fuzzy:
+            return None
+        match = process.extractOne(venue_norm, self.names, scorer=fuzz.token_sort_ratio, score_cutoff=MATCH_CUTOFF)
+        return int(match[2]) if match else None
+
+    def find_issn(self, issn):
+        """Indice del nome con questo ISSN normalizzato (solo match esatto, O(log n))."""
+        if not isinstance(issn, str) or not issn or len(self.issns) == 0:
+            return None
+        pos = int(np.searchsorted(self.issns, issn))
+        if pos < len(self.issns) and self.issns[pos] == issn:
+            return int(self._issn_names[pos])
+        return None
+
+    def year_column(self, year):
+        """Colonna della matrice per l'anno (fuori intervallo o mancante: l'anno piu' vicino / l'ultimo)."""
+        first, last = self.years
+        try:
+            year = int(year)
+        except (TypeError, ValueError):
+            return last - first
+        if year <= 0:  # anno 0: mancante (vecchi stadi con gli anni mancanti a 0)
+            return last - first
+        return min(max(year, first), last) - first
+
+    def value(self, idx, column, year=None):
+        """Valore della colonna per il nome idx; year conta solo per le tabelle annuali."""
+        if idx is None:
+            return None
+        pos = idx if self.years is None else (idx, self.year_column(year))
+        if column in self._codes:
+            code = int(self._codes[column][pos])
+            return self.labels[column][code] if code else None
+        val = float(self._floats[column][pos])
+        return None if np.isnan(val) else val
+
+
+# ============================================================
+#  COMPILAZIONE
+# ============================================================
+
+def source_signature(paths):
+    """Firma delle sorgenti (path, dimensione, mtime): cambia se un CSV viene aggiornato."""
+    h = hashlib.sha1(f"v{FORMAT_VERSION}".encode())
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"{Path(p).resolve()}|{st.st_size}|{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:12]
+
+
+def compile_reference(df, name_col, categorical, numeric, out_dir, year_col=None, issn_col=None):
+    """
+    Scrive la tabella compilata in out_dir.
+    categorical/numeric: {colonna_output: colonna_sorgente}.
+    A parita' di nome normalizzato (e di anno, se year_col) vince la prima riga del CSV.
+    year_col: tabella annuale, ogni colonna diventa una matrice nomi x anni.
+    issn_col: ISSN gia' normalizzati separati da virgola; con piu' nomi per lo
+    stesso ISSN vince quello dell'anno piu' recente (o la prima riga).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    df = df[df[name_col].astype(str).str.strip() != ""]
+    if year_col is not None:
+        df = df.assign(**{year_col: pd.to_numeric(df[year_col], errors="coerce")}).dropna(subset=[year_col])
+    df = df.drop_duplicates(subset=[name_col] if year_col is None else [name_col, year_col], keep="first")
+    df = df.sort_values(name_col, kind="stable")
+
+    names = df[name_col].astype(str).to_numpy(dtype=str)
+    if year_col is not None:
+        names = np.unique(names)
+    np.save(out_dir / "names.npy", names)
+    if issn_col is not None:
+        _save_issns(df, name_col, issn_col, year_col, names, out_dir)
+
+    layout = lambda values, dtype, fill: np.asarray(values, dtype=dtype)
+    years = None
+    if year_col is not None:
+        year_values = df[year_col].astype(int).to_numpy()
+        years = [int(year_values.min()), int(year_values.max())] if len(df) else [0, 0]
+        rows = np.searchsorted(names, df[name_col].astype(str).to_numpy(dtype=str))
+        cols = year_values - years[0]
+        shape = (len(names), years[1] - years[0] + 1)
+        nearest = _nearest_year(rows, cols, shape)
+
+        def layout(values, dtype, fill):
+            matrix = np.full(shape, fill, dtype=dtype)
+            matrix[rows, cols] = values
+            return np.take_along_axis(matrix, nearest, axis=1)
+
+    labels = {}
+    for out_col, src_col in categorical.items():
+        values = df[src_col].fillna("").astype(str).str.strip()
+        uniques = [""] + sorted(v for v in values.unique() if v)
+        lookup = {v: i for i, v in enumerate(uniques)}
+        dtype = np.uint8 if len(uniques) <= 256 else np.uint16
+        np.save(out_dir / f"{out_col}.npy", layout(values.map(lookup).to_numpy(), dtype, 0))
+        labels[out_col] = uniques
+
+    for out_col, src_col in numeric.items():
+        values = df[src_col].astype(str).str.replace(",", ".", regex=False)
+        arr = np.array([_to_float(v) for v in values], dtype=np.float32)
+        np.save(out_dir / f"{out_col}.npy", layout(arr, np.float32, np.nan))
+
+    with open(out_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"version": FORMAT_VERSION, "rows": len(names), "labels": labels, "floats": list(numeric),
+                   "years": years, "issns": issn_col is not None}, f)
+
+
+def _save_issns(df, name_col, issn_col, year_col, names, out_dir):
+    """issns.npy (ISSN ordinati) e issn_names.npy (indice in names per ciascuno)."""
+    pairs = df if year_col is None else df.sort_values(year_col, ascending=False, kind="stable")
+    keys = pairs[issn_col].fillna("").astype(str).str.split(",").explode().str.strip()
+    keys = keys[keys != ""]
+    pairs = pd.DataFrame({"issn": keys.to_numpy(dtype=str),
+                          "name": pairs.loc[keys.index, name_col].astype(str).to_numpy(dtype=str)})
+    pairs = pairs.drop_duplicates(subset="issn", keep="first").sort_values("issn")
+    np.save(out_dir / "issns.npy", pairs["issn"].to_numpy(dtype=str))
+    np.save(out_dir / "issn_names.npy", np.searchsorted(names, pairs["name"].to_numpy(dtype=str)).astype(np.int32))
+
+
+def _nearest_year(rows, cols, shape):
+    """
+    Per ogni cella (nome, anno) la colonna dell'anno presente piu' vicino per
+    quel nome (a pari distanza l'anno precedente). Celle presenti: se stesse.
+    """
+    present = np.zeros(shape, dtype=bool)
+    present[rows, cols] = True
+    span = np.arange(shape[1])
+    before = np.maximum.accumulate(np.where(present, span, -1), axis=1)
+    after = np.minimum.accumulate(np.where(present, span, shape[1])[:, ::-1], axis=1)[:, ::-1]
+    use_after = (before < 0) | ((after < shape[1]) & (after - span < span - before))
+    return np.where(use_after, np.minimum(after, shape[1] - 1), before)
+
+
+def _to_float(v):
+    try:
+        return float(v)
+    except ValueError:
+        return float("nan")
+
+
+def open_reference(name, sources, loader, compiled_dir=COMPILED_DIR):
+    """
+    Ritorna la MappedReference per 'name', compilandola se manca o se le sorgenti sono cambiate.
+    loader() -> (df, name_col, categorical, numeric[, year_col[, issn_col]]) oppure None se i dati
+    non sono disponibili.
+    La compilazione scrive in una cartella temporanea poi rinominata: i lettori vedono sempre
+    una versione completa, anche con piu' processi che compilano in parallelo.
+    """
+    if not all(os.path.exists(p) for p in sources):
+        return None
+
+    target = Path(compiled_dir) / f"{name}-{source_signature(sources)}"
+    with _open_lock:
+        ref = _open_refs.get(name)
+        if ref is not None and ref.directory == target:
+            return ref
+
+        if not (target / "meta.json").exists():
+            table = loader()
+            if table is None:
+                return None
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = Path(tempfile.mkdtemp(prefix=f".{name}-", dir=target.parent))
+            df, name_col, categorical, numeric, *extra = table
+            year_col, issn_col = (list(extra) + [None, None])[:2]
+            compile_reference(df, name_col, categorical, numeric, out_dir=tmp, year_col=year_col, issn_col=issn_col)
+            try:
+                os.rename(tmp, target)
+            except OSError:
+                # Un altro processo ha completato la compilazione per primo
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        ref = MappedReference(target)
+        _open_refs[name] = ref
+        return ref
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.merge import fuzzy_merge
+
+    for ref_name in fuzzy_merge.REFERENCE_SOURCES:
+        ref = fuzzy_merge.get_reference(ref_name)
+        print(f"✓ {ref_name}: {ref.directory if ref else 'sorgente non disponibile'}")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+title_index.py
+==============
+Abbinamento dei titoli sub-quadratico per profili molto grandi.
+
+Il confronto classico (process.extractOne su tutti i titoli Scholar per ogni
+titolo Scopus) costa O(n * m). Qui si costruisce un indice invertito di
+trigrammi di caratteri sui titoli Scholar (con le parole ordinate, come fa
+token_sort_ratio): per ogni titolo Scopus si recuperano solo i candidati che
+condividono piu' trigrammi e si calcola token_sort_ratio solo su quelli.
+
+Con la stessa soglia (70) il richiamo e' in pratica quello del confronto
+completo: due titoli con token_sort_ratio >= 70 condividono gran parte dei
+trigrammi e finiscono tra i primi candidati.
+
+Il matcher viene scelto da make_matcher() in base al numero di titoli Scholar
+(soglia TITLE_INDEX_MIN_ROWS).
+"""
+
+import os
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import process, fuzz
+
+MATCH_CUTOFF = 70
+TITLE_INDEX_MIN_ROWS = int(os.getenv("TITLE_INDEX_MIN_ROWS", "1000"))
+TOP_CANDIDATES = 40       # candidati valutati per ogni titolo
+
+
+def _sorted_tokens(title):
+    return " ".join(sorted(title.split()))
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class BruteForceMatcher:
+    """Confronto completo, identico al comportamento storico di match_titles."""
+
+    def __init__(self, titles):
+        self.titles = titles
+
+    def find(self, title):
+        """Ritorna (titolo, punteggio, indice) del migliore >= MATCH_CUTOFF, oppure None."""
+        return process.extractOne(title, self.titles, scorer=fuzz.token_sort_ratio, score_cutoff=MATCH_CUTOFF)
+
+
+class TrigramIndexMatcher:
+    """Indice invertito trigramma -> titoli, con punteggio solo sui candidati recuperati."""
+
+    def __init__(self, titles, top_candidates=TOP_CANDIDATES):
+        self.titles = titles
+        self.top_candidates = top_candidates
+        self._sorted = [_sorted_tokens(t) for t in titles]
+
+        postings = defaultdict(list)
+        for idx, text in enumerate(self._sorted):
+            for gram in _trigrams(text):
+                postings[gram].append(idx)
+
+        # Peso IDF: i trigrammi comuni (es. " th") contano poco nel punteggio dei candidati
+        n = max(len(titles), 1)
+        self._postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+        self._idf = {g: float(np.log(1 + n / len(ids))) for g, ids in postings.items()}
+
+    def candidates(self, title):
+        grams = [g for g in _trigrams(_sorted_tokens(title)) if g in self._postings]
+        if not grams:
+            return np.empty(0, dtype=np.int32)
+        lists = [self._postings[g] for g in grams]
+        ids = np.concatenate(lists)
+        weights = np.repeat([self._idf[g] for g in grams], [len(ids_g) for ids_g in lists])
+        counts = np.bincount(ids, weights=weights, minlength=len(self.titles))
+        hit = np.flatnonzero(counts)
+        if len(hit) > self.top_candidates:
+            hit = hit[np.argpartition(counts[hit], -self.top_candidates)[-self.top_candidates:]]
+        return np.sort(hit)
+
+    def find(self, title):
+        """Ritorna (titolo, punteggio, indice) del migliore >= MATCH_CUTOFF, oppure None."""
+        best = None
+        for idx in self.candidates(title):
+            score = fuzz.token_sort_ratio(title, self.titles[idx], score_cutoff=MATCH_CUTOFF)
+            # A parita' di punteggio vince l'indice piu' basso, come in extractOne
+            if score and (best is None or score > best[1]):
+                best = (self.titles[idx], score, int(idx))
+        return best
+
+
+def make_matcher(titles, min_rows=None):
+    """Sceglie il matcher: indice di trigrammi sopra la soglia, confronto completo sotto."""
+    threshold = TITLE_INDEX_MIN_ROWS if min_rows is None else min_rows
+    if len(titles) >= threshold:
+        return TrigramIndexMatcher(titles)
+    return BruteForceMatcher(titles)
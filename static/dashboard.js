@@ -4,6 +4,8 @@ document.addEventListener("DOMContentLoaded", () => {
     const modal = document.getElementById("scopusModal");
     const modalList = document.getElementById("modalList");
     const confirmBtn = document.getElementById("confirmBtn");
+    const yearFromInput = document.getElementById("yearFrom");
+    const yearToInput = document.getElementById("yearTo");
     const MAX_AUTHORS = 5;
 
     btnAvvia.addEventListener("click", async (e) => {
@@ -53,6 +55,9 @@ document.addEventListener("DOMContentLoaded", () => {
                 return;
             } else if (searchResult.candidates.length === 1) {
                 selectedScopus = searchResult.candidates[0];
+            } else if (searchResult.auto_select) {
+                // Un candidato ha chiaramente piu' titoli in comune col profilo Scholar
+                selectedScopus = searchResult.candidates.find(c => c.id === searchResult.auto_select);
             } else {
                 updateRow(rowId, "Attesa scelta utente...", "stato-loading");
                 // Apre il popup e aspetta il click
@@ -62,19 +67,38 @@ document.addEventListener("DOMContentLoaded", () => {
             // 2. Elaborazione (Download & Merge)
             updateRow(rowId, "Download e Analisi in corso...", "stato-loading");
             
-            const processResp = await fetch('/process_author', {
+            const processRequest = (force) => fetch('/process_author', {
                 method: 'POST', headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({
                     scopus_id: selectedScopus.id,
                     scopus_name: selectedScopus.name,
-                    scholar_id: authData.id
+                    scholar_id: authData.id,
+                    force: force,
+                    // Finestra di valutazione: vuoto = tutta la carriera
+                    year_from: yearFromInput.value || null,
+                    year_to: yearToInput.value || null
                 })
-            });
-            const finalResult = await processResp.json();
+            }).then(r => r.json());
+
+            let finalResult = await processRequest(false);
+
+            // Il pre-flight ha trovato pochi titoli in comune: chiede conferma prima del download completo
+            if (finalResult.status === 'confirm') {
+                if (!confirm(`${authData.nome} ${authData.cognome}: ${finalResult.message}`)) {
+                    updateRow(rowId, "Annullato: Autori non corrispondenti", "stato-error", null);
+                    return;
+                }
+                updateRow(rowId, "Download e Analisi in corso...", "stato-loading");
+                finalResult = await processRequest(true);
+            }
 
             console.log(finalResult);
 
-            if (finalResult.status === 'success') {
+            if (finalResult.status === 'success' && finalResult.partial) {
+                // CASO PARZIALE: solo Scopus, Scholar in aggiornamento sul server
+                updateRow(rowId, "Completato (solo Scopus, Scholar in aggiornamento)", "risultato-successo", finalResult.folder);
+            }
+            else if (finalResult.status === 'success') {
                 // CASO VERDE: Tutto ok
                 updateRow(rowId, "Completato", "risultato-successo", finalResult.folder);
             } 
@@ -99,7 +123,8 @@ document.addEventListener("DOMContentLoaded", () => {
             candidates.forEach((c, idx) => {
                 const div = document.createElement("div");
                 div.className = "modal-option";
-                div.innerHTML = `<input type="radio" name="scopusChoice" value="${idx}" ${idx===0?'checked':''}> <strong>${c.name}</strong> (${c.aff})`;
+                const conf = (c.confidence === undefined || c.confidence === null) ? "" : ` - ${Math.round(c.confidence * 100)}% titoli in comune`;
+                div.innerHTML = `<input type="radio" name="scopusChoice" value="${idx}" ${idx===0?'checked':''}> <strong>${c.name}</strong> (${c.aff})${conf}`;
                 modalList.appendChild(div);
             });
             modal.style.display = "flex";
@@ -135,7 +160,104 @@ document.addEventListener("DOMContentLoaded", () => {
             statusCell.className = cls; 
             statusCell.textContent = status;
         
-            if(folder) tr.querySelector("td:nth-child(4)").innerHTML = `<a href="/download/zip/${folder}" class="btn-download">Scarica</a>`;
-    }
+            if(folder) {
+                tr.querySelector("td:nth-child(4)").innerHTML = `<a href="/download/zip/${folder}" class="btn-download">Scarica</a>` +
+                    ` <a href="/download/xlsx/${folder}" class="btn-download">Excel</a>`;
+                const detailsCell = tr.querySelector("td:nth-child(2)");
+                detailsCell.innerHTML = `<button type="button" class="btn-details">Mostra risultati</button>`;
+                detailsCell.querySelector("button").addEventListener("click", () => toggleResults(tr, folder));
+            }
+    }
 }
+
+    // ============================================================
+    //  RISULTATI IN LINEA (API JSON, filtri e paginazione lato server)
+    // ============================================================
+
+    const PUB_COLUMNS = [["year", "Anno"], ["title", "Titolo"], ["venue", "Venue"], ["category", "Tipo"],
+                         ["core_rank", "CORE"], ["scimago_quartile", "Quartile"],
+                         ["citations_scopus", "Cit. Scopus"], ["citations_scholar", "Cit. Scholar"]];
+
+    function toggleResults(tr, folder) {
+        const existing = document.getElementById(tr.id + "-detail");
+        if (existing) { existing.remove(); return; }
+
+        const detail = document.createElement("tr");
+        detail.id = tr.id + "-detail";
+        detail.className = "results-detail";
+        detail.innerHTML = `<td colspan="4">
+            <table class="results-metrics"><tbody><tr><td>Caricamento...</td></tr></tbody></table>
+            <div class="results-charts"></div>
+            <div class="results-filters">
+                <select name="type"><option value="">Tutti i tipi</option><option value="journal">Journal</option>
+                    <option value="conference">Conferenze</option><option value="other">Altro</option></select>
+                <select name="rank"><option value="">Rank CORE</option><option>A*</option><option>A</option>
+                    <option>B</option><option>C</option><option>N/A</option></select>
+                <select name="quartile"><option value="">Quartile</option><option>Q1</option><option>Q2</option>
+                    <option>Q3</option><option>Q4</option><option>N/A</option></select>
+                <input type="number" name="year_from" min="1900" max="2100" placeholder="dal">
+                <input type="number" name="year_to" min="1900" max="2100" placeholder="al">
+                <select name="sort"><option value="-year">Piu' recenti</option><option value="year">Meno recenti</option>
+                    <option value="-citations_scholar">Citazioni Scholar</option><option value="-citations_scopus">Citazioni Scopus</option>
+                    <option value="core_rank">Rank CORE</option><option value="scimago_quartile">Quartile</option>
+                    <option value="title">Titolo</option></select>
+            </div>
+            <table class="results-publications">
+                <thead><tr>${PUB_COLUMNS.map(([, label]) => `<th>${label}</th>`).join("")}</tr></thead>
+                <tbody></tbody>
+            </table>
+            <div class="results-pager">
+                <button type="button" data-step="-1">&laquo;</button> <span></span> <button type="button" data-step="1">&raquo;</button>
+            </div>
+        </td>`;
+        tr.after(detail);
+
+        // Il browser rivalida con If-None-Match (ETag): se la cartella non e' cambiata risponde 304
+        let page = 1;
+        const filters = detail.querySelectorAll(".results-filters [name]");
+        const loadPage = async () => {
+            const params = new URLSearchParams({ page: page, per_page: 25 });
+            filters.forEach(f => { if (f.value) params.set(f.name, f.value); });
+            const resp = await fetch(`/api/authors/${encodeURIComponent(folder)}/publications?${params}`);
+            const data = await resp.json();
+            if (!resp.ok) { detail.querySelector(".results-pager span").textContent = data.message || "Errore"; return; }
+            renderPublications(detail, data);
+        };
+        filters.forEach(f => f.addEventListener("change", () => { page = 1; loadPage(); }));
+        detail.querySelectorAll(".results-pager button").forEach(b => b.addEventListener("click", () => {
+            page = Math.max(1, page + Number(b.dataset.step));
+            loadPage();
+        }));
+
+        fetch(`/api/authors/${encodeURIComponent(folder)}/metrics`).then(r => r.json()).then(data => {
+            const body = detail.querySelector(".results-metrics tbody");
+            body.innerHTML = "";
+            Object.entries(data.metrics || {}).forEach(([name, value]) => {
+                const row = body.insertRow();
+                row.insertCell().textContent = name;
+                row.insertCell().textContent = value;
+            });
+            // Grafici gia' disegnati sul server: semplici immagini, nessun calcolo nel browser
+            detail.querySelector(".results-charts").innerHTML =
+                (data.charts || []).map(c => `<img src="${c.url}" alt="${c.name}">`).join("");
+        });
+        loadPage();
+    }
+
+    function renderPublications(detail, data) {
+        const body = detail.querySelector(".results-publications tbody");
+        body.innerHTML = "";
+        data.items.forEach(item => {
+            const row = body.insertRow();
+            PUB_COLUMNS.forEach(([key]) => {
+                const value = item[key];
+                row.insertCell().textContent = (value === null || value === undefined) ? "" : value;
+            });
+        });
+        const [prev, next] = detail.querySelectorAll(".results-pager button");
+        prev.disabled = data.page <= 1;
+        next.disabled = data.page >= data.pages;
+        detail.querySelector(".results-pager span").textContent =
+            `Pagina ${data.page} di ${data.pages} (${data.total} pubblicazioni)`;
+    }
 });
\ No newline at end of file
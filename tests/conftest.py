@@ -0,0 +1,23 @@
+"""
+CONFTEST.PY
+========================================
+
+Fixture comuni: gli stadi memoizzati della pipeline (src/core/pipeline.py)
+e il grafo di coorte dei coautori (src/core/coauthors.py) vengono scritti in
+una cartella temporanea per ogni test, cosi' un risultato salvato da un test
+non viene riusato da un altro; lo stesso vale per il registro degli accessi
+(src/core/refresh.py) e lo storico delle citazioni (src/core/citation_history.py).
+Il rendering dei grafici in background e' disattivato (test_charts.py lo
+esercita esplicitamente).
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_stage_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.pipeline.STAGE_DIR", tmp_path / "stages")
+    monkeypatch.setattr("src.core.coauthors.COHORT_GRAPH", tmp_path / "coauthors" / "cohort.json")
+    monkeypatch.setattr("src.core.charts.CHARTS_ENABLED", False)
+    monkeypatch.setattr("src.core.refresh.DB_PATH", tmp_path / "refresh.sqlite")
+    monkeypatch.setattr("src.core.citation_history.HISTORY_DIR", tmp_path / "history")
@@ -0,0 +1,42 @@
+"""
+TEST APP.PY
+========================================
+
+Test per l'avvio dell'applicazione Flask:
+- import di app senza dipendenze pesanti ne' creazione di cartelle
+- /process_author risponde 400 a richieste senza JSON o senza i campi obbligatori
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_import_app_is_lazy():
+    code = (
+        "import sys, json, app\n"
+        "heavy = ['pandas', 'rapidfuzz', 'serpapi', 'pybliometrics', 'src.core.processing_logic']\n"
+        "print(json.dumps([m for m in heavy if m in sys.modules]))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT,
+                         capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
+
+
+def test_index_route():
+    import app as app_module
+    client = app_module.app.test_client()
+    assert client.get("/").status_code == 200
+
+
+def test_process_author_rejects_bad_requests():
+    import app as app_module
+    client = app_module.app.test_client()
+    assert client.post("/process_author", data="x", content_type="text/plain").status_code == 400
+    assert client.post("/process_author", data="{", content_type="application/json").status_code == 400
+    response = client.post("/process_author", json={"scopus_id": "1", "year_from": "2020"})
+    assert response.status_code == 400
+    assert "scholar_id" in response.get_json()["message"]
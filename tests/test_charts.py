@@ -0,0 +1,61 @@
+"""
+TEST CHARTS.PY
+========================================
+
+Test per i grafici precalcolati (src/core/charts.py):
+- aggregati per anno, per rank/quartile e anni mancanti dal dataset unificato
+- rendering headless dei PNG nella cartella dei risultati
+- rendering in un processo separato e grafici serviti come file statici
+"""
+
+import pandas as pd
+
+import app as app_module
+from src.core import charts
+
+MERGED = pd.DataFrame({
+    "title": ["A", "B", "C"],
+    "year": [2018, 2018, 2021],
+    "citations_scopus": [5, 1, 2],
+    "citations_scholar": [8, 2, 3],
+    "core_rank": ["A*", "N/A", "N/A"],
+    "scimago_quartile": ["N/A", "Q1", "Q2"],
+    "source": ["Scopus + Scholar", "Scholar", "Scopus"],
+})
+METRICS = {"Anni di non pubblicazione": "2019, 2020"}
+
+
+def test_chart_data():
+    data = charts.chart_data(MERGED, METRICS)
+
+    assert data["years"] == [2018, 2019, 2020, 2021]
+    assert data["publications_scopus"] == [1, 0, 0, 1]
+    assert data["publications_scholar"] == [2, 0, 0, 0]
+    assert data["citations_scholar"] == [10, 0, 0, 3]
+    assert data["core_rank"] == {"N/A": 2, "A*": 1}
+    assert data["missing_years"] == [2019, 2020]
+
+
+def test_render_charts(tmp_path):
+    written = charts.render_charts(charts.chart_data(MERGED, METRICS), tmp_path)
+
+    assert written == list(charts.CHARTS)
+    for name in written:
+        assert (tmp_path / f"{name}.png").read_bytes()[:4] == b"\x89PNG"
+
+
+def test_rendered_in_worker_and_served(tmp_path, monkeypatch):
+    author_dir = tmp_path / "Rossi_Mario_SCH_1"
+    author_dir.mkdir()
+    monkeypatch.setattr(charts, "CHARTS_ENABLED", True)
+    assert charts.schedule(charts.chart_data(MERGED, METRICS), author_dir).result(timeout=60) == list(charts.CHARTS)
+
+    monkeypatch.setattr(app_module, "CACHE_DIR", str(tmp_path))
+    client = app_module.app.test_client()
+    chart_urls = [c["url"] for c in client.get("/api/authors/Rossi_Mario_SCH_1/metrics").get_json()["charts"]]
+    assert len(chart_urls) == len(charts.CHARTS)
+
+    response = client.get(chart_urls[0])
+    assert response.status_code == 200 and response.mimetype == "image/png"
+    assert response.cache_control.max_age == 365 * 24 * 3600
+    assert client.get("/charts/Rossi_Mario_SCH_1/metrics").status_code == 404
@@ -0,0 +1,101 @@
+"""
+TEST CITATION_HISTORY.PY
+========================================
+
+Test per lo storico delle citazioni (src/core/citation_history.py):
+- si accodano solo i conteggi cambiati (deduplicazione)
+- citazioni guadagnate e H-index per anno ricavati dallo storico
+- pubblicazioni sparite (tombstone) e passaggio da chiave titolo a DOI non gonfiano l'H-index
+- una scrittura interrotta a meta' non rovina le letture ne' le scritture successive
+- scritture concorrenti da piu' processi restano allineate
+"""
+
+import multiprocessing
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from src.core import citation_history
+
+TITLES = ["Deep learning for graphs", "Fuzzy matching at scale", "Trigram indexes revisited"]
+
+
+def _at(year, month=6):
+    return datetime(year, month, 1, tzinfo=timezone.utc).timestamp()
+
+
+def _df(scopus, scholar):
+    return pd.DataFrame({"title": TITLES, "year": [2020, 2021, 2022], "doi": ["10.1/A", None, ""],
+                         "citations_scopus": scopus, "citations_scholar": scholar})
+
+
+def test_record_only_changes(tmp_path):
+    assert citation_history.record("Rossi", _df([5, 3, 1], [9, 4, 2]), tmp_path, now=_at(2024)) == 8
+    assert citation_history.record("Rossi", _df([5, 3, 1], [9, 4, 2]), tmp_path, now=_at(2025)) == 0
+    # Un conteggio Scopus cambiato: la pubblicazione e il totale dell'autore
+    assert citation_history.record("Rossi", _df([7, 3, 1], [9, 4, 2]), tmp_path, now=_at(2025, 9)) == 2
+
+    history = citation_history.publication_history("Rossi", tmp_path)
+    first = history[(history["title"] == TITLES[0]) & (history["source"] == "scopus")]
+    assert first["citations"].tolist() == [5, 7]
+    assert (tmp_path / "Rossi" / "ts.i8").stat().st_size == 10 * 8
+
+
+def test_trends(tmp_path):
+    citation_history.record("Rossi", _df([5, 3, 1], [9, 4, 2]), tmp_path, now=_at(2024))
+    citation_history.record("Rossi", _df([8, 6, 4], [12, 6, 3]), tmp_path, now=_at(2025, 3))
+
+    trends = citation_history.trends("Rossi", tmp_path, now=_at(2025, 10))
+    scopus = trends["sources"]["scopus"]
+    assert scopus["total"] == 18
+    assert scopus["gained_this_year"] == 18 - 9
+    assert [(p["year"], p["h_index"]) for p in scopus["h_index_by_year"]] == [(2024, 2), (2025, 3)]
+    assert trends["sources"]["scholar"]["gained_last_365_days"] == 21 - 15
+    assert citation_history.trends("Bianchi", tmp_path) is None
+
+
+def test_removed_and_rekeyed_publications_count_once(tmp_path):
+    citation_history.record("Rossi", _df([5, 3, 1], [9, 4, 2]), tmp_path, now=_at(2024))
+    # Il merge trova il DOI della seconda e la terza sparisce dai risultati
+    df = _df([5, 3, 1], [9, 4, 2]).iloc[:2].assign(doi=["10.1/A", "10.1/B"])
+    citation_history.record("Rossi", df, tmp_path, now=_at(2025))
+
+    publications = pd.read_csv(tmp_path / "Rossi" / citation_history.PUBLICATIONS)
+    assert publications["key"].tolist() == ["doi:10.1/a", "doi:10.1/b", citation_history.publication_key(TITLES[2])]
+    scopus = citation_history.trends("Rossi", tmp_path, now=_at(2025, 10))["sources"]["scopus"]
+    assert scopus["total"] == 8
+    assert [(p["year"], p["h_index"]) for p in scopus["h_index_by_year"]] == [(2024, 2), (2025, 2)]
+    history = citation_history.publication_history("Rossi", tmp_path)
+    assert history[history["title"] == TITLES[2]]["citations"].tolist() == [1, 2]
+
+    # Conteggio mancante: tombstone per la pubblicazione, il totale resta coerente
+    citation_history.record("Rossi", df.assign(citations_scopus=[5, None]), tmp_path, now=_at(2025, 11))
+    assert citation_history.trends("Rossi", tmp_path, now=_at(2025, 12))["sources"]["scopus"]["total"] == 5
+
+
+def test_truncated_append_is_ignored(tmp_path):
+    citation_history.record("Rossi", _df([5, 3, 1], [9, 4, 2]), tmp_path, now=_at(2024))
+    with open(tmp_path / "Rossi" / "ts.i8", "ab") as f:
+        f.write(b"\x00" * 16)  # scrittura interrotta: una colonna piu' lunga delle altre
+
+    assert len(citation_history.read_columns("Rossi", tmp_path)["ts"]) == 8
+    assert citation_history.record("Rossi", _df([6, 3, 1], [9, 4, 2]), tmp_path, now=_at(2025)) == 2
+    assert citation_history.read_columns("Rossi", tmp_path)["ts"][-2:].tolist() == [int(_at(2025))] * 2
+
+
+def _record_many(root, start):
+    for i in range(start, start + 20):
+        citation_history.record("Rossi", _df([i, i, i], [i, i, i]), root, now=_at(2024) + i)
+
+
+def test_concurrent_processes_stay_aligned(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_record_many, args=(tmp_path, start)) for start in (0, 100, 200)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(timeout=30)
+
+    sizes = {f.suffix: f.stat().st_size // int(f.suffix[2:]) for f in (tmp_path / "Rossi").glob("*.[iu]*")}
+    assert len(set(sizes.values())) == 1
+    assert len(citation_history._read_publications(tmp_path / "Rossi")) == len(TITLES)
@@ -0,0 +1,105 @@
+"""
+TEST COAUTHORS.PY
+========================================
+
+Test per la rete dei coautori (src/core/coauthors.py):
+- metriche dell'autore calcolate dagli abstract gia' scaricati
+- grafo di coorte incrementale: un ricalcolo non raddoppia i pesi
+- quota di coautori interni alla coorte
+- aggiornamenti concorrenti da piu' processi non perdono membri
+- membri letti dall'indice senza caricare il grafo; nessuna riscrittura se nulla cambia
+"""
+
+import multiprocessing
+
+import networkx as nx
+import pandas as pd
+
+from src.core import coauthors
+
+
+def _scopus_df():
+    return pd.DataFrame({
+        "title": ["P1", "P2", "P3", "P4"],
+        "year": [2019, 2020, 2020, 2021],
+        "author_ids": ["111;222;333", "111;222", "111;444", "111"],
+        "author_names": ["Rossi M.;Bianchi L.;Verdi G.", "Rossi M.;Bianchi L.", "Rossi M.;Neri A.", "Rossi M."],
+    })
+
+
+def test_author_summary_metrics():
+    summary = coauthors.author_summary(_scopus_df(), "111", cohort_ids=["222", "111"])
+
+    assert summary["metrics"]["Coautori distinti"] == 3
+    assert summary["metrics"]["Articoli con coautori"] == 3
+    assert summary["metrics"]["Coautori ricorrenti (>=2 articoli)"] == 1
+    assert summary["metrics"]["Quota coautori interni alla coorte"] == "33.3%"
+    assert summary["graph"]["111"]["222"]["weight"] == 2
+    assert summary["graph"].has_edge("222", "333")  # coautori dello stesso articolo
+
+    top = summary["collaborators"].iloc[0]
+    assert (top["author_id"], top["name"], top["first_year"], top["last_year"]) == ("222", "Bianchi L.", 2019, 2020)
+    per_year = summary["per_year"].set_index("year")
+    assert per_year.loc[2020, "collaborators"] == 2 and per_year.loc[2020, "new_collaborators"] == 1
+
+
+def test_cohort_is_incremental(tmp_path):
+    path = tmp_path / "cohort.json"
+    graph = coauthors.author_summary(_scopus_df(), "111")["graph"]
+    coauthors.update_cohort("111", graph, path)
+    other = pd.DataFrame({"title": ["Q1"], "year": [2022], "author_ids": ["222;111"], "author_names": ["Bianchi L.;Rossi M."]})
+    coauthors.update_cohort("222", coauthors.author_summary(other, "222")["graph"], path)
+
+    # Ricalcolo dello stesso autore: il suo contributo viene sostituito, non sommato
+    cohort = coauthors.update_cohort("111", graph, path)
+
+    assert cohort["111"]["222"]["weight"] == 3
+    assert coauthors.cohort_members(path) == ["111", "222"]
+    summary = coauthors.cohort_summary(path)
+    assert summary["members"] == 2 and summary["internal_collaborations"] == 1
+    assert summary["authors"] == 4
+
+
+def test_summary_roundtrip(tmp_path):
+    summary = coauthors.author_summary(_scopus_df(), "111", cohort_ids=["222"])
+    coauthors.save_summary(summary, tmp_path)
+
+    read = coauthors.read_summary(tmp_path, top=2)
+    assert read["total"] == 3 and read["internal"] == 1
+    assert [c["author_id"] for c in read["top_collaborators"]] == ["222", "333"]
+    assert coauthors.read_summary(tmp_path / "missing") is None
+
+
+def test_members_index_and_unchanged_update(tmp_path, monkeypatch):
+    path = tmp_path / "cohort.json"
+    graph = coauthors.author_summary(_scopus_df(), "111")["graph"]
+    coauthors.update_cohort("111", graph, path)
+    written = path.stat().st_mtime_ns
+
+    # Stesso contributo (es. ricalcolo per CORE/Scimago): il grafo non viene riscritto
+    coauthors.update_cohort("111", graph, path)
+    assert path.stat().st_mtime_ns == written
+
+    def no_graph(path=None):
+        raise AssertionError("grafo caricato")
+    monkeypatch.setattr(coauthors, "load_cohort", no_graph)
+    assert coauthors.cohort_members(path) == ["111"]
+
+
+def _add_member(path, author_id):
+    graph = nx.Graph()
+    graph.add_edge(author_id, f"co_{author_id}", weight=1)
+    coauthors.update_cohort(author_id, graph, path)
+
+
+def test_concurrent_processes_keep_all_members(tmp_path):
+    path = tmp_path / "cohort.json"
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_add_member, args=(path, str(i))) for i in range(8)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(timeout=30)
+
+    assert sorted(coauthors.cohort_members(path)) == [str(i) for i in range(8)]
+    assert coauthors.load_cohort(path).number_of_edges() == 8
@@ -0,0 +1,98 @@
+"""
+TEST FAKE_SERVICES.PY
+========================================
+
+Verifica che i fetcher reali funzionino contro il server finto locale
+(benchmarks/fake_services.py), senza rete ne' quota:
+- ricerca autore, dettagli e abstract Scopus tramite pybliometrics
+- download del profilo Scholar tramite SerpApi
+- ordinamento automatico degli omonimi
+- errori 429 simulati
+"""
+
+import configparser
+
+import pytest
+import requests
+
+import pyblio_config
+from benchmarks import fake_services
+from src.fetchers import scholar, scopus
+
+
+@pytest.fixture
+def fake_server():
+    server, base_url = fake_services.start_in_thread(fake_services.FakeConfig(profiles=8, pubs=30))
+    yield server, base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def pyblio_fake(tmp_path, monkeypatch, fake_server):
+    import pybliometrics.utils.startup as startup
+    from pybliometrics.utils.constants import URLS
+
+    config_file = tmp_path / "config.ini"
+    cfg = configparser.ConfigParser()
+    cfg.optionxform = str
+    cfg["Authentication"] = {"APIKey": "fake-key"}
+    cfg["Directories"] = {api: str(tmp_path / "Scopus" / api) for api in
+                          ("AuthorSearch", "AuthorRetrieval", "ScopusSearch", "AbstractRetrieval")}
+    cfg["Requests"] = {"Timeout": "5", "Retries": "0"}
+    with open(config_file, "w") as f:
+        cfg.write(f)
+
+    saved_urls = dict(URLS)
+    monkeypatch.setattr(startup, "CONFIG", startup.CONFIG)
+    monkeypatch.setattr(pyblio_config, "config", None)
+    monkeypatch.setattr(pyblio_config, "config_file", config_file)
+    monkeypatch.setattr(pyblio_config, "scopus_dir", tmp_path / "Scopus")
+    monkeypatch.setattr(pyblio_config, "SCOPUS_BASE_URL", fake_server[1])
+    monkeypatch.setattr("src.core.rate_limit.DB_PATH", tmp_path / "rate_limit.sqlite")
+    pyblio_config.init_pybliometrics()
+    yield fake_server
+    URLS.clear()
+    URLS.update(saved_urls)
+
+
+def test_scopus_fetchers_against_fake_server(pyblio_fake):
+    candidates = scopus.search_author_by_name("Mario Rossi")
+    # Mario Rossi e Marco Rossi: stessa iniziale, omonimi
+    assert [c["name"] for c in candidates] == ["Rossi, Mario", "Rossi, Marco"]
+
+    data = scopus.fetch_author_details(candidates[0]["id"])
+    assert data["document_count"] == 30
+    assert len(data["publications"]) == 30
+    assert all(p["document_type"] != "ERROR" for p in data["publications"])
+
+
+def test_scholar_fetcher_against_fake_server(fake_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scholar, "SERPAPI_BASE_URL", fake_server[1])
+    filename = scholar.fetch_scholar_by_id(fake_services.profile_ids(0)[1], output_name="Mario_Rossi")
+    assert filename.endswith("Mario_Rossi_Scholar.csv")
+    assert (tmp_path / filename).exists()
+
+
+def test_candidate_ranking_against_fake_server(pyblio_fake, monkeypatch):
+    from src.core import identity
+    monkeypatch.setattr(scholar, "SERPAPI_BASE_URL", pyblio_fake[1])
+    identity.clear_samples()
+
+    candidates = scopus.search_author_by_name("Marco Rossi")
+    # Profilo Scholar di Marco Rossi (profilo 4): deve vincere su Mario Rossi
+    ranked, selected = identity.rank_candidates(candidates, fake_services.profile_ids(4)[1])
+    identity.clear_samples()
+
+    assert ranked[0]["name"] == "Rossi, Marco"
+    assert selected == fake_services.profile_ids(4)[0]
+
+
+def test_fake_server_throttling(monkeypatch):
+    server, base_url = fake_services.start_in_thread(fake_services.FakeConfig(rate_429=1.0))
+    try:
+        resp = requests.get(f"{base_url}/content/search/author", params={"query": "AUTHLASTNAME(Rossi)"})
+        assert resp.status_code == 429
+        assert server.stats["throttled"] == 1
+    finally:
+        server.shutdown()
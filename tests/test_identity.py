@@ -0,0 +1,153 @@
+"""
+TEST IDENTITY.PY
+========================================
+
+Test per il controllo preliminare di identita' (src/core/identity.py):
+- stima della sovrapposizione dei titoli sul campione
+- esiti ok / uncertain / mismatch
+- la pipeline si ferma prima del download completo
+- ordinamento e selezione automatica degli omonimi (solo i primi per numero di documenti)
+- i campioni scaduti vengono rimossi dalla memoria
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.core import identity
+from src.core.processing_logic import process_chosen_author
+
+
+TOPICS = ["graph coloring", "neural parsing", "cache eviction", "wireless sensing", "query planning",
+          "program repair", "image denoising", "federated averaging", "type inference", "stream joins",
+          "robot grasping", "protein folding"]
+SCOPUS = [{"title": t.capitalize(), "year": str(2024 - i // 3)} for i, t in enumerate(TOPICS)]
+
+
+@pytest.fixture(autouse=True)
+def clean_samples():
+    identity.clear_samples()
+    yield
+    identity.clear_samples()
+
+
+def _page(titles, more=False):
+    page = {"articles": [{"title": t, "year": y} for t, y in titles]}
+    if more:
+        page["serpapi_pagination"] = {"next": "..."}
+    return page
+
+
+def test_title_overlap_same_author():
+    sample = [(t["title"], t["year"]) for t in SCOPUS]
+    matched, compared = identity.title_overlap(SCOPUS, _page(sample)["articles"], complete=True)
+    assert matched == compared == 12
+
+
+def test_title_overlap_excludes_partial_oldest_year():
+    # Campione di una sola pagina: l'anno piu' vecchio (2021) puo' essere incompleto
+    sample = [(t["title"], t["year"]) for t in SCOPUS[:9]]
+    matched, compared = identity.title_overlap(SCOPUS, _page(sample)["articles"], complete=False)
+    assert compared == 6
+    assert matched == 6
+
+
+def test_verdicts():
+    assert identity.verdict(9, 10) == "ok"
+    assert identity.verdict(4, 10) == "uncertain"
+    assert identity.verdict(0, 10) == "mismatch"
+    assert identity.verdict(0, 2) == "ok"  # campione troppo piccolo, non blocca
+
+
+@patch('src.fetchers.scholar.fetch_scholar_by_id')
+@patch('src.fetchers.scopus.fetch_author_details')
+@patch('src.fetchers.scopus.fetch_document_listing')
+@patch('src.fetchers.scholar.fetch_scholar_page')
+def test_preflight_stops_before_full_download(mock_page, mock_listing, mock_details, mock_scholar, tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.processing_logic.RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr("src.core.processing_logic.CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr("src.core.processing_logic.MERGE_DIR", tmp_path / "merged")
+    mock_listing.return_value = SCOPUS
+    mock_page.return_value = _page([(f"Unrelated chemistry work {i}", "2024") for i in range(20)])
+
+    result = process_chosen_author("123", "Mario Rossi", "SCH_123")
+
+    assert result["status"] == "mismatch"
+    mock_details.assert_not_called()
+    mock_scholar.assert_not_called()
+
+
+@patch('src.fetchers.scopus.fetch_document_listing')
+@patch('src.fetchers.scholar.fetch_scholar_page')
+def test_preflight_asks_confirmation(mock_page, mock_listing, tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.processing_logic.RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr("src.core.processing_logic.CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr("src.core.processing_logic.MERGE_DIR", tmp_path / "merged")
+    mock_listing.return_value = SCOPUS
+    half = [(t["title"], t["year"]) for t in SCOPUS[:5]] + [("Something else", "2020")]
+    mock_page.return_value = _page(half)
+
+    result = process_chosen_author("123", "Mario Rossi", "SCH_123")
+
+    assert result["status"] == "confirm"
+    assert 0 < result["overlap"] < 0.6
+
+
+@patch('src.fetchers.scopus.fetch_document_listing')
+@patch('src.fetchers.scholar.fetch_scholar_page')
+def test_rank_candidates_auto_selects_clear_winner(mock_page, mock_listing):
+    other = [{"title": f"Unrelated chemistry work {i}", "year": "2023"} for i in range(10)]
+    mock_listing.side_effect = lambda scopus_id: SCOPUS if scopus_id == "2" else other
+    mock_page.return_value = _page([(t["title"], t["year"]) for t in SCOPUS])
+    candidates = [{"id": "1", "name": "Rossi, Marco"}, {"id": "2", "name": "Rossi, Mario"}]
+
+    ranked, selected = identity.rank_candidates(candidates, "SCH_123")
+
+    assert [c["id"] for c in ranked] == ["2", "1"]
+    assert ranked[0]["confidence"] == 1.0
+    assert selected == "2"
+    # La pagina Scholar viene scaricata una sola volta e riusata dal pre-flight
+    identity.preflight("2", "SCH_123")
+    assert mock_page.call_count == 1
+
+
+@patch('src.fetchers.scopus.fetch_document_listing')
+@patch('src.fetchers.scholar.fetch_scholar_page')
+def test_rank_candidates_no_clear_winner(mock_page, mock_listing):
+    mock_listing.return_value = SCOPUS
+    mock_page.return_value = _page([(t["title"], t["year"]) for t in SCOPUS])
+    candidates = [{"id": "1", "name": "Rossi, Marco"}, {"id": "2", "name": "Rossi, Mario"}]
+
+    ranked, selected = identity.rank_candidates(candidates, "SCH_123")
+
+    assert selected is None
+    assert all(c["confidence"] == 1.0 for c in ranked)
+
+
+# Molti omonimi: si confrontano solo i candidati con piu' documenti, gli altri senza chiamate
+@patch('src.fetchers.scopus.fetch_document_listing')
+@patch('src.fetchers.scholar.fetch_scholar_page')
+def test_rank_candidates_scores_only_top_by_documents(mock_page, mock_listing, monkeypatch):
+    monkeypatch.setattr(identity, "RANKING_MAX_CANDIDATES", 3)
+    mock_listing.side_effect = lambda scopus_id: SCOPUS if scopus_id == "7" else []
+    mock_page.return_value = _page([(t["title"], t["year"]) for t in SCOPUS])
+    candidates = [{"id": str(i), "name": "Rossi, M.", "documents": str(i * 10)} for i in range(10)]
+
+    ranked, selected = identity.rank_candidates(candidates, "SCH_123")
+
+    assert sorted(c.args[0] for c in mock_listing.call_args_list) == ["7", "8", "9"]
+    assert selected == "7"
+    assert [c["id"] for c in ranked] == ["7", "9", "8", "6", "5", "4", "3", "2", "1", "0"]
+    assert all(c["confidence"] is None for c in ranked[3:])
+
+
+@patch('src.fetchers.scopus.fetch_document_listing', return_value=SCOPUS)
+def test_expired_samples_are_pruned(mock_listing, monkeypatch):
+    clock = iter([0, 1, 1000])
+    monkeypatch.setattr(identity.time, "monotonic", lambda: next(clock))
+    identity.scopus_listing("1")
+    identity.scopus_listing("2")
+    identity.scopus_listing("3")  # i campioni di "1" e "2" sono scaduti
+
+    assert list(identity._samples) == [("scopus_listing", "3")]
+    assert list(identity._key_locks) == [("scopus_listing", "3")]
@@ -0,0 +1,72 @@
+"""
+TEST KEY_POOL.PY
+========================================
+
+Test per il pool di API key (src/core/key_pool.py):
+- rotazione least_used / round_robin
+- chiavi limitate o esaurite escono dalla rotazione
+- statistiche per chiave (senza chiavi in chiaro)
+- rotazione SerpApi nel fetcher Scholar
+"""
+
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.core import key_pool, rate_limit
+from src.fetchers import scholar
+
+
+@pytest.fixture(autouse=True)
+def tmp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "DB_PATH", tmp_path / "rate_limit.sqlite")
+    monkeypatch.setenv("SERPAPI_KEYS", "key-a,key-b,key-c")
+
+
+def test_least_used_spreads_calls():
+    chosen = [key_pool.choose("serpapi") for _ in range(6)]
+    assert sorted(chosen) == ["key-a", "key-a", "key-b", "key-b", "key-c", "key-c"]
+
+
+def test_round_robin(monkeypatch):
+    monkeypatch.setattr(key_pool, "KEY_POOL_STRATEGY", "round_robin")
+    chosen = [key_pool.choose("serpapi") for _ in range(4)]
+    assert chosen[:3] == ["key-a", "key-b", "key-c"] and chosen[3] == "key-a"
+
+
+def test_throttled_and_exhausted_keys_leave_rotation():
+    key_pool.report("serpapi", "key-a", status_code=429, retry_after=60)
+    key_pool.report("serpapi", "key-b", remaining=0, reset=time.time() + 3600)
+    assert {key_pool.choose("serpapi") for _ in range(3)} == {"key-c"}
+
+    key_pool.report("serpapi", "key-c", exhausted=True)
+    with pytest.raises(key_pool.KeysExhausted):
+        key_pool.choose("serpapi")
+
+    stats = {s["key"]: s for s in key_pool.usage("serpapi")["serpapi"]}
+    assert stats[key_pool.fingerprint("key-a")]["disabled_reason"] == "429"
+    assert stats[key_pool.fingerprint("key-b")]["disabled_reason"] == "quota"
+    assert stats[key_pool.fingerprint("key-c")]["calls"] == 3
+    assert "key-a" not in str(stats)
+
+
+def test_scholar_rotates_on_exhausted_key():
+    used = []
+
+    class FakeSearch:
+        def __init__(self, params):
+            self.params = params
+
+        def get_dict(self):
+            used.append(self.params["api_key"])
+            if self.params["api_key"] == "key-a":
+                return {"error": "Your account has run out of searches."}
+            return {"articles": []}
+
+    with patch.object(scholar, "GoogleSearch", FakeSearch):
+        assert scholar.fetch_scholar_page("SCH_1") == {"articles": []}
+        assert scholar.fetch_scholar_page("SCH_1") == {"articles": []}
+
+    assert used[0] == "key-a"
+    assert "key-a" not in used[1:]
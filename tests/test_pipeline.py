@@ -0,0 +1,146 @@
+"""
+TEST PIPELINE.PY
+========================================
+
+Test per la pipeline a stadi memoizzati (src/core/pipeline.py, processing_logic.run_stages):
+- la prima esecuzione calcola tutti gli stadi e scrive il manifest
+- senza modifiche non si riesegue nulla
+- un aggiornamento dei dati di riferimento riesegue solo gli stadi a valle
+- rebuild_cohort aggiorna tutta la cache senza chiamate API
+- un nuovo membro della coorte riesegue la rete solo degli autori di cui e' coautore
+- una richiesta in cache con la stessa firma rapida (stat dei file) non rilegge nulla
+- un anno mancante resta vuoto nei CSV esportati (non diventa 0)
+- un'uscita salvata illeggibile viene ricalcolata; la versione del codice segue il modulo
+- prune elimina le uscite degli stadi che nessun manifest usa piu'
+"""
+
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.core import pipeline, raw_store
+import src.core.processing_logic as processing_logic
+
+
+@pytest.fixture
+def raw_pair(tmp_path, monkeypatch):
+    monkeypatch.setattr(processing_logic, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(processing_logic, "CACHE_DIR", tmp_path / "cache")
+    titles = ["Deep learning for graphs", "Fuzzy matching at scale", "Trigram indexes revisited"]
+    scopus_file = raw_store.raw_file("scopus", "111", tmp_path / "raw")
+    scholar_file = raw_store.raw_file("scholar", "SCH_1", tmp_path / "raw")
+    scopus_file.parent.mkdir(parents=True)
+    scholar_file.parent.mkdir(parents=True)
+    pd.DataFrame({"title": titles, "year": [2020, 2021, 2022], "citations_scopus": [5, 3, 1],
+                  "venue_scopus": ["Neural Networks", "ICSE", "VLDB"], "doi": ["a", "b", "c"],
+                  "document_type": ["Journal", "Conference Proceeding", "Journal"]}).to_csv(scopus_file, index=False)
+    pd.DataFrame({"title": titles, "year": [2020, 2021, 2022], "citations_scholar": [9, 4, 2],
+                  "venue": ["", "", ""]}).to_csv(scholar_file, index=False)
+    return tmp_path
+
+
+def test_stages_are_memoized(raw_pair):
+    first = processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+    author_dir = raw_pair / "cache" / "Rossi_Mario_SCH_1"
+
+    assert first == ["title_match", "venue_match", "metrics", "coauthors", "export"]
+    assert pipeline.read_manifest(author_dir)["stages"]["export"]
+    assert processing_logic.run_stages("111", "SCH_1", "Rossi_Mario") == []
+
+    # Manifest mancante: gli stadi salvati bastano, si rifa' solo l'export
+    (author_dir / pipeline.MANIFEST).unlink()
+    assert processing_logic.run_stages("111", "SCH_1", "Rossi_Mario") == ["export"]
+
+
+def test_reference_update_reruns_downstream_only(raw_pair):
+    processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+
+    # Nuovo core.csv: cambia la firma dei riferimenti, il matching dei titoli resta valido
+    with patch("src.merge.fuzzy_merge.reference_signature", return_value={"core": "nuova", "scimago": None}):
+        rebuilt = dict(processing_logic.rebuild_cohort())
+
+    assert rebuilt == {"Rossi_Mario_SCH_1": ["venue_match", "metrics", "export"]}
+
+
+def test_code_version_bump_reruns_stage(raw_pair, monkeypatch):
+    processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+    monkeypatch.setitem(pipeline.STAGE_VERSIONS, "metrics", "2")
+
+    assert processing_logic.run_stages("111", "SCH_1", "Rossi_Mario") == ["metrics", "export"]
+    metrics = pd.read_csv(raw_pair / "cache" / "Rossi_Mario_SCH_1" / "metrics.csv").set_index("Metric")["Value"]
+    assert metrics["Totale citazioni Scholar"] == "15"
+
+
+def test_missing_year_stays_empty_in_export(raw_pair):
+    for source, sid in (("scopus", "111"), ("scholar", "SCH_1")):
+        path = raw_store.raw_file(source, sid, raw_pair / "raw")
+        pd.read_csv(path).assign(year=[2020, None, 2022]).to_csv(path, index=False)
+    processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+
+    conferences = pd.read_csv(raw_pair / "cache" / "Rossi_Mario_SCH_1" / "conferences.csv")
+    assert conferences["year"].isna().all()
+
+
+def test_unreadable_output_is_recomputed(raw_pair):
+    processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+    manifest = pipeline.read_manifest(raw_pair / "cache" / "Rossi_Mario_SCH_1")
+    path = pipeline.STAGE_DIR / "metrics" / f"{manifest['stages']['metrics']}.pkl"
+    path.write_bytes(b"\x80\x04garbage")
+
+    value, computed = pipeline.memoize("metrics", manifest["stages"]["metrics"], lambda: {"ok": 1})
+    assert computed and value == {"ok": 1}
+    assert pd.read_pickle(path) == {"ok": 1}
+
+
+def test_code_version_follows_module():
+    from src.merge import fuzzy_merge
+    assert pipeline.code_version(fuzzy_merge.merge_titles) == pipeline.code_version(fuzzy_merge.enrich_venues)
+    assert pipeline.code_version(fuzzy_merge.merge_titles) != pipeline.code_version(processing_logic.compute_metrics)
+
+
+def test_cohort_change_reruns_only_coauthors_of_new_member(raw_pair):
+    import networkx as nx
+    from src.core import coauthors
+    scopus_file = raw_store.raw_file("scopus", "111", raw_pair / "raw")
+    df = pd.read_csv(scopus_file)
+    df["author_ids"] = ["111;222", "111", "111;333"]
+    df.to_csv(scopus_file, index=False)
+    processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+
+    coauthors.update_cohort("999", nx.Graph())
+    assert processing_logic.run_stages("111", "SCH_1", "Rossi_Mario") == []
+
+    coauthors.update_cohort("222", nx.Graph())
+    assert processing_logic.run_stages("111", "SCH_1", "Rossi_Mario") == ["coauthors", "export"]
+
+
+def test_cache_hit_skips_stages_when_signature_unchanged(raw_pair):
+    processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+    hit = lambda: processing_logic.process_chosen_author("111", "Rossi Mario", "SCH_1")
+
+    with patch.object(processing_logic, "run_stages") as mock_run:
+        assert hit() == {"status": "success", "folder": "Rossi_Mario_SCH_1"}
+        mock_run.assert_not_called()
+
+        # Nuovo file grezzo: la firma cambia e gli stadi vengono ricontrollati
+        scholar_file = raw_store.raw_file("scholar", "SCH_1", raw_pair / "raw")
+        scholar_file.write_text(scholar_file.read_text() + "Extra paper,2023,1,\n")
+        hit()
+        mock_run.assert_called_once()
+
+
+def test_prune_keeps_only_referenced_outputs(raw_pair):
+    processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+    with patch("src.merge.fuzzy_merge.reference_signature", return_value={"core": "nuova", "scimago": None}):
+        dict(processing_logic.rebuild_cohort())
+    manifest = pipeline.read_manifest(raw_pair / "cache" / "Rossi_Mario_SCH_1")
+    referenced = {pipeline.STAGE_DIR / stage / f"{key}.pkl" for stage, key in manifest["stages"].items()}
+
+    # Le uscite sostituite sono ancora recenti: restano fino alla fine del periodo di grazia
+    assert pipeline.prune(raw_pair / "cache") == (0, 0)
+    removed, _ = pipeline.prune(raw_pair / "cache", min_age_hours=0)
+
+    # venue_match e metrics della prima esecuzione (l'export non ha uscite salvate)
+    assert removed == 2
+    assert set(pipeline.STAGE_DIR.glob("*/*")) == {p for p in referenced if p.exists()}
@@ -8,15 +8,16 @@ from src.core.processing_logic import process_chosen_author
 
 
 # L'ordine dei decoratori (dall'alto verso il basso) è l'ordine inverso dell'iniezione nella funzione.
+@patch('src.core.pipeline.file_digest', return_value="digest")
 @patch('os.remove')                                        
 @patch('src.fetchers.scholar.fetch_scholar_by_id')          
 @patch('src.fetchers.scopus.save_to_csv')                  
 @patch('src.fetchers.scopus.fetch_author_details')          
-@patch('src.merge.fuzzy_merge.fuzzy_merge_datasets')        
+@patch('src.merge.fuzzy_merge.merge_titles')        
 @patch('pathlib.Path.exists')                               
 def test_process_mismatch(mock_path_exists, mock_merge, 
                           mock_fetch_details, mock_save_csv,
-                          mock_scholar, mock_os_remove): 
+                          mock_scholar, mock_os_remove, mock_digest): 
     
     
     # Sequenza di Path.exists() che permette di testare il merge error:
@@ -26,8 +27,6 @@ def test_process_mismatch(mock_path_exists, mock_merge,
         True,  # 3. Scholar File Check (Bypass download)
         True,  # 4. Scopus File Check (Merge block)
         True,  # 5. Scholar File Check (Merge block)
-        True,  # 6. Scopus File Check (Pulizia)
-        True,  # 7. Scholar File Check (Pulizia)
     ]
 
     
@@ -48,4 +47,173 @@ def test_process_mismatch(mock_path_exists, mock_merge,
     assert "Attenzione: Gli autori sembrano diversi." in result['message']
     
 
-    mock_os_remove.assert_called()
\ No newline at end of file
+    # I dati grezzi (indicizzati per ID) restano su disco per i tentativi successivi
+    mock_os_remove.assert_not_called()
+
+# Download paralleli: la latenza e' il massimo delle due fonti, non la somma
+@patch('src.merge.fuzzy_merge.merge_titles', side_effect=ValueError("LOW_MATCH_SCORE"))
+@patch('src.fetchers.scholar.fetch_scholar_by_id')
+@patch('src.fetchers.scopus.fetch_author_details')
+def test_downloads_run_concurrently(mock_details, mock_scholar, mock_merge, tmp_path, monkeypatch):
+    import threading
+    import time
+    monkeypatch.setattr("src.core.processing_logic.RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr("src.core.processing_logic.CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr("src.core.processing_logic.MERGE_DIR", tmp_path / "merged")
+    both_running = threading.Barrier(2, timeout=5)
+
+    def slow_scopus(author_id, cancel=None, year_from=None, year_to=None, refresh=False):
+        both_running.wait()
+        return {"author_name": "Mario Rossi", "publications": [{"title": "A"}]}
+
+    def slow_scholar(author_id, first_page=None, filename=None, cancel=None, year_from=None, year_to=None):
+        both_running.wait()
+        pd.DataFrame([{"title": "A"}]).to_csv(filename, index=False)
+        return filename
+
+    mock_details.side_effect = slow_scopus
+    mock_scholar.side_effect = slow_scholar
+
+    result = process_chosen_author("123", "Mario Rossi", "SCH_123", force=True)
+
+    # La barriera si sblocca solo se i due download sono attivi nello stesso momento
+    assert result['status'] == "mismatch"
+
+
+# Se Scopus fallisce, il download Scholar viene annullato e si riporta l'errore originale
+@patch('src.fetchers.scholar.fetch_scholar_by_id')
+@patch('src.fetchers.scopus.fetch_author_details', side_effect=RuntimeError("quota Scopus esaurita"))
+def test_download_failure_cancels_other_side(mock_details, mock_scholar, tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.processing_logic.RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr("src.core.processing_logic.CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr("src.core.processing_logic.MERGE_DIR", tmp_path / "merged")
+
+    def scholar_until_cancelled(author_id, first_page=None, filename=None, cancel=None, year_from=None, year_to=None):
+        assert cancel.wait(timeout=5)
+        return None
+
+    mock_scholar.side_effect = scholar_until_cancelled
+
+    result = process_chosen_author("123", "Mario Rossi", "SCH_123", force=True)
+
+    assert result == {"status": "error", "msg": "Errore Download Scopus: quota Scopus esaurita"}
+    assert not (tmp_path / "raw" / "scholar" / "SCH_123.csv").exists()
+
+
+SCOPUS_DATA = {"author_name": "Mario Rossi", "publications": [
+    {"title": "deep learning for graphs", "year": 2020, "citations_scopus": 12,
+     "venue_scopus": "Neural Networks", "doi": "10.1/a", "document_type": "Journal"},
+    {"title": "fuzzy matching at scale", "year": 2021, "citations_scopus": 3,
+     "venue_scopus": "ICSE", "doi": "10.1/b", "document_type": "Conference Proceeding"},
+]}
+
+
+# Scholar non disponibile: risultato parziale solo Scopus, completato poi in background
+@patch('src.fetchers.scopus.fetch_author_details', return_value=SCOPUS_DATA)
+@patch('src.fetchers.scholar.fetch_scholar_by_id')
+def test_scholar_failure_serves_partial_then_upgrades(mock_scholar, mock_details, tmp_path, monkeypatch):
+    import src.core.processing_logic as processing_logic
+    from src.core import prefetch
+    monkeypatch.setattr(processing_logic, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(processing_logic, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(processing_logic, "MERGE_DIR", tmp_path / "merged")
+    monkeypatch.setattr(processing_logic, "SCHOLAR_RETRY_DELAYS", [0, 0])
+    # Il completamento non dipende dal prefetch (ne' ne occupa i worker)
+    monkeypatch.setattr(prefetch, "PREFETCH_ENABLED", False)
+
+    calls = []
+
+    def flaky_scholar(author_id, first_page=None, filename=None, cancel=None, year_from=None, year_to=None):
+        calls.append(author_id)
+        if len(calls) <= 2:
+            raise RuntimeError("quota SerpApi esaurita")
+        pd.DataFrame([{"title": "Deep learning for graphs", "year": 2020, "citations_scholar": 40,
+                       "venue_scholar": "Neural Networks"},
+                      {"title": "Fuzzy matching at scale", "year": 2021, "citations_scholar": 7,
+                       "venue_scholar": "ICSE"}]).to_csv(filename, index=False)
+        return filename
+
+    mock_scholar.side_effect = flaky_scholar
+
+    result = process_chosen_author("123", "Mario Rossi", "SCH_123", force=True)
+    author_dir = tmp_path / "cache" / result["folder"]
+
+    assert result["status"] == "success" and result["partial"] is True
+    assert "Stato" in pd.read_csv(author_dir / "metrics.csv")["Metric"].tolist()
+
+    # Attende il completamento (primo tentativo fallito, secondo riuscito)
+    assert processing_logic.wait_completions(timeout=10)
+
+    metrics = pd.read_csv(author_dir / "metrics.csv").set_index("Metric")["Value"]
+    assert not (author_dir / processing_logic.PARTIAL_MARKER).exists()
+    assert "Stato" not in metrics.index
+    assert metrics["Totale citazioni Scholar"] == "47"
+    assert len(calls) == 3
+    assert process_chosen_author("123", "Mario Rossi", "SCH_123") == {"status": "success", "folder": result["folder"]}
+
+
+# Prefetch: il profilo Scholar scaricato durante la scelta del candidato viene riusato
+@patch('src.merge.fuzzy_merge.merge_titles', side_effect=ValueError("LOW_MATCH_SCORE"))
+@patch('src.fetchers.scopus.fetch_author_details')
+@patch('src.fetchers.scholar.fetch_scholar_by_id')
+@patch('src.fetchers.scholar.fetch_scholar_page')
+def test_prefetched_scholar_is_reused(mock_page, mock_scholar, mock_details, mock_merge, tmp_path, monkeypatch):
+    from src.core import identity, prefetch
+    import src.core.processing_logic as processing_logic
+    monkeypatch.setattr(processing_logic, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(processing_logic, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(processing_logic, "MERGE_DIR", tmp_path / "merged")
+    identity.clear_samples()
+
+    mock_page.return_value = {"articles": [{"title": "A", "year": "2020"}]}
+
+    def write_scholar(author_id, first_page=None, filename=None, cancel=None, year_from=None, year_to=None):
+        pd.DataFrame([{"title": "A"}]).to_csv(filename, index=False)
+        return filename
+
+    mock_scholar.side_effect = write_scholar
+    mock_details.return_value = {"author_name": "Mario Rossi", "publications": [{"title": "A"}]}
+
+    processing_logic.start_prefetch("SCH_123")
+    result = process_chosen_author("123", "Mario Rossi", "SCH_123", force=True)
+    prefetch.shutdown()
+    identity.clear_samples()
+
+    assert result['status'] == "mismatch"
+    assert mock_scholar.call_count == 1
+    assert mock_page.call_count == 1
+
+
+# Con molti omonimi si scaricano in anticipo solo i titoli dei primi candidati
+@patch('src.core.prefetch.submit')
+def test_prefetch_caps_candidates(mock_submit, tmp_path, monkeypatch):
+    import src.core.processing_logic as processing_logic
+    monkeypatch.setattr(processing_logic, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(processing_logic, "MERGE_DIR", tmp_path / "merged")
+    monkeypatch.setattr(processing_logic, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(processing_logic, "PREFETCH_MAX_CANDIDATES", 2)
+
+    processing_logic.start_prefetch("SCH_123", [str(i) for i in range(10)])
+
+    keys = [c.args[0] for c in mock_submit.call_args_list]
+    assert keys == [("scholar", "SCH_123"), ("scopus_listing", "0"), ("scopus_listing", "1")]
+
+
+# L'attesa tra i tentativi di completamento non occupa i worker del prefetch
+def test_completion_wait_does_not_block_prefetch(monkeypatch):
+    import src.core.processing_logic as processing_logic
+    from src.core import prefetch
+    monkeypatch.setattr(processing_logic, "SCHOLAR_RETRY_DELAYS", [60])
+    monkeypatch.setattr(prefetch, "PREFETCH_WORKERS", 1)
+    prefetch.shutdown()
+
+    timers = [processing_logic.schedule_completion(str(i), f"SCH_{i}", "Rossi_Mario") for i in range(4)]
+    try:
+        assert processing_logic.schedule_completion("0", "SCH_0", "Rossi_Mario") is timers[0]
+        job = prefetch.submit(("scholar", "SCH_9"), lambda: "scaricato")
+        assert job.result(timeout=5) == "scaricato"
+    finally:
+        for timer in timers:
+            timer.cancel()
+        processing_logic._completions.clear()
+        prefetch.shutdown()
@@ -0,0 +1,77 @@
+"""
+TEST RATE_LIMIT.PY
+========================================
+
+Test per il limitatore Scopus condiviso (src/core/rate_limit.py):
+- token bucket e attese
+- riserva per le richieste interattive e soglia di quota per i batch
+- pausa condivisa dopo un 429
+- coordinamento tra processi diversi sullo stesso file SQLite
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from src.core import rate_limit
+
+
+@pytest.fixture(autouse=True)
+def tmp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limit, "DB_PATH", tmp_path / "rate_limit.sqlite")
+    monkeypatch.setitem(rate_limit.RATES, "TestAPI", 4)
+    return tmp_path / "rate_limit.sqlite"
+
+
+def test_bucket_allows_burst_then_waits():
+    for _ in range(4):
+        assert rate_limit._try_acquire("TestAPI", "interactive") == 0
+    wait = rate_limit._try_acquire("TestAPI", "interactive")
+    assert 0 < wait <= 0.25 + 0.01
+
+
+def test_batch_leaves_reserve_for_interactive():
+    for _ in range(2):
+        assert rate_limit._try_acquire("TestAPI", "batch") == 0
+    # Restano 2 token: il batch ne richiede 1 + 2 di riserva, l'interattivo passa
+    assert rate_limit._try_acquire("TestAPI", "batch") > 0
+    assert rate_limit._try_acquire("TestAPI", "interactive") == 0
+
+    status = rate_limit.status()["TestAPI"]
+    assert status["wait_s"]["batch"] > status["wait_s"]["interactive"]
+
+
+def test_quota_headers_and_batch_floor(monkeypatch):
+    monkeypatch.setattr(rate_limit, "QUOTA_BATCH_FLOOR", 10)
+    reset = time.time() + 3600
+    rate_limit.record_response("TestAPI", 200, {"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": str(reset)})
+
+    with pytest.raises(rate_limit.QuotaExhausted):
+        with rate_limit.priority("batch"):
+            rate_limit.acquire("TestAPI")
+    rate_limit.acquire("TestAPI")
+    assert rate_limit.status()["TestAPI"]["quota_remaining"] == 9
+
+
+def test_429_pauses_every_caller():
+    rate_limit.record_response("TestAPI", 429, {"Retry-After": "1"})
+    wait = rate_limit._try_acquire("TestAPI", "interactive")
+    assert 0.5 < wait <= 1.0
+
+
+def test_shared_between_processes(tmp_db):
+    # Due processi da 6 richieste ciascuno: 4 di burst, poi 4 al secondo -> almeno 2 secondi
+    code = (
+        "import sys; sys.path.insert(0, sys.argv[2]);"
+        "from pathlib import Path; from src.core import rate_limit;"
+        "rate_limit.DB_PATH = Path(sys.argv[1]); rate_limit.RATES['TestAPI'] = 4;"
+        "[rate_limit.acquire('TestAPI') for _ in range(6)]"
+    )
+    root = str(Path(__file__).resolve().parents[1])
+    start = time.monotonic()
+    procs = [subprocess.Popen([sys.executable, "-c", code, str(tmp_db), root]) for _ in range(2)]
+    assert all(p.wait(timeout=30) == 0 for p in procs)
+    assert time.monotonic() - start >= 1.9
@@ -0,0 +1,119 @@
+"""
+TEST RAW_STORE.PY
+========================================
+
+Test per l'archivio dei dati grezzi indicizzato per ID (src/core/raw_store.py):
+- percorsi e metadati del download
+- dopo un mismatch, un altro candidato Scopus non riscarica il profilo Scholar
+- finestra di valutazione: file per finestra, paginazione Scholar interrotta,
+  finestra ricavata dal download completo senza chiamate API
+- un errore a meta' paginazione non salva un profilo Scholar troncato
+"""
+
+from unittest.mock import patch
+
+import pandas as pd
+
+from src.core import raw_store
+from src.core.processing_logic import process_chosen_author
+
+
+def test_raw_file_and_meta(tmp_path):
+    path = raw_store.raw_file("scholar", "AbC_123", tmp_path)
+    assert path == tmp_path / "scholar" / "AbC_123.csv"
+    assert raw_store.fetched_at("scholar", "AbC_123", tmp_path) is None
+
+    raw_store.record_fetch("scholar", "AbC_123", tmp_path, rows=3)
+    meta = raw_store.read_meta("scholar", "AbC_123", tmp_path)
+    assert meta["rows"] == 3
+    assert raw_store.fetched_at("scholar", "AbC_123", tmp_path) is not None
+
+
+def _write_scholar(author_id, first_page=None, filename=None, cancel=None, year_from=None, year_to=None):
+    pd.DataFrame([{"title": "A paper", "year": 2020, "citations_scholar": 1, "venue": "", "link": "", "source": "Scholar"}]).to_csv(filename, index=False)
+    return filename
+
+
+@patch('src.merge.fuzzy_merge.merge_titles')
+@patch('src.fetchers.scholar.fetch_scholar_by_id', side_effect=_write_scholar)
+@patch('src.fetchers.scopus.fetch_author_details')
+def test_mismatch_keeps_raw_data(mock_details, mock_scholar, mock_merge, tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.processing_logic.RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr("src.core.processing_logic.CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr("src.core.processing_logic.MERGE_DIR", tmp_path / "merged")
+    mock_details.return_value = {"author_name": "Mario Rossi", "publications": [{"title": "A paper"}]}
+    mock_merge.side_effect = ValueError("LOW_MATCH_SCORE")
+
+    # Omonimi con lo stesso nome: i file non si sovrascrivono perche' indicizzati per ID
+    first = process_chosen_author("111", "Rossi, Mario", "SCH_1", force=True)
+    second = process_chosen_author("222", "Rossi, Mario", "SCH_1", force=True)
+
+    assert first["status"] == second["status"] == "mismatch"
+    assert mock_scholar.call_count == 1
+    assert mock_details.call_count == 2
+    assert (tmp_path / "raw" / "scopus" / "111.csv").exists()
+    assert (tmp_path / "raw" / "scopus" / "222.csv").exists()
+    assert raw_store.read_meta("scopus", "222", tmp_path / "raw")["name"] == "Mario Rossi"
+
+
+def test_year_window_helpers():
+    assert raw_store.year_of("2020-05-01") == raw_store.year_of(2020.0) == 2020
+    assert raw_store.year_of("") is None and raw_store.year_of(None) is None
+    assert raw_store.in_year_window("", None, None)
+    assert not raw_store.in_year_window("", 2015, None)
+    assert raw_store.in_year_window(2015, 2015, 2020) and not raw_store.in_year_window(2021, 2015, 2020)
+    assert raw_store.window_key("SCH_1") == "SCH_1"
+    assert raw_store.window_key("SCH_1", 2015) == "SCH_1_2015-"
+
+
+# SerpApi ordina per data (sort=pubdate): si smette di paginare al primo articolo troppo vecchio
+@patch('src.fetchers.scholar.fetch_scholar_page')
+def test_scholar_paging_stops_at_window(mock_page, tmp_path):
+    from src.fetchers import scholar
+
+    def page(author_id, start, page_size, max_retries):
+        years = [2024 - (start + i) // 20 for i in range(page_size)]
+        return {"articles": [{"title": f"P{start + i}", "year": str(y)} for i, y in enumerate(years)],
+                "serpapi_pagination": {"next": "..."}}
+
+    mock_page.side_effect = page
+    out = scholar.fetch_scholar_by_id("SCH_1", filename=str(tmp_path / "s.csv"), year_from=2020, year_to=2023)
+
+    df = pd.read_csv(out)
+    assert df["year"].between(2020, 2023).all() and len(df) == 80
+    assert mock_page.call_count == 2  # la seconda pagina parte dal 2019: niente terza pagina
+
+
+@patch('src.fetchers.scholar.fetch_scholar_page')
+def test_scholar_paging_error_keeps_previous_file(mock_page, tmp_path):
+    from src.fetchers import scholar
+
+    first = {"articles": [{"title": f"P{i}", "year": "2024"} for i in range(100)], "serpapi_pagination": {"next": "..."}}
+    mock_page.side_effect = [first, {"error": "Google hasn't returned any results"}, first, RuntimeError("timeout")]
+    target = tmp_path / "s.csv"
+    target.write_text("title,year\nOld,2020\n")
+
+    assert scholar.fetch_scholar_by_id("SCH_1", filename=str(target)) is None
+    assert scholar.fetch_scholar_by_id("SCH_1", filename=str(target)) is None
+    assert target.read_text() == "title,year\nOld,2020\n"
+
+
+@patch('src.merge.fuzzy_merge.merge_titles', side_effect=ValueError("LOW_MATCH_SCORE"))
+@patch('src.fetchers.scholar.fetch_scholar_by_id', side_effect=_write_scholar)
+@patch('src.fetchers.scopus.fetch_author_details')
+def test_window_sliced_from_full_download(mock_details, mock_scholar, mock_merge, tmp_path, monkeypatch):
+    monkeypatch.setattr("src.core.processing_logic.RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr("src.core.processing_logic.CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr("src.core.processing_logic.MERGE_DIR", tmp_path / "merged")
+    mock_details.return_value = {"author_name": "Mario Rossi", "publications": [
+        {"title": "Old paper", "year": 2008}, {"title": "A paper", "year": 2020}]}
+
+    process_chosen_author("111", "Rossi, Mario", "SCH_1", force=True)
+    process_chosen_author("111", "Rossi, Mario", "SCH_1", force=True, year_from=2015, year_to=2024)
+
+    # La finestra e' ricavata dai CSV completi gia' scaricati: nessuna nuova chiamata
+    assert mock_details.call_count == mock_scholar.call_count == 1
+    windowed = pd.read_csv(tmp_path / "raw" / "scopus" / "111_2015-2024.csv")
+    assert windowed["title"].tolist() == ["A paper"]
+    assert raw_store.read_meta("scopus", "111_2015-2024", tmp_path / "raw")["sliced_from"] == "111.csv"
+
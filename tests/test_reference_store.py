@@ -0,0 +1,92 @@
+"""
+TEST REFERENCE_STORE.PY
+========================================
+
+Test per il formato compilato dei dati di riferimento (src/merge/reference_store.py):
+- compilazione e apertura in sola lettura con memory mapping
+- ricerca esatta e fuzzy dei nomi normalizzati
+- ricompilazione quando cambia il CSV sorgente
+- Scimago annuale: quartile dell'anno di pubblicazione (o del piu' vicino), anche per ISSN
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.merge import reference_store
+
+
+def _loader():
+    df = pd.DataFrame({
+        "venue_norm": ["international conference on software engineering", "acm sigmod conference", "acm sigmod conference"],
+        "rank": ["A*", "A", "B"],
+        "sjr": ["1,5", "0.7", "x"],
+    })
+    return df, "venue_norm", {"core_rank": "rank"}, {"sjr_score": "sjr"}
+
+
+def test_open_reference_is_memory_mapped(tmp_path):
+    src = tmp_path / "ref.csv"
+    src.write_text("dummy")
+    ref = reference_store.open_reference("test_mm", [src], _loader, compiled_dir=tmp_path / "compiled")
+
+    assert isinstance(ref.names, np.memmap)
+    assert len(ref) == 2  # duplicati rimossi, vince la prima riga
+    idx = ref.find("acm sigmod conference")
+    assert ref.value(idx, "core_rank") == "A"
+    assert ref.value(ref.find("international conf on software engineering"), "sjr_score") == 1.5
+    assert ref.find("completely unrelated venue") is None
+    assert ref.value(None, "core_rank") is None
+
+
+def test_open_reference_recompiles_on_source_change(tmp_path):
+    src = tmp_path / "ref.csv"
+    src.write_text("v1")
+    first = reference_store.open_reference("test_rc", [src], _loader, compiled_dir=tmp_path / "compiled")
+    src.write_text("version 2")
+    second = reference_store.open_reference("test_rc", [src], _loader, compiled_dir=tmp_path / "compiled")
+    assert first.directory != second.directory
+
+
+def test_open_reference_missing_source(tmp_path):
+    assert reference_store.open_reference("test_missing", [tmp_path / "nope.csv"], _loader) is None
+
+
+def test_yearly_scimago_nearest_year(tmp_path, monkeypatch):
+    from src.merge import fuzzy_merge
+
+    years_dir = tmp_path / "scimago"
+    years_dir.mkdir()
+    for year, quartile, sjr in ((2018, "Q2", "1,1"), (2020, "Q1", "2,4")):
+        pd.DataFrame({"Title": ["Pattern Recognition", "Neurocomputing"], "Issn": ["00313203", "09252312, 18728286"],
+                      "SJR": [sjr, "0,9"], "SJR Best Quartile": [quartile, "Q3"]}
+                     ).to_csv(years_dir / f"scimagojr {year}.csv", index=False)
+    # Una rivista presente solo nell'ultimo anno
+    pd.DataFrame({"Title": ["Journal of Systems and Software"], "Issn": ["01641212"], "SJR": ["1,5"],
+                  "SJR Best Quartile": ["Q1"]}).to_csv(years_dir / "scimagojr 2021.csv", index=False)
+    monkeypatch.setattr(fuzzy_merge, "SCIMAGO_YEARS_DIR", str(years_dir))
+
+    ref = reference_store.open_reference("test_years", fuzzy_merge.scimago_sources(), fuzzy_merge._scimago_table,
+                                         compiled_dir=tmp_path / "compiled")
+    assert ref.years == [2018, 2021]
+    assert ref._codes["scimago_quartile"].shape == (len(ref), 4)  # nomi salvati una volta sola
+    # ISSN in un array a parte: il fuzzy scorre solo i nomi delle riviste
+    assert len(ref) == 3 and not any(str(n).startswith("issn:") for n in ref.names)
+    assert ref.names[ref.find_issn("18728286")] == "neurocomputing"
+    assert ref.find_issn("99999999") is None
+
+    df = pd.DataFrame({"venue_norm": ["pattern recognition"] * 4 + ["journal of systems and software", "", "pattern recognition"],
+                       "issn": ["", "", "", "", "", "1872-8286", "9999-9999,1872-8286"],
+                       "year": [2017, 2019, 2020, "", 2010, 2020, 2020]})
+    fuzzy_merge.enrich_from_reference(df, ref, ref.columns)
+    # 2017 -> 2018, 2019 -> 2018 (a pari distanza l'anno precedente), anno mancante -> ultimo anno;
+    # con piu' ISSN (cartaceo, elettronico) vale il primo presente nel riferimento
+    assert df["scimago_quartile"].tolist() == ["Q2", "Q2", "Q1", "Q1", "Q1", "Q3", "Q3"]
+    assert df["sjr_score"].iloc[2] == pytest.approx(2.4)
+
+    # Anno mancante dopo compact_dtypes (tipico dei record solo Scholar): quartile dell'ultimo anno
+    yearless = fuzzy_merge.compact_dtypes(pd.DataFrame({"venue_norm": ["pattern recognition"], "year": [None]}))
+    assert yearless["year"].isna().all()
+    fuzzy_merge.enrich_from_reference(yearless, ref, ["scimago_quartile"])
+    assert yearless["scimago_quartile"].tolist() == ["Q1"]
+    assert ref.year_column(0) == ref.year_column(None)
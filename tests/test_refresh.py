@@ -0,0 +1,160 @@
+"""
+TEST REFRESH.PY
+========================================
+
+Test per l'aggiornamento programmato degli autori in cache (src/core/refresh.py):
+- priorita' per eta' dei dati e frequenza di accesso, entro il budget di chiamate
+- riscaricamento con priorita' "batch" e sostituzione della cartella risultati
+- un download molto piu' corto del precedente viene scartato (e non rinfresca la data di download)
+- fascia oraria notturna
+- aggiornamento delle sole citazioni (stadi citations, metrics, export) e storico
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.core import citation_history, raw_store, refresh, rate_limit
+import src.core.processing_logic as processing_logic
+
+TITLES = ["Deep learning for graphs", "Fuzzy matching at scale", "Trigram indexes revisited"]
+
+
+def _cached_author(root, scopus_id, scholar_id, name, days_old):
+    raw = root / "raw"
+    for source, source_id, frame in (
+        ("scopus", scopus_id, {"title": TITLES, "year": [2020, 2021, 2022], "citations_scopus": [5, 3, 1],
+                               "venue_scopus": ["NN", "ICSE", "VLDB"], "doi": ["a", "b", "c"],
+                               "document_type": ["Journal", "Conference Proceeding", "Journal"]}),
+        ("scholar", scholar_id, {"title": TITLES, "year": [2020, 2021, 2022], "citations_scholar": [9, 4, 2],
+                                 "venue": ["", "", ""]}),
+    ):
+        path = raw_store.raw_file(source, source_id, raw)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(frame).to_csv(path, index=False)
+        raw_store.record_fetch(source, source_id, raw)
+        meta = raw_store.meta_file(source, source_id, raw)
+        data = json.loads(meta.read_text())
+        data["fetched_at"] = (datetime.now(timezone.utc) - timedelta(days=days_old)).isoformat(timespec="seconds")
+        meta.write_text(json.dumps(data))
+    processing_logic.run_stages(scopus_id, scholar_id, name)
+    return f"{name}_{scholar_id}"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(processing_logic, "RAW_DIR", tmp_path / "raw")
+    monkeypatch.setattr(processing_logic, "CACHE_DIR", tmp_path / "cache")
+    return tmp_path
+
+
+def test_plan_by_staleness_and_access(cache):
+    rossi = _cached_author(cache, "111", "SCH_1", "Rossi_Mario", days_old=60)
+    bianchi = _cached_author(cache, "222", "SCH_2", "Bianchi_Luca", days_old=40)
+    _cached_author(cache, "333", "SCH_3", "Verdi_Anna", days_old=2)
+    for _ in range(3):
+        refresh.record_access(bianchi)
+
+    planned = refresh.plan(cache / "cache", cache / "raw", budget=100, max_age_days=30)
+    assert [p[0] for p in planned] == [bianchi, rossi]
+    assert planned[0][3] == 3 + 2 + 1  # abstract + ricerca/profilo + una pagina SerpApi
+
+    assert [p[0] for p in refresh.plan(cache / "cache", cache / "raw", budget=6, max_age_days=30)] == [bianchi]
+
+
+def _new_scholar(rows):
+    def fetch(author_id, first_page=None, filename=None, cancel=None, year_from=None, year_to=None):
+        pd.DataFrame({"title": TITLES[:rows], "year": [2020, 2021, 2022][:rows],
+                      "citations_scholar": [90, 40, 20][:rows], "venue": [""] * rows}).to_csv(filename, index=False)
+        return filename
+    return fetch
+
+
+@patch('src.fetchers.scopus.fetch_author_details')
+def test_refresh_author_swaps_results(mock_details, cache):
+    folder = _cached_author(cache, "111", "SCH_1", "Rossi_Mario", days_old=60)
+    priorities = []
+
+    def details(author_id, cancel=None, year_from=None, year_to=None, refresh=False):
+        priorities.append((rate_limit.current_priority(), refresh))
+        return {"author_name": "Mario Rossi", "publications": [
+            {"title": t, "year": y, "citations_scopus": c, "venue_scopus": "", "doi": d, "document_type": "Journal"}
+            for t, y, c, d in zip(TITLES, [2020, 2021, 2022], [50, 30, 10], "abc")]}
+
+    mock_details.side_effect = details
+    with patch('src.fetchers.scholar.fetch_scholar_by_id', side_effect=_new_scholar(3)):
+        assert refresh.refresh_author(processing_logic.pipeline.read_manifest(cache / "cache" / folder)) == "updated"
+
+    # Priorita' "batch" ed elenco dei documenti riletto da Scopus, non dalla cache di pybliometrics
+    assert priorities == [("batch", True)]
+    metrics = pd.read_csv(cache / "cache" / folder / "metrics.csv").set_index("Metric")["Value"]
+    assert metrics["Totale citazioni Scholar"] == "150"
+    assert not list((cache / "raw").rglob("*.refresh.csv"))
+    assert refresh.plan(cache / "cache", cache / "raw", max_age_days=30) == []
+
+
+@patch('src.fetchers.scopus.fetch_author_details', return_value=None)
+def test_truncated_download_is_discarded(mock_details, cache):
+    folder = _cached_author(cache, "111", "SCH_1", "Rossi_Mario", days_old=60)
+    scholar_file = raw_store.raw_file("scholar", "SCH_1", cache / "raw")
+
+    with patch('src.fetchers.scholar.fetch_scholar_by_id', side_effect=_new_scholar(1)):
+        outcome = refresh.refresh_author(processing_logic.pipeline.read_manifest(cache / "cache" / folder))
+
+    assert outcome == "error"
+    assert len(pd.read_csv(scholar_file)) == 3
+    assert not scholar_file.with_name("SCH_1.refresh.csv").exists()
+    # Il profilo Scholar in uso e' ancora quello vecchio: lo e' anche la data di download
+    age = datetime.now(timezone.utc) - raw_store.fetched_at("scholar", "SCH_1", cache / "raw")
+    assert age > timedelta(days=30)
+
+
+@patch('src.core.refresh.plan')
+def test_refresh_hours(mock_plan, monkeypatch):
+    at = lambda hour: datetime(2026, 1, 1, hour)
+    assert refresh.in_refresh_hours(at(3), "1-6") and not refresh.in_refresh_hours(at(12), "1-6")
+    assert refresh.in_refresh_hours(at(23), "22-5") and refresh.in_refresh_hours(at(2), "22-5")
+    assert not refresh.in_refresh_hours(at(10), "22-5")
+
+    # Di giorno il giro non parte (salvo --now)
+    monkeypatch.setattr(refresh, "REFRESH_HOURS", "1-6")
+    mock_plan.return_value = []
+    assert list(refresh.run_pass(now=at(12))) == []
+    assert not mock_plan.called
+    assert list(refresh.run_pass(now=at(12), force=True)) == [] and mock_plan.called
+
+
+@patch('src.fetchers.scopus.fetch_author_details')
+@patch('src.fetchers.scopus.fetch_document_listing')
+def test_refresh_citations_only(mock_listing, mock_details, cache):
+    folder = _cached_author(cache, "111", "SCH_1", "Rossi_Mario", days_old=10)
+    mock_listing.return_value = [{"title": t, "year": y, "doi": d, "citations_scopus": c}
+                                 for t, y, d, c in zip(TITLES, [2020, 2021, 2022], "abc", [50, 30, 10])]
+    assert refresh.plan(cache / "cache", cache / "raw", citations=True)[0][3] == 1 + 1  # una pagina per fonte
+
+    with patch('src.fetchers.scholar.fetch_scholar_by_id', side_effect=_new_scholar(3)):
+        result = processing_logic.refresh_citations("111", "SCH_1", "Rossi_Mario")
+
+    assert result["status"] == "success" and result["sources"] == ["scopus", "scholar"]
+    assert result["stages"] == ["citations", "metrics", "export"]
+    assert not mock_details.called
+    metrics = pd.read_csv(cache / "cache" / folder / "metrics.csv").set_index("Metric")["Value"]
+    assert metrics["Totale citazioni Scholar"] == "150"
+    # Lo storico conserva anche i conteggi precedenti
+    assert citation_history.trends(folder)["sources"]["scholar"]["total"] == 150
+    assert citation_history.publication_history(folder)["citations"].max() == 90
+    assert refresh.plan(cache / "cache", cache / "raw", citations=True) == []
+    assert refresh.plan(cache / "cache", cache / "raw", max_age_days=5) != []  # il dato completo resta vecchio
+
+    # Un download completo piu' recente supera le citazioni aggiornate
+    scholar_file = raw_store.raw_file("scholar", "SCH_1", cache / "raw")
+    later = scholar_file.with_suffix(".citations.csv").stat().st_mtime + 10
+    os.utime(scholar_file, (later, later))
+    os.utime(raw_store.raw_file("scopus", "111", cache / "raw"), (later, later))
+    processing_logic.run_stages("111", "SCH_1", "Rossi_Mario")
+    metrics = pd.read_csv(cache / "cache" / folder / "metrics.csv").set_index("Metric")["Value"]
+    assert metrics["Totale citazioni Scholar"] == "15"
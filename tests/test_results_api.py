@@ -0,0 +1,85 @@
+"""
+TEST RESULTS_API.PY
+========================================
+
+Test per le API JSON dei risultati (src/core/results_api.py, /api/authors/...):
+- filtri per tipo, rank, quartile e anni, ordinamento e paginazione lato server
+- ETag: la seconda richiesta con If-None-Match riceve 304; report e ZIP scaricati
+  non lo cambiano, i grafici ridisegnati solo per le metriche
+- parametri non validi (400) e cartelle inesistenti o fuori dalla cache (404)
+"""
+
+import pandas as pd
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    author_dir = tmp_path / "Rossi_Mario_SCH_1"
+    author_dir.mkdir()
+    pd.DataFrame({"Metric": ["Totale citazioni Scholar", "Pubblicazioni"], "Value": ["15", "4"]}).to_csv(
+        author_dir / "metrics.csv", index=False)
+    pd.DataFrame({"title": ["Conf A", "Conf B"], "year": [2021, 2019], "venue": ["ICSE", "XYZ"],
+                  "core_rank": ["A*", "N/A"], "citations_scholar": [10, 1]}).to_csv(author_dir / "conferences.csv", index=False)
+    pd.DataFrame({"title": ["Journal Q2", "Journal Q1"], "year": [2022, 2015], "venue": ["J1", "J2"],
+                  "scimago_quartile": ["Q2", "Q1"], "citations_scholar": [3, 1]}).to_csv(author_dir / "journals.csv", index=False)
+    pd.DataFrame().to_csv(author_dir / "other_works.csv", index=False)
+    monkeypatch.setattr(app_module, "CACHE_DIR", str(tmp_path))
+    return app_module.app.test_client()
+
+
+def test_metrics(client):
+    data = client.get("/api/authors/Rossi_Mario_SCH_1/metrics").get_json()
+    assert data["metrics"]["Totale citazioni Scholar"] == "15"
+    assert data["partial"] is False
+
+
+def test_publications_filters_and_pagination(client):
+    base = "/api/authors/Rossi_Mario_SCH_1/publications"
+
+    page = client.get(f"{base}?per_page=3").get_json()
+    assert page["total"] == 4 and page["pages"] == 2
+    assert [p["year"] for p in page["items"]] == [2022, 2021, 2019]
+
+    assert [p["title"] for p in client.get(f"{base}?type=journal&sort=scimago_quartile").get_json()["items"]] == \
+        ["Journal Q1", "Journal Q2"]
+    assert [p["title"] for p in client.get(f"{base}?rank=N/A").get_json()["items"]] == ["Conf B"]
+    assert client.get(f"{base}?quartile=Q1,Q2&year_from=2020").get_json()["total"] == 1
+    assert client.get(f"{base}?sort=-citations_scholar&per_page=1").get_json()["items"][0]["title"] == "Conf A"
+
+
+def test_etag_not_modified(client):
+    url = "/api/authors/Rossi_Mario_SCH_1/publications?type=conference"
+    first = client.get(url)
+    assert first.headers["ETag"]
+
+    second = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304 and second.data == b""
+
+
+def test_etag_ignores_downloads_and_tracks_charts(client, tmp_path):
+    from src.core import results_api
+    author_dir = tmp_path / "Rossi_Mario_SCH_1"
+    publications = "/api/authors/Rossi_Mario_SCH_1/publications"
+    metrics = "/api/authors/Rossi_Mario_SCH_1/metrics"
+    before = {url: client.get(url).headers["ETag"] for url in (publications, metrics)}
+    table = results_api.load_publications(author_dir)
+
+    (author_dir / "report.xlsx").write_bytes(b"xlsx")
+    assert {url: client.get(url).headers["ETag"] for url in (publications, metrics)} == before
+    assert results_api.load_publications(author_dir) is table
+
+    (author_dir / f"{next(iter(results_api.CHARTS))}.png").write_bytes(b"png")
+    assert client.get(publications).headers["ETag"] == before[publications]
+    assert client.get(metrics).headers["ETag"] != before[metrics]
+
+
+def test_invalid_requests(client):
+    assert client.get("/api/authors/Rossi_Mario_SCH_1/publications?sort=doi").status_code == 400
+    assert client.get("/api/authors/Rossi_Mario_SCH_1/publications?per_page=5000").status_code == 400
+    assert client.get("/api/authors/Rossi_Mario_SCH_1/publications?type=book").status_code == 400
+    assert client.get("/api/authors/Sconosciuto/metrics").status_code == 404
+    assert client.get("/api/authors/..%2F..%2Fetc/metrics").status_code == 404
+    assert client.get("/coauthors/..%2F..%2Fetc").status_code == 404
@@ -5,6 +5,8 @@ Test unitari per le funzioni di fetchers/scopus.py
 
 fa le seguenti verifiche:
 - search_author_by_name: ricerca autori per nome
+- fetch_author_details: finestra di valutazione, ISSN (print, electronic) salvati come testo,
+  elenco dei documenti riletto con refresh=True
 """
 
 
@@ -51,4 +53,63 @@ def test_search_author_empty(mock_search_class):
 
     results = search_author_by_name("Fantasma Formaggino")
     
-    assert results == [] # Deve tornare lista vuota
\ No newline at end of file
+    assert results == [] # Deve tornare lista vuota
+
+
+# Finestra di valutazione: gli abstract fuori finestra non vengono richiesti
+@patch('src.fetchers.scopus.AbstractRetrieval')
+@patch('src.fetchers.scopus.AuthorRetrieval')
+def test_fetch_author_details_year_window(mock_author_class, mock_abstract_class):
+    from src.fetchers.scopus import fetch_author_details
+
+    docs = []
+    for eid, date in [("e1", "2023-03-01"), ("e2", "2019-07-15"), ("e3", "2012-01-01"), ("e4", "")]:
+        doc = MagicMock(eid=eid, coverDate=date, title=f"Paper {eid}", citedby_count=1, doi="", publicationName="V")
+        docs.append(doc)
+    au = mock_author_class.return_value
+    au.get_documents.return_value = docs
+    au.affiliation_current = None
+
+    data = fetch_author_details("123", year_from=2015, year_to=2023)
+    au.get_documents.assert_called_once_with(refresh=False)
+
+    assert [p["year"] for p in data["publications"]] == ["2023", "2019"]
+    assert [c.args[0] for c in mock_abstract_class.call_args_list] == ["e1", "e2"]
+
+
+
+# Con view FULL l'ISSN arriva come namedtuple ISSN(print, electronic): nel CSV va il testo
+@patch('src.fetchers.scopus.AbstractRetrieval')
+@patch('src.fetchers.scopus.AuthorRetrieval')
+def test_fetch_author_details_issn_tuple(mock_author_class, mock_abstract_class):
+    from collections import namedtuple
+    from src.fetchers.scopus import fetch_author_details
+    from src.merge.fuzzy_merge import normalize_issn
+
+    ISSN = namedtuple("ISSN", "print electronic")
+    docs = [MagicMock(eid=eid, coverDate="2020-01-01", title=eid, citedby_count=1, doi="", publicationName="V",
+                      issn=issn)
+            for eid, issn in [("e1", ISSN("00313203", "18735142")), ("e2", ISSN(None, "18728286")), ("e3", "01641212")]]
+    au = mock_author_class.return_value
+    au.get_documents.return_value = docs
+    au.affiliation_current = None
+
+    issns = [p["issn"] for p in fetch_author_details("123")["publications"]]
+
+    assert issns == ["00313203,18735142", "18728286", "01641212"]
+    assert [normalize_issn(v) for v in issns[0].split(",")] == ["00313203", "18735142"]
+
+
+# get_documents ignora il refresh di AuthorRetrieval: va passato esplicitamente
+@patch('src.fetchers.scopus.AbstractRetrieval')
+@patch('src.fetchers.scopus.AuthorRetrieval')
+def test_fetch_author_details_refresh_requeries_listing(mock_author_class, mock_abstract_class):
+    from src.fetchers.scopus import fetch_author_details
+
+    au = mock_author_class.return_value
+    au.get_documents.return_value = []
+    au.affiliation_current = None
+
+    fetch_author_details("123", refresh=True)
+
+    au.get_documents.assert_called_once_with(refresh=True)
@@ -0,0 +1,42 @@
+"""
+TEST BENCHMARKS/SYNTHETIC.PY
+========================================
+
+Verifica il generatore di profili sintetici usato dai benchmark:
+- colonne uguali a quelle prodotte dai fetcher
+- overlap e record solo-Scholar controllabili
+- il merge accetta i dati generati e produce tipi compatti
+"""
+
+from benchmarks.synthetic import generate_profile
+from src.merge.fuzzy_merge import match_titles, scopus_only_rows
+
+
+def test_generate_profile_shape():
+    scopus_df, scholar_df = generate_profile(n=200, overlap=0.5, noise=0.0, extra=0.1, seed=1)
+    assert len(scopus_df) == 200
+    assert {"title", "year", "citations_scopus", "venue_scopus", "doi", "document_type", "source_type"} <= set(scopus_df.columns)
+    assert {"title", "year", "citations_scholar", "venue", "link", "source"} <= set(scholar_df.columns)
+    # ~100 condivisi + 20 solo Scholar
+    assert 70 < len(scholar_df) < 150
+
+
+def test_generated_profile_merges():
+    scopus_df, scholar_df = generate_profile(n=100, overlap=0.9, noise=0.3, seed=2)
+    merged = match_titles(scopus_df, scholar_df)
+    assert (merged["source"] == "Scopus + Scholar").sum() >= 80
+
+
+def test_merge_compact_dtypes():
+    scopus_df, scholar_df = generate_profile(n=100, overlap=0.9, noise=0.0, extra=0.2, seed=3)
+    merged = match_titles(scopus_df.copy(), scholar_df.copy())
+
+    assert merged["year"].dtype == "Int16"
+    assert merged["citations_scopus"].dtype == merged["citations_scholar"].dtype == "int32"
+    for col in ("venue", "type", "source"):
+        assert merged[col].dtype == "category"
+    # Le righe solo Scholar non hanno citazioni Scopus, quelle abbinate portano le citazioni Scholar
+    scholar_only = merged[merged["source"] == "Scholar"]
+    assert not scholar_only.empty and (scholar_only["citations_scopus"] == 0).all()
+    assert merged["citations_scholar"].sum() == scholar_df["citations_scholar"].sum()
+    assert scopus_only_rows(scopus_df)["citations_scopus"].dtype == "int32"
@@ -0,0 +1,44 @@
+"""
+TEST TELEMETRY.PY
+========================================
+
+Test per src/core/telemetry.py e per l'endpoint /metrics:
+- contatori e timer di fase nel formato Prometheus
+- esposizione tramite Flask
+"""
+
+import pytest
+
+from src.core import telemetry
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    telemetry.reset()
+    yield
+    telemetry.reset()
+
+
+def test_counters_and_stage_timer():
+    telemetry.count("api_calls_total", service="serpapi")
+    telemetry.count("api_calls_total", service="serpapi")
+    with telemetry.stage_timer("title_match"):
+        pass
+    with pytest.raises(ValueError):
+        with telemetry.stage_timer("venue_match"):
+            raise ValueError("boom")
+
+    text = telemetry.render_prometheus()
+    assert 'api_calls_total{service="serpapi"} 2' in text
+    assert 'pipeline_stage_seconds_count{outcome="ok",stage="title_match"} 1' in text
+    assert 'pipeline_stage_seconds_count{outcome="error",stage="venue_match"} 1' in text
+    assert "# TYPE pipeline_stage_seconds histogram" in text
+
+
+def test_metrics_endpoint():
+    import app as app_module
+    client = app_module.app.test_client()
+    client.get("/")
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'http_request_seconds_count{endpoint="index",status="200"} 1' in resp.get_data(as_text=True)
@@ -0,0 +1,48 @@
+"""
+TEST TITLE_INDEX.PY
+========================================
+
+Test per l'indice di trigrammi usato da fuzzy_merge sui profili grandi
+(src/merge/title_index.py):
+- stesso richiamo del confronto completo sulle coppie vere
+- scelta automatica del matcher in base alla soglia
+"""
+
+from benchmarks import synthetic
+from src.merge import title_index
+
+
+def _titles(n):
+    scopus_df, scholar_df = synthetic.generate_profile(n=n, noise=0.3, seed=3)
+    norm = lambda s: s.fillna("").astype(str).str.lower().str.strip().tolist()
+    return norm(scopus_df["title"]), norm(scholar_df["title"])
+
+
+def test_index_recall_matches_brute_force():
+    scopus_titles, scholar_titles = _titles(400)
+    brute = title_index.BruteForceMatcher(scholar_titles)
+    index = title_index.TrigramIndexMatcher(scholar_titles)
+
+    strong = 0
+    for title in scopus_titles:
+        expected = brute.find(title)
+        found = index.find(title)
+        if expected and expected[1] >= 85:
+            strong += 1
+            assert found is not None and found[1] >= expected[1]
+        if found:
+            assert found[1] >= title_index.MATCH_CUTOFF
+    assert strong > 200
+
+
+def test_exact_title_is_found():
+    titles = ["deep learning for graphs", "a survey of cache eviction", "robust federated averaging"]
+    index = title_index.TrigramIndexMatcher(titles)
+    assert index.find("a survey of cache eviction")[:2] == ("a survey of cache eviction", 100.0)
+    assert index.find("graphs for deep learning")[0] == "deep learning for graphs"
+    assert index.find("protein folding") is None
+
+
+def test_make_matcher_threshold():
+    assert isinstance(title_index.make_matcher(["a"] * 10, min_rows=100), title_index.BruteForceMatcher)
+    assert isinstance(title_index.make_matcher(["a"] * 100, min_rows=100), title_index.TrigramIndexMatcher)
@@ -0,0 +1,77 @@
+"""
+TEST XLSX_EXPORT.PY
+========================================
+
+Test per l'export Excel in streaming (src/core/xlsx_export.py):
+- file per autore generato alla prima richiesta e poi riusato
+- file di coorte con la colonna "Autore", rigenerato quando un autore cambia
+"""
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import app as app_module
+from src.core import xlsx_export
+
+
+def _author(cache_dir, folder, titles, citations):
+    author_dir = cache_dir / folder
+    author_dir.mkdir(parents=True)
+    pd.DataFrame({"Metric": ["Totale pubblicazioni", "Totale citazioni Scholar"],
+                  "Value": [str(len(titles)), str(citations)]}).to_csv(author_dir / "metrics.csv", index=False)
+    pd.DataFrame({"title": titles, "year": [2020] * len(titles), "core_rank": ["A"] * len(titles)}).to_csv(
+        author_dir / "conferences.csv", index=False)
+    pd.DataFrame().to_csv(author_dir / "journals.csv", index=False)
+    pd.DataFrame().to_csv(author_dir / "other_works.csv", index=False)
+    return author_dir
+
+
+def _sheet(path, title):
+    return [list(row) for row in load_workbook(path, read_only=True)[title].iter_rows(values_only=True)]
+
+
+def test_author_workbook_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(xlsx_export, "CHUNK_ROWS", 2)
+    author_dir = _author(tmp_path, "Rossi_Mario_SCH_1", ["P1", "P2", "P3"], 12)
+
+    path = xlsx_export.author_workbook(author_dir)
+    assert path == author_dir / "report.xlsx"
+    assert load_workbook(path, read_only=True).sheetnames == ["Metriche", "Conferenze", "Journal", "Altri lavori"]
+    assert _sheet(path, "Conferenze") == [["title", "year", "core_rank"], ["P1", 2020, "A"], ["P2", 2020, "A"], ["P3", 2020, "A"]]
+    assert _sheet(path, "Journal") == []
+
+    mtime = path.stat().st_mtime_ns
+    assert xlsx_export.author_workbook(author_dir).stat().st_mtime_ns == mtime
+
+
+def test_cohort_workbook(tmp_path):
+    cache_dir, export_dir = tmp_path / "cache", tmp_path / "exports"
+    _author(cache_dir, "Bianchi_Luca_SCH_2", ["Q1"], 3)
+    rossi = _author(cache_dir, "Rossi_Mario_SCH_1", ["P1", "P2"], 12)
+
+    path = xlsx_export.cohort_workbook(cache_dir, export_dir)
+    assert _sheet(path, "Metriche") == [["Autore", "Totale pubblicazioni", "Totale citazioni Scholar"],
+                                         ["Bianchi_Luca_SCH_2", "1", "3"], ["Rossi_Mario_SCH_1", "2", "12"]]
+    assert [row[:2] for row in _sheet(path, "Conferenze")[1:]] == \
+        [["Bianchi_Luca_SCH_2", "Q1"], ["Rossi_Mario_SCH_1", "P1"], ["Rossi_Mario_SCH_1", "P2"]]
+    assert xlsx_export.cohort_workbook(cache_dir, export_dir) == path
+
+    only = xlsx_export.cohort_workbook(cache_dir, export_dir, folders=["Rossi_Mario_SCH_1"])
+    assert only != path and len(_sheet(only, "Metriche")) == 2
+
+    # Un autore ricalcolato cambia l'impronta: nuovo file
+    pd.DataFrame({"title": ["P9"], "year": [2024], "core_rank": ["B"]}).to_csv(rossi / "conferences.csv", index=False)
+    assert xlsx_export.cohort_workbook(cache_dir, export_dir) != path
+
+
+def test_xlsx_routes(tmp_path, monkeypatch):
+    _author(tmp_path / "cache", "Rossi_Mario_SCH_1", ["P1"], 1)
+    monkeypatch.setattr(app_module, "CACHE_DIR", str(tmp_path / "cache"))
+    client = app_module.app.test_client()
+
+    response = client.get("/download/xlsx/Rossi_Mario_SCH_1")
+    assert response.status_code == 200 and response.data[:2] == b"PK"
+    assert client.get("/download/xlsx_cohort?authors=Rossi_Mario_SCH_1").status_code == 200
+    assert (tmp_path / "exports").is_dir()
+    assert client.get("/download/xlsx_cohort?authors=Nessuno").status_code == 404
+    assert client.get("/download/xlsx/Nessuno").status_code == 404